@@ -0,0 +1,64 @@
+"""
+Civant Batch Buyer Enrichment
+=============================
+Pre-populates buyer intelligence briefs for all upcoming predictions
+using the Anthropic Messages Batches API (50% cost discount).
+
+Stages, one module each:
+  fetch   - buyers from predictions, cache check, award-history prefetch
+            (history_cache: on-disk award-history cache behind it)
+            (schedule: priority ranking of buyers, --budget-usd fitting)
+            (aliases: buyer-name normalization, one request per alias group)
+            (shared: --tenants, tenants listed concurrently, one brief per buyer for all)
+  prompt  - Civant Agent prompts and batch request objects
+  submit  - sharded batch submission, run manifest and custom_id → buyer map
+            (ledger: SQLite batch ledger of requests, results, tokens and cost per tenant)
+            (realtime: urgent buyers through the rate-limited Messages API)
+  poll    - batch status polling
+  parse   - JSON extraction and brief row construction
+  ingest  - streaming, checkpointed upsert into buyer_research_briefs
+  metrics - stage timings, HTTP latency/bytes, JSON-lines and Prometheus export
+            (profiling: --profile per-stage pstats and collapsed stacks)
+
+Run with `python -m civant_enrich --help`. Public names below resolve on
+first access, so importing the package loads no SDKs.
+"""
+
+import importlib
+
+_EXPORTS = {
+    "fetch_buyers": "fetch",
+    "iter_buyer_pages": "fetch",
+    "filter_already_cached": "fetch",
+    "fetch_award_history": "fetch",
+    "fetch_award_history_bulk": "fetch",
+    "prefetch_award_histories": "fetch",
+    "AwardHistoryCache": "history_cache",
+    "rank_buyers": "schedule",
+    "list_enrichment_tenants": "shared",
+    "collect_tenant_buyers": "shared",
+    "attach_shared_briefs": "shared",
+    "build_prompts": "prompt",
+    "build_batch_requests": "prompt",
+    "submit_batch": "submit",
+    "submit_sharded": "submit",
+    "BatchLedger": "ledger",
+    "run_realtime": "realtime",
+    "poll_batch": "poll",
+    "extract_json": "parse",
+    "parse_brief": "parse",
+    "build_brief_row": "parse",
+    "ingest_results": "ingest",
+    "main": "cli",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
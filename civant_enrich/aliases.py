@@ -0,0 +1,150 @@
+"""
+Stage 1c: collapse buyer aliases into one enrichment target.
+
+Predictions name the same authority in several ways ("Alcaldía del
+Ayuntamiento de X", "Pleno del Ayuntamiento de X", "Excmo. Ayto. de X",
+"Mairie de X" / "Ville de X"). Two buyers in the same country are aliases
+when their normalized names match or when they resolve to the same
+canonical buyer entity (get_buyer_entity_ids). Each group is researched
+once, through a representative, and ingest writes the brief to every
+alias.
+
+Normalization: accent folding, lower case, punctuation to spaces,
+honorifics and abbreviations, then ORGAN_PREFIXES rewrites (the governing
+organ of an authority maps to the authority itself). Articles stay in the
+key: "Las Rozas" and "Rozas" are different places.
+"""
+
+import re
+import unicodedata
+
+HONORIFICS = {
+    "excmo", "excma", "excmos", "excelentisimo", "excelentisima",
+    "ilmo", "ilma", "ilustrisimo", "ilustrisima", "muy", "ilustre",
+}
+ABBREVIATIONS = {"ayto": "ayuntamiento", "aytmo": "ayuntamiento"}
+
+# ES: the organs that sign contracts for a local authority, and the authority
+# types with the article that joins them ("Pleno del Ayuntamiento de X",
+# "Presidencia de la Diputación Provincial de X")
+ES_ORGANS = (
+    "alcaldia presidencia", "alcaldia", "presidencia", "pleno", "junta de gobierno local",
+    "junta de gobierno", "mesa de contratacion", "organo de contratacion",
+)
+ES_AUTHORITIES = {
+    "ayuntamiento": "del", "diputacion provincial": "de la", "diputacion foral": "de la",
+    "diputacion": "de la", "cabildo insular": "del", "consell insular": "del",
+    "consejo comarcal": "del", "comarca": "de la", "mancomunidad": "de la",
+}
+# FR: organ names of an authority
+FR_ORGANS = {
+    "mairie": "commune", "ville": "commune", "conseil municipal": "commune",
+    "conseil departemental": "departement", "conseil regional": "region",
+}
+
+# Folded, space-separated head -> the authority it stands for. A head only
+# matches when a connector (CONNECTORS) and a place follow it, and only the
+# head is rewritten, so the connector and the place stay as written:
+# "Ville du Mans" and "Commune du Mans" both key to "commune du mans".
+ORGAN_PREFIXES = {
+    **{f"{organ} {article} {authority}": authority
+       for organ in ES_ORGANS for authority, article in ES_AUTHORITIES.items()},
+    # Organs named without their authority are a municipality's
+    "alcaldia": "ayuntamiento",
+    "pleno municipal": "ayuntamiento",
+    "junta de gobierno local": "ayuntamiento",
+    **FR_ORGANS,
+}
+_PREFIXES = sorted(ORGAN_PREFIXES, key=len, reverse=True)
+
+CONNECTORS = {"de", "del", "d", "du", "des"}
+
+
+def fold(text):
+    """Lower case without accents: "Alcaldía de Ñaberbre" -> "alcaldia de naberbre"."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def normalize_buyer_name(name):
+    """
+    Alias key for a buyer name; equal keys (in the same country) are the same
+    authority. Returns (key, rewritten) where rewritten says whether the name
+    needed an honorific, abbreviation or organ prefix undone, i.e. it was not
+    already the authority's plain name.
+    """
+    plain = re.sub(r"[^a-z0-9]+", " ", fold(name)).split()
+    words = []
+    for word in plain:
+        if word in HONORIFICS:
+            continue
+        words.extend(ABBREVIATIONS.get(word, word).split())
+    text = " ".join(words)
+
+    rewritten = words != plain
+    for prefix in _PREFIXES:
+        if not text.startswith(prefix + " "):
+            continue
+        rest = text[len(prefix) + 1:].split()
+        # A connector and at least one word of the place's name
+        if len(rest) >= 2 and rest[0] in CONNECTORS and any(w not in CONNECTORS for w in rest[1:]):
+            text = " ".join([ORGAN_PREFIXES[prefix], *rest])
+            rewritten = True
+            break
+    return text, rewritten
+
+
+def group_aliases(buyers, entity_ids=None):
+    """
+    Collapse aliases in `buyers` (ranked, highest priority first). Returns
+    one dict per group, in the order of each group's first member: the
+    representative buyer plus "aliases", a list of {buyer_name, country} for
+    the other members (empty for singletons; with their "tenants" too when
+    buyers carry them, see shared.py). The representative is the first
+    member whose name needed no organ-prefix rewrite, else the first member.
+
+    entity_ids, if given, is aligned with buyers (None where unresolved).
+    """
+    parent = list(range(len(buyers)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i, j):
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+
+    rewritten = []
+    seen = {}
+    for i, b in enumerate(buyers):
+        key, was_rewritten = normalize_buyer_name(b["buyer_name"])
+        rewritten.append(was_rewritten)
+        for token in (("name", b["country"], key),
+                      ("entity", b["country"], entity_ids[i] if entity_ids else None)):
+            if token[2] is None:
+                continue
+            if token in seen:
+                union(seen[token], i)
+            else:
+                seen[token] = i
+
+    members = {}
+    for i in range(len(buyers)):
+        members.setdefault(find(i), []).append(i)
+
+    groups = []
+    for root in sorted(members):
+        idxs = members[root]
+        rep = next((i for i in idxs if not rewritten[i]), idxs[0])
+        group = {**buyers[rep], "aliases": [
+            {k: buyers[i][k] for k in ("buyer_name", "country", "tenants") if k in buyers[i]}
+            for i in idxs if i != rep
+        ]}
+        if "priority" in buyers[idxs[0]]:
+            group["priority"] = buyers[idxs[0]]["priority"]
+        groups.append(group)
+    return groups
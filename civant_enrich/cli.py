@@ -0,0 +1,682 @@
+"""
+Command-line entry point: python -m civant_enrich (or batch_enrich.py).
+
+Stage modules are imported inside the command that needs them, so quick
+commands such as --help and --poll skip the Supabase client entirely.
+"""
+
+import argparse
+import time
+
+from .config import (
+    AWARD_HISTORY_BULK_SIZE, BRIEF_TTL_DAYS, EST_WEB_SEARCHES, MAX_INPUT_TOKENS,
+    PREFETCH_RETRIES, PREFETCH_WORKERS, METRICS_JSONL, METRICS_PROM, PROFILE_TOP_N, REALTIME_ITPM, REALTIME_RPM,
+    REALTIME_WORKERS, SHARD_MAX_BYTES, SHARD_MAX_REQUESTS, TENANT_WORKERS, WEB_SEARCH_USD,
+)
+
+USAGE = """
+Examples:
+  # Dry-run: show what would be submitted
+  python -m civant_enrich --dry-run
+
+  # Submit batch for upcoming predictions only
+  python -m civant_enrich
+
+  # Submit batch for all upcoming + overdue
+  python -m civant_enrich --include-overdue
+
+  # Poll an existing batch (or every shard of a run via its manifest ID)
+  python -m civant_enrich --poll <batch_id|manifest_id>
+
+  # Download and ingest results from a completed batch (or a whole run)
+  python -m civant_enrich --ingest <batch_id|manifest_id>
+
+  # Watch every shard of a run and ingest each one as it ends
+  python -m civant_enrich --watch <manifest_id>
+
+  # Iterate on prompts from locally cached award histories (no history RPCs)
+  python -m civant_enrich --dry-run --limit 20 --cache-only
+
+  # Smaller shards for a large backfill
+  python -m civant_enrich --include-overdue --shard-size 2000
+
+  # Spend at most $25 tonight, most urgent / valuable / stale buyers first
+  python -m civant_enrich --budget-usd 25
+
+  # Buyers tendering within a week get briefs in minutes (standard price); the rest batch
+  python -m civant_enrich --realtime-days 7
+
+  # Several tenants: research each buyer once into the shared layer, attach it to each tenant
+  python -m civant_enrich --tenants civant_default,tenant_b,tenant_c
+
+  # The same for every tenant with upcoming predictions, 8 tenants listed at a time
+  python -m civant_enrich --all-tenants --tenant-workers 8
+
+  # Cap each request at ~3,000 input tokens; the dry run shows sizes before/after
+  python -m civant_enrich --dry-run --max-input-tokens 3000
+
+  # Tune the award-history prefetch (parallel RPCs)
+  python -m civant_enrich --dry-run --workers 16 --rpc-retries 5
+
+  # Force one award-history RPC per buyer (skip get_buyer_award_history_bulk)
+  python -m civant_enrich --dry-run --bulk-size 0
+
+  # Re-run ingest from scratch, ignoring the saved checkpoint
+  python -m civant_enrich --ingest <batch_id> --restart
+
+  # Export stage timings for alerting (node_exporter textfile collector)
+  python -m civant_enrich --metrics-prom /var/lib/node_exporter/textfile_collector/
+
+  # Profile each stage (pstats + collapsed stacks) and print the hottest functions
+  python -m civant_enrich --dry-run --profile profiles/
+  python -m civant_enrich --ingest <batch_id> --profile profiles/
+
+  # Parse results on 4 processes while downloading
+  python -m civant_enrich --ingest <batch_id> --parse-workers 4
+
+  # Move batch_<id>_map.json / manifest_<id>.json files into the batch ledger
+  python -m civant_enrich --import-maps
+  python -m civant_enrich --import-maps old_runs/batch_*_map.json
+
+  # Per-batch results, tokens and cost from the ledger (latest 20, or one run)
+  python -m civant_enrich --ledger-report
+  python -m civant_enrich --ledger-report <batch_id|manifest_id>
+
+  # The same split per tenant (shared requests divided by the briefs they write for each)
+  python -m civant_enrich --ledger-report <batch_id|manifest_id> --by-tenant
+
+Env vars required:
+  ANTHROPIC_API_KEY            (submit, poll, ingest)
+  SUPABASE_URL                 (submit, ingest)
+  SUPABASE_SERVICE_ROLE_KEY    (submit, ingest)
+
+Env vars optional:
+  ENRICH_RPC_TIMEOUT   per-request PostgREST timeout in seconds (default 30)
+  ENRICH_HTTP_MAX_CONNECTIONS  connections per client pool (default 64)
+  ENRICH_HTTP_MAX_KEEPALIVE    idle connections kept per pool (default: all of them)
+  ENRICH_HTTP_KEEPALIVE        seconds an idle pooled connection is kept (default 90)
+  ENRICH_HTTP2         1 / 0 to force HTTP/2 on or off (default on when h2 is installed)
+  ENRICH_STATE_DIR     where ingest checkpoints, the batch ledger and the award-history
+                       cache are kept (default .enrich_state)
+  ENRICH_LEDGER        batch ledger SQLite file (default $ENRICH_STATE_DIR/ledger.sqlite)
+  ENRICH_MAX_INPUT_TOKENS default for --max-input-tokens
+  ENRICH_METRICS_JSONL default for --metrics-jsonl
+  ENRICH_METRICS_PROM  default for --metrics-prom (e.g. a node_exporter textfile dir)
+"""
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="civant_enrich",
+        description="Civant Batch Buyer Enrichment",
+        epilog=USAGE,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--dry-run", action="store_true", help="Show what would be submitted")
+    parser.add_argument("--include-overdue", action="store_true", help="Include overdue predictions")
+    parser.add_argument("--poll", metavar="BATCH_ID", help="Poll an existing batch or manifest")
+    parser.add_argument("--ingest", metavar="BATCH_ID", help="Download and ingest results of a batch or manifest")
+    parser.add_argument("--watch", metavar="BATCH_ID",
+                        help="Poll a batch or manifest and ingest each batch as soon as it ends")
+    parser.add_argument("--import-maps", nargs="*", metavar="FILE",
+                        help="Import batch_<id>_map.json / manifest_<id>.json files into the batch ledger "
+                             "(default: those in the working directory)")
+    parser.add_argument("--ledger-report", nargs="?", const="", metavar="BATCH_ID",
+                        help="Per-batch results, tokens and cost from the ledger (latest, or one batch/manifest)")
+    parser.add_argument("--by-tenant", action="store_true", help="With --ledger-report: totals per tenant")
+    parser.add_argument("--restart", action="store_true", help="With --ingest: ignore the saved checkpoint")
+    parser.add_argument("--parse-workers", type=int, default=1,
+                        help="With --ingest: processes for parsing results (default 1 = in-process)")
+    parser.add_argument("--no-cache-check", action="store_true", help="Skip checking for existing briefs")
+    parser.add_argument("--no-alias-groups", action="store_true",
+                        help="Research every buyer name separately instead of once per alias group")
+    parser.add_argument("--no-renew", action="store_true",
+                        help="Re-research expired briefs even when their input fingerprint is unchanged")
+    parser.add_argument("--limit", type=int, help="Limit to the N highest-priority buyers")
+    tenant_mode = parser.add_mutually_exclusive_group()
+    tenant_mode.add_argument("--tenants", type=_tenant_list, metavar="T1,T2,...",
+                             help="Enrich for these tenants at once: each buyer is researched once into the "
+                                  "shared research layer and attached to every tenant that needs it")
+    tenant_mode.add_argument("--all-tenants", action="store_true",
+                             help="--tenants for every tenant with buyers to enrich (get_enrichment_tenants)")
+    parser.add_argument("--tenant-workers", type=int, default=TENANT_WORKERS,
+                        help=f"With --tenants / --all-tenants: tenants listed concurrently (default {TENANT_WORKERS})")
+    parser.add_argument("--max-input-tokens", type=int, default=MAX_INPUT_TOKENS,
+                        help="Compact award histories so each request's estimated input fits "
+                             "(env ENRICH_MAX_INPUT_TOKENS; default no cap)")
+    parser.add_argument("--budget-usd", type=float,
+                        help="Submit the highest-priority requests whose estimated cost fits this budget")
+    parser.add_argument("--realtime-days", type=int, metavar="DAYS",
+                        help="Research buyers whose tender window opens within DAYS now, through the standard "
+                             "Messages API at full price; the rest go to the batch")
+    parser.add_argument("--realtime-rpm", type=int, default=REALTIME_RPM,
+                        help=f"Realtime lane requests per minute (default {REALTIME_RPM})")
+    parser.add_argument("--realtime-itpm", type=int, default=REALTIME_ITPM,
+                        help=f"Realtime lane input tokens per minute (default {REALTIME_ITPM:,})")
+    parser.add_argument("--realtime-workers", type=int, default=REALTIME_WORKERS,
+                        help=f"Concurrent realtime lane calls (default {REALTIME_WORKERS})")
+    parser.add_argument("--workers", type=int, default=PREFETCH_WORKERS,
+                        help=f"Concurrent award-history RPCs (default {PREFETCH_WORKERS})")
+    parser.add_argument("--rpc-retries", type=int, default=PREFETCH_RETRIES,
+                        help=f"Retries per award-history RPC on transient errors (default {PREFETCH_RETRIES})")
+    parser.add_argument("--bulk-size", type=int, default=AWARD_HISTORY_BULK_SIZE,
+                        help=f"Buyers per bulk award-history RPC; 0 = one RPC per buyer (default {AWARD_HISTORY_BULK_SIZE})")
+    cache_mode = parser.add_mutually_exclusive_group()
+    cache_mode.add_argument("--refresh-cache", action="store_true",
+                            help="Re-fetch every award history and overwrite the local cache")
+    cache_mode.add_argument("--cache-only", action="store_true",
+                            help="Use only locally cached award histories; never query Supabase for them")
+    cache_mode.add_argument("--no-history-cache", action="store_true",
+                            help="Bypass the local award-history cache entirely")
+    parser.add_argument("--metrics-jsonl", metavar="PATH", default=METRICS_JSONL,
+                        help="Append stage/HTTP metric events as JSON lines (env ENRICH_METRICS_JSONL)")
+    parser.add_argument("--metrics-prom", metavar="PATH", default=METRICS_PROM,
+                        help="Write a Prometheus textfile at exit; a directory gets one file per "
+                             "command (env ENRICH_METRICS_PROM)")
+    parser.add_argument("--profile", metavar="DIR",
+                        help="Profile each stage into DIR (<command>-<stage>.pstats / .collapsed) "
+                             "and print a hot-function summary at the end")
+    parser.add_argument("--profile-top", type=int, default=PROFILE_TOP_N,
+                        help=f"Functions listed in the --profile summary (default {PROFILE_TOP_N})")
+    parser.add_argument("--shard-size", type=int, default=SHARD_MAX_REQUESTS,
+                        help=f"Max requests per submitted batch (default {SHARD_MAX_REQUESTS:,})")
+    parser.add_argument("--shard-max-mb", type=int, default=SHARD_MAX_BYTES // (1024 * 1024),
+                        help=f"Max serialized MB per submitted batch (default {SHARD_MAX_BYTES // (1024 * 1024)})")
+    return parser
+
+
+def _tenant_list(text):
+    tenants = list(dict.fromkeys(t.strip() for t in text.split(",") if t.strip()))
+    if not tenants:
+        raise argparse.ArgumentTypeError("expected a comma-separated list of tenant ids")
+    return tenants
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    from .metrics import METRICS
+    command = ("watch" if args.watch else "poll" if args.poll else "ingest" if args.ingest
+               else "import_maps" if args.import_maps is not None
+               else "ledger_report" if args.ledger_report is not None
+               else "dry_run" if args.dry_run else "submit")
+    METRICS.configure(jsonl_path=args.metrics_jsonl, prom_path=args.metrics_prom, command=command)
+    profiler = None
+    if args.profile:
+        from .profiling import Profiler
+        profiler = Profiler(args.profile, command, top=args.profile_top)
+        METRICS.stage_hooks.append(profiler.stage)
+    success = False
+    try:
+        run(args, METRICS)
+        success = True
+    finally:
+        METRICS.close(success)
+        if profiler is not None:
+            METRICS.stage_hooks.remove(profiler.stage)
+            profiler.close()
+
+
+def run(args, metrics):
+    # --- Ledger maintenance ---
+    if args.import_maps is not None or args.ledger_report is not None:
+        from .ledger import BatchLedger
+        ledger = BatchLedger()
+        try:
+            if args.import_maps is not None:
+                batches, requests = ledger.import_json_maps(args.import_maps or None)
+                print(f"📒 Imported {batches} batch(es), {requests} requests into {ledger.path}")
+            elif args.by_tenant:
+                _print_tenant_report(ledger, args.ledger_report)
+            else:
+                _print_ledger_report(ledger, args.ledger_report)
+        finally:
+            ledger.close()
+        return
+
+    # --- Poll / watch mode ---
+    if args.poll or args.watch:
+        from .ledger import BatchLedger
+        from .poll import watch_batches
+        from .submit import resolve_batch_ids
+        ledger = BatchLedger()
+        try:
+            batch_ids, id_map = resolve_batch_ids(args.poll or args.watch, ledger)
+            ingest = None
+            if args.watch:
+                from .ingest import ingest_results
+
+                def ingest(batch_id):
+                    ingest_results(batch_id, restart=args.restart, parse_workers=args.parse_workers,
+                                   id_map=id_map, ledger=ledger)
+            with metrics.stage("watch" if args.watch else "poll") as s:
+                batches = watch_batches(batch_ids, ingest=ingest)
+                failed = [b for b, batch in batches.items() if isinstance(batch, BaseException)]
+                s.items = len(batch_ids) - len(failed)
+                if failed:
+                    # Reported per batch above; fail the stage, the run metrics and the exit status
+                    raise SystemExit(1)
+        finally:
+            ledger.close()
+        return
+
+    # --- Ingest mode ---
+    if args.ingest:
+        from .ingest import ingest_results
+        from .ledger import BatchLedger
+        from .submit import resolve_batch_ids
+        ledger = BatchLedger()
+        try:
+            batch_ids, id_map = resolve_batch_ids(args.ingest, ledger)
+            with metrics.stage("ingest") as s:
+                for batch_id in batch_ids:
+                    stats = ingest_results(batch_id, restart=args.restart, parse_workers=args.parse_workers,
+                                           id_map=id_map, ledger=ledger)
+                    s.items += stats.succeeded if stats else 0
+        finally:
+            ledger.close()
+        return
+
+    run_submit(args, metrics)
+
+
+def _report_batch_ids(ledger, ref):
+    if not ref:
+        return None
+    return ledger.manifest_batch_ids(ref) if ledger.has_manifest(ref) else [ref]
+
+
+def _print_ledger_report(ledger, ref):
+    rows = ledger.report(_report_batch_ids(ledger, ref))
+    if not rows:
+        print(f"📒 No batches in {ledger.path}" + (f" for {ref}" if ref else ""))
+        return
+    print(f"📒 {ledger.path}")
+    print(f"  {'batch':<36} {'submitted':<20} {'requests':>8} {'ok':>7} {'errored':>7} "
+          f"{'written':>7} {'failed':>6} {'pending':>7} {'tokens':>12} {'cost':>9}  ingest")
+    for r in rows:
+        print(f"  {r['batch_id']:<36} {r['submitted_at'][:19]:<20} {r['requests']:>8,} {r['succeeded']:>7,} "
+              f"{r['errored']:>7,} {r['written']:>7,} {r['failed']:>6,} {r['pending']:>7,} "
+              f"{r['tokens']:>12,} ${r['cost_usd']:>8.2f}  {r['ingest_state']}")
+
+
+def _print_tenant_report(ledger, ref):
+    rows = ledger.tenant_report(_report_batch_ids(ledger, ref))
+    if not rows:
+        print(f"📒 No requests in {ledger.path}" + (f" for {ref}" if ref else ""))
+        return
+    print(f"📒 {ledger.path}" + (f" ({ref})" if ref else ""))
+    print(f"  {'tenant':<24} {'requests':>8} {'briefs':>8} {'ok':>7} {'errored':>7} {'pending':>7} "
+          f"{'tokens':>12} {'cost':>9}")
+    for r in rows:
+        print(f"  {r['tenant_id']:<24} {r['requests']:>8,} {r['briefs']:>8,} {r['succeeded']:>7,} "
+              f"{r['errored']:>7,} {r['pending']:>7,} {r['tokens']:>12,} ${r['cost_usd']:>8.2f}")
+
+
+def run_submit(args, metrics):
+    """Build & Submit mode."""
+    from .fetch import (
+        fetch_brief_fingerprints, fetch_buyer_entity_ids, fetch_buyers, filter_already_cached, iter_buyer_pages,
+        renew_unchanged_briefs,
+    )
+    from .aliases import group_aliases
+    from .prompt import build_batch_requests, estimate_input_tokens, estimate_request_cost_usd
+    from .schedule import fit_budget, priority_summary, rank_buyers, trim_to_budget
+    from .shared import (
+        attach_shared_briefs, collect_tenant_buyers, filter_shared_cached, list_enrichment_tenants,
+        renew_shared_briefs, shared_entity_ids, tenant_attachments,
+    )
+    from .submit import submit_sharded
+
+    # Without --limit / --budget-usd every buyer is researched, so ranking can
+    # wait: buyer pages are cache-checked and fed into the award-history
+    # prefetch as they arrive. Otherwise the full list is ranked and cut first.
+    # --tenants merges every tenant's list before the shared-layer check.
+    if args.all_tenants:
+        print("🔍 Listing tenants with buyers to enrich...")
+        tenants = list_enrichment_tenants(include_overdue=args.include_overdue)
+        if not tenants:
+            print("\n✅ No tenant has buyers to enrich. Nothing to do.")
+            return
+        args.tenants = [t for t, _ in tenants]
+        print(f"  {len(tenants)} tenants, {sum(n for _, n in tenants)} (tenant, buyer) pairs; largest: "
+              + ", ".join(f"{t} ({n})" for t, n in tenants[:3]))
+    shared = bool(args.tenants)
+    stream = not args.limit and args.budget_usd is None and not shared
+
+    print("🔍 Fetching unique buyers from predictions...")
+    if stream:
+        # Listing and cache checks run inside the prefetch stage as it pulls
+        # pages; their own time is summed per page and recorded as the
+        # fetch_buyers and cache_check stages. Every uncached name is
+        # prefetched, including names dedupe later folds into an alias group:
+        # a group's representative is only known once the whole list is ranked.
+        found = [0]
+        spent = {"fetch_buyers": 0.0, "cache_check": 0.0}
+
+        def uncached():
+            pages = iter_buyer_pages(include_overdue=args.include_overdue)
+            while True:
+                started = time.perf_counter()
+                page = next(pages, None)
+                spent["fetch_buyers"] += time.perf_counter() - started
+                if page is None:
+                    return
+                found[0] += len(page)
+                if not args.no_cache_check:
+                    started = time.perf_counter()
+                    page = filter_already_cached(page, quiet=True)
+                    spent["cache_check"] += time.perf_counter() - started
+                yield from page
+
+        buyers = _prefetch(args, metrics, uncached())
+        metrics.record_stage("fetch_buyers", spent["fetch_buyers"], found[0])
+        print(f"  Found {found[0]} unique buyer/country pairs")
+        if not args.no_cache_check:
+            metrics.record_stage("cache_check", spent["cache_check"], found[0])
+            print(f"  {found[0] - len(buyers)} buyers already cached, {len(buyers)} need enrichment")
+        metrics.incr("buyers_listed_total", found[0])
+    elif shared:
+        with metrics.stage("fetch_buyers") as s:
+            buyers, listed = collect_tenant_buyers(args.tenants, include_overdue=args.include_overdue,
+                                                   cache_check=not args.no_cache_check,
+                                                   workers=args.tenant_workers)
+            s.items = listed
+        pairs = sum(len(b["tenants"]) for b in buyers)
+        metrics.incr("buyer_tenant_pairs_total", pairs)
+        print(f"  {pairs} (tenant, buyer) pairs need a brief across {len(args.tenants)} tenants: "
+              f"{len(buyers)} unique buyer/country pairs")
+
+        if not args.no_cache_check:
+            print("\n🔍 Checking the shared research layer...")
+            with metrics.stage("cache_check") as s:
+                s.items = len(buyers)
+                buyers, fresh = filter_shared_cached(buyers)
+            attachments = tenant_attachments(fresh)
+            if args.dry_run:
+                print(f"  {len(fresh)} buyers already have a shared brief; "
+                      f"would attach it for {len(attachments)} (tenant, buyer) pairs")
+            elif attachments:
+                with metrics.stage("attach") as s:
+                    attached = attach_shared_briefs(attachments)
+                    s.items = attached
+                metrics.incr("briefs_attached_total", attached)
+                print(f"  {len(fresh)} buyers already have a shared brief: attached {attached} tenant briefs")
+            print(f"  {len(buyers)} buyers need research")
+    else:
+        with metrics.stage("fetch_buyers") as s:
+            buyers = fetch_buyers(include_overdue=args.include_overdue)
+            s.items = len(buyers)
+        print(f"  Found {len(buyers)} unique buyer/country pairs")
+
+        if not args.no_cache_check:
+            print("\n🔍 Checking for existing cached briefs...")
+            with metrics.stage("cache_check") as s:
+                s.items = len(buyers)
+                buyers = filter_already_cached(buyers)
+
+    with metrics.stage("schedule") as s:
+        buyers = rank_buyers(buyers)
+        s.items = len(buyers)
+    print(f"  Ranked by priority: {priority_summary(buyers)}")
+
+    if not args.no_alias_groups:
+        with metrics.stage("dedupe") as s:
+            s.items = len(buyers)
+            buyers = group_aliases(buyers, shared_entity_ids(buyers) if shared else fetch_buyer_entity_ids(buyers))
+        folded = sum(len(b["aliases"]) for b in buyers)
+        metrics.incr("buyer_aliases_total", folded)
+        print(f"  {folded} alias names folded into {sum(1 for b in buyers if b['aliases'])} groups; "
+              f"{len(buyers)} buyers to research")
+
+    if args.limit:
+        buyers = buyers[:args.limit]
+        print(f"  Limited to the top {len(buyers)} buyers")
+
+    if args.budget_usd is not None:
+        # No request is cheaper than one without award history: never prefetch past that bound
+        cheapest, _ = build_batch_requests([{"buyer_name": "", "country": "", "award_history": None}])
+        affordable = trim_to_budget(buyers, args.budget_usd, estimate_request_cost_usd(cheapest[0]))
+        if len(affordable) < len(buyers):
+            print(f"  ${args.budget_usd:.2f} cannot cover more than the top {len(affordable)} buyers")
+            buyers = affordable
+
+    if not buyers:
+        print("\n✅ All buyers already have valid briefs. Nothing to do.")
+        return
+
+    previous = {}
+    if not args.no_cache_check and not args.no_renew:
+        previous = fetch_brief_fingerprints(buyers)
+        print(f"  {len(previous)} of them have an expired brief with a stored input fingerprint")
+
+    buyers_with_history = buyers if stream else _prefetch(args, metrics, buyers)
+
+    has_data = sum(1 for b in buyers_with_history if b["award_history"] and b["award_history"].get("stats", {}).get("total_contracts", 0) > 0)
+    print(f"  {has_data}/{len(buyers_with_history)} buyers have award history data")
+
+    # Build batch requests
+    print("\n🔨 Building batch requests...")
+    with metrics.stage("build_requests") as s:
+        requests, id_map = build_batch_requests(buyers_with_history, max_input_tokens=args.max_input_tokens)
+        s.items = len(requests)
+    print(f"  Built {len(requests)} requests")
+    if shared:
+        print(f"  ...covering {len(tenant_attachments(buyers_with_history))} tenant briefs "
+              f"({len(args.tenants)} tenants)")
+    compacted = [e["compacted_from_tokens"] for e in id_map.values() if "compacted_from_tokens" in e]
+    if compacted:
+        metrics.incr("prompts_compacted_total", len(compacted))
+        print(f"  Compacted {len(compacted)} award histories to ~{args.max_input_tokens:,} input tokens "
+              f"(largest was ~{max(compacted):,})")
+
+    # Renew expired briefs whose model input is unchanged instead of resubmitting
+    if previous:
+        unchanged = _unchanged_briefs(id_map, previous)
+        if args.dry_run:
+            renewed = {(u[0], u[1]) for u in unchanged}
+            print(f"  ♻ {len(renewed)} expired briefs unchanged; would renew instead of re-researching")
+        else:
+            with metrics.stage("renew") as s:
+                renewed = renew_shared_briefs(unchanged) if shared else renew_unchanged_briefs(unchanged)
+                s.items = len(renewed)
+            metrics.incr("briefs_renewed_total", len(renewed))
+            print(f"  ♻ Renewed {len(renewed)} unchanged briefs for {BRIEF_TTL_DAYS} more days")
+            if shared and renewed:
+                attached = attach_shared_briefs(tenant_attachments(buyers_with_history, only=renewed))
+                metrics.incr("briefs_attached_total", attached)
+                print(f"  Attached them for {attached} (tenant, buyer) pairs")
+        if renewed:
+            requests, id_map = _drop_renewed(requests, id_map, renewed)
+            print(f"  {len(requests)} requests left to submit")
+        if not requests:
+            print("\n✅ Every expired brief was unchanged. Nothing to submit.")
+            return
+
+    # Urgent buyers (tender window within --realtime-days) skip the batch queue
+    urgent_ids = set()
+    if args.realtime_days is not None:
+        from .realtime import is_urgent
+        urgent = {(b["buyer_name"], b["country"]) for b in buyers_with_history if is_urgent(b, args.realtime_days)}
+        urgent_ids = {cid for cid, e in id_map.items() if (e["buyer_name"], e["country"]) in urgent}
+
+    def request_cost(r):
+        return estimate_request_cost_usd(r, realtime=r["custom_id"] in urgent_ids)
+
+    if args.budget_usd is not None:
+        requests, id_map, deferred, planned = fit_budget(requests, id_map, args.budget_usd, request_cost)
+        metrics.incr("requests_deferred_total", deferred)
+        print(f"\n💶 Budget ${args.budget_usd:.2f}: {len(requests)} requests fit (~${planned:.2f}), "
+              f"{deferred} deferred to a later run")
+        if not requests:
+            print("\n⚠ Budget too small for a single request. Nothing to submit.")
+            return
+
+    # Country breakdown
+    by_country = {}
+    for r in requests:
+        c = r["custom_id"].split("_")[0]
+        by_country[c] = by_country.get(c, 0) + 1
+    for c, n in sorted(by_country.items()):
+        print(f"    {c}: {n}")
+
+    # Estimate cost
+    est_cost = sum(request_cost(r) for r in requests)
+    web_cost = len(requests) * EST_WEB_SEARCHES * WEB_SEARCH_USD
+    print(f"\n💰 Estimated cost: ~${est_cost:.2f}")
+    print(f"   (web search: ${web_cost:.2f} + tokens: ~${est_cost - web_cost:.2f})")
+
+    realtime_requests = [r for r in requests if r["custom_id"] in urgent_ids]
+    batch_requests = [r for r in requests if r["custom_id"] not in urgent_ids]
+    if args.realtime_days is not None:
+        realtime_cost = sum(request_cost(r) for r in realtime_requests)
+        print(f"   ⚡ realtime lane: {len(realtime_requests)} requests with a tender window within "
+              f"{args.realtime_days} days (~${realtime_cost:.2f} at standard prices)")
+        print(f"   📦 batch: {len(batch_requests)} requests (~${est_cost - realtime_cost:.2f})")
+
+    if args.dry_run:
+        _print_size_histogram(requests, id_map, args.max_input_tokens)
+
+        tok = estimate_input_tokens(requests)
+        print(f"\n🧮 Input tokens (estimated): ~{tok['input_tokens']:,} "
+              f"(~{tok['input_tokens'] // max(tok['requests'], 1):,}/request), input cost ~${tok['cost_usd']:.2f}")
+
+        print("\n🏁 Dry run complete. Use without --dry-run to submit.")
+        # Show a sample request
+        if requests:
+            sample = requests[0]
+            print(f"\n--- Sample request: {sample['custom_id']} ---")
+            print(f"System prompt: {len(sample['params']['system'])} chars")
+            print(f"User message: {len(sample['params']['messages'][0]['content'])} chars")
+            print(f"User message preview:\n{sample['params']['messages'][0]['content'][:500]}")
+        return
+
+    # Submit the batch first so it processes while the realtime lane runs
+    manifest = None
+    if batch_requests:
+        with metrics.stage("submit") as s:
+            manifest = submit_sharded(batch_requests, id_map, max_requests=args.shard_size,
+                                      max_bytes=args.shard_max_mb * 1024 * 1024)
+            s.items = len(batch_requests)
+        metrics.incr("requests_submitted_total", len(batch_requests) - len(manifest["rejected"]))
+        metrics.incr("requests_rejected_total", len(manifest["rejected"]))
+        metrics.incr("batches_submitted_total", sum(1 for sh in manifest["shards"] if sh.get("batch_id")))
+
+    if manifest is not None:
+        # Printed before the realtime lane, which may run for a while (or fail)
+        ref = manifest["manifest_id"]
+        print(f"\n📋 Next steps:")
+        print(f"   # Poll status:")
+        print(f"   python -m civant_enrich --poll {ref}")
+        print(f"   # Ingest results when complete:")
+        print(f"   python -m civant_enrich --ingest {ref}")
+        print(f"   # Or poll and ingest each batch as it ends:")
+        print(f"   python -m civant_enrich --watch {ref}")
+
+    if realtime_requests:
+        from .ledger import BatchLedger
+        from .realtime import run_realtime
+        ledger = BatchLedger()
+        try:
+            with metrics.stage("realtime") as s:
+                run_realtime(realtime_requests, {r["custom_id"]: id_map[r["custom_id"]] for r in realtime_requests},
+                             rpm=args.realtime_rpm, itpm=args.realtime_itpm, workers=args.realtime_workers,
+                             parse_workers=args.parse_workers, ledger=ledger)
+                s.items = len(realtime_requests)
+        except Exception as e:
+            # The batch is already submitted; only the realtime lane is lost
+            print(f"\n❌ Realtime lane failed: {type(e).__name__}: {e}")
+            if manifest is not None:
+                print(f"   Batch run {manifest['manifest_id']} is unaffected.")
+            print("   Buyers the lane did not write have no brief yet and are picked up by the next run.")
+        finally:
+            ledger.close()
+
+
+def _prefetch(args, metrics, buyers):
+    """
+    Award history for `buyers` (a list, or a stream of buyer pages) through
+    the bulk RPC and the local history cache as the flags allow.
+    """
+    from .fetch import award_history_bulk_available, fetch_award_history_bulk, prefetch_award_histories
+
+    what = f"{len(buyers)} buyers" if isinstance(buyers, list) else "buyers as their pages arrive"
+    print(f"\n📊 Fetching award history for {what}...")
+    bulk_fetch = None
+    if args.bulk_size > 0 and not args.cache_only:
+        if award_history_bulk_available():
+            bulk_fetch = fetch_award_history_bulk
+        else:
+            print("  ⚠ Bulk award-history RPC not found, falling back to one RPC per buyer...")
+    cache = None
+    if not args.no_history_cache:
+        from .history_cache import AwardHistoryCache
+        mode = "refresh" if args.refresh_cache else "only" if args.cache_only else "use"
+        cache = AwardHistoryCache(mode=mode)
+    try:
+        with metrics.stage("prefetch") as s:
+            buyers_with_history = prefetch_award_histories(
+                buyers, workers=args.workers, retries=args.rpc_retries,
+                bulk_fetch=bulk_fetch, bulk_size=args.bulk_size, cache=cache,
+            )
+            s.items = len(buyers_with_history)
+    finally:
+        if cache is not None:
+            for name, value in cache.stats.items():
+                metrics.incr("history_cache_total", value, result=name)
+            cache.close()
+    return buyers_with_history
+
+
+def _unchanged_briefs(id_map, previous):
+    """
+    (buyer_name, country, fingerprint) of every brief to renew rather than
+    re-research: requests whose fingerprint equals the expired brief's in
+    `previous`, plus each alias of them, which shares the same brief.
+    """
+    return [
+        (name, country, e["input_fingerprint"]) for e in id_map.values()
+        if previous.get((e["buyer_name"], e["country"])) == e["input_fingerprint"]
+        for name, country in [(e["buyer_name"], e["country"]), *e.get("aliases", ())]
+    ]
+
+
+def _drop_renewed(requests, id_map, renewed):
+    """requests and id_map without the requests whose buyer was renewed."""
+    requests = [
+        r for r in requests
+        if (id_map[r["custom_id"]]["buyer_name"], id_map[r["custom_id"]]["country"]) not in renewed
+    ]
+    return requests, {r["custom_id"]: id_map[r["custom_id"]] for r in requests}
+
+
+SIZE_BUCKETS = (1000, 2000, 4000, 8000, 16000, 32000)
+
+
+def _print_size_histogram(requests, id_map, cap):
+    """Estimated input tokens per request, before and after compaction."""
+    from .prompt import request_input_tokens
+
+    after = [request_input_tokens(r) for r in requests]
+    before = [id_map[r["custom_id"]].get("compacted_from_tokens", a) for r, a in zip(requests, after)]
+
+    def bucket(n):
+        return next((i for i, edge in enumerate(SIZE_BUCKETS) if n < edge), len(SIZE_BUCKETS))
+
+    counts_before = [0] * (len(SIZE_BUCKETS) + 1)
+    counts_after = [0] * (len(SIZE_BUCKETS) + 1)
+    for b, a in zip(before, after):
+        counts_before[bucket(b)] += 1
+        counts_after[bucket(a)] += 1
+    labels = [f"<{SIZE_BUCKETS[0] // 1000}k"] + [
+        f"{lo // 1000}-{hi // 1000}k" for lo, hi in zip(SIZE_BUCKETS, SIZE_BUCKETS[1:])
+    ] + [f">={SIZE_BUCKETS[-1] // 1000}k"]
+    widest = max(counts_before) or 1
+
+    title = f"after compaction to {cap:,}" if cap else "no --max-input-tokens cap"
+    print(f"\n📏 Input tokens per request (before → {title}):")
+    for label, nb, na in zip(labels, counts_before, counts_after):
+        if nb or na:
+            print(f"   {label:>7} {nb:>7,} → {na:<7,} {'█' * max(1, round(30 * na / widest)) if na else ''}")
+    if before:
+        print(f"   max ~{max(before):,} → ~{max(after):,}, total ~{sum(before):,} → ~{sum(after):,} tokens")
@@ -0,0 +1,98 @@
+"""
+Lazily built Supabase and Anthropic clients.
+
+Each client (and its SDK import) is created on first use and then reused,
+so commands only pay for the clients they actually call: --poll never
+imports supabase, and --help imports neither SDK. Both clients send their
+HTTP traffic through pooled_transport(): one keep-alive connection pool per
+client (HTTP/2 when h2 is installed), shared by every stage and thread, and
+metered by metrics.metered_transport().
+"""
+
+import importlib
+import importlib.util
+import os
+import socket
+import threading
+
+from .config import HTTP2, HTTP_KEEPALIVE_S, HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE, RPC_TIMEOUT_S
+
+_lock = threading.Lock()
+_supabase = None
+_anthropic = None
+
+
+def get_supabase():
+    """Service-role Supabase client (SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)."""
+    global _supabase
+    if _supabase is None:
+        with _lock:
+            if _supabase is None:
+                import httpx
+                from supabase import create_client, ClientOptions
+                http_client = httpx.Client(timeout=RPC_TIMEOUT_S, transport=pooled_transport(httpx, "supabase"))
+                _supabase = create_client(
+                    os.environ["SUPABASE_URL"], os.environ["SUPABASE_SERVICE_ROLE_KEY"],
+                    options=ClientOptions(postgrest_client_timeout=RPC_TIMEOUT_S, httpx_client=http_client),
+                )
+    return _supabase
+
+
+def get_anthropic():
+    """Anthropic client (ANTHROPIC_API_KEY)."""
+    global _anthropic
+    if _anthropic is None:
+        with _lock:
+            if _anthropic is None:
+                import anthropic
+                _anthropic = anthropic.Anthropic(
+                    api_key=os.environ["ANTHROPIC_API_KEY"],
+                    http_client=anthropic.DefaultHttpxClient(
+                        transport=pooled_transport(_http_module(anthropic.DefaultHttpxClient), "anthropic"),
+                    ),
+                )
+    return _anthropic
+
+
+def http2_enabled():
+    """ENRICH_HTTP2 if set, else whether the h2 package is importable."""
+    if HTTP2 is not None:
+        return HTTP2.strip().lower() not in ("", "0", "false", "no", "off")
+    return importlib.util.find_spec("h2") is not None
+
+
+def pooled_transport(http, client):
+    """
+    The transport both SDK clients use: a metered HTTPTransport from `http`
+    with HTTP_MAX_CONNECTIONS connections, up to HTTP_MAX_KEEPALIVE of them
+    kept open for HTTP_KEEPALIVE_S between requests, HTTP/2 negotiated over
+    TLS when http2_enabled(), and TCP keep-alive probes so idle pooled
+    connections are not silently dropped by middleboxes. An SDK client given
+    a transport ignores its own limits, so these apply as they are.
+    """
+    from .metrics import metered_transport
+
+    return metered_transport(
+        http, client,
+        limits=http.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                           keepalive_expiry=HTTP_KEEPALIVE_S),
+        http2=http2_enabled(),
+        socket_options=_keepalive_socket_options(),
+    )
+
+
+def _keepalive_socket_options():
+    options = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+    for name, value in (("TCP_KEEPIDLE", 60), ("TCP_KEEPINTVL", 60), ("TCP_KEEPCNT", 5)):
+        if hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+    return options
+
+
+def _http_module(client_cls):
+    """The httpx package an SDK client class is built on (httpx, or a fork such as httpx2)."""
+    for cls in client_cls.__mro__:
+        root = cls.__module__.partition(".")[0]
+        if root.startswith("httpx"):
+            return importlib.import_module(root)
+    return importlib.import_module("httpx")
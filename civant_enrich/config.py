@@ -0,0 +1,121 @@
+"""
+Settings for the batch enrichment pipeline.
+
+Plain constants only; nothing here touches the network or reads required
+secrets, so importing it is free. Credentials are read by civant_enrich.clients
+when a client is first needed.
+"""
+
+import os
+
+MODEL = "claude-haiku-4-5-20251001"
+MAX_TOKENS = 1500
+TENANT_ID = "civant_default"
+BRIEF_TTL_DAYS = 7
+COUNTRY_NAMES = {"ES": "Spain", "FR": "France", "IE": "Ireland"}
+
+# Pricing (Batch API: 50% discount → Haiku input $0.40/M, output $2.00/M after discount)
+BATCH_INPUT_USD_PER_MTOK = 0.40
+BATCH_OUTPUT_USD_PER_MTOK = 2.00
+STANDARD_INPUT_USD_PER_MTOK = 0.80   # Messages API (realtime lane): no batch discount
+STANDARD_OUTPUT_USD_PER_MTOK = 4.00
+CACHE_WRITE_MULTIPLIER = 1.25  # cache_creation_input_tokens vs base input price
+CACHE_READ_MULTIPLIER = 0.10   # cache_read_input_tokens vs base input price
+WEB_SEARCH_USD = 0.01          # per web_search request
+
+# Token estimates
+CHARS_PER_TOKEN = 4
+WEB_SEARCH_TOOL_TOKENS = 300  # approx. tool definition overhead per request
+
+# Buyer list: buyers per get_enrichment_buyer_priorities_page call (server cap: 5000),
+# or prediction rows per page on the direct-query fallback
+BUYER_PAGE_SIZE = 1000
+
+# Cache check: pairs per get_uncached_buyers anti-join call (server cap: 5000)
+CACHE_CHECK_BATCH_SIZE = 2000
+
+# Brief renewal: expired briefs whose input fingerprint is unchanged get a new
+# expires_at instead of a new research call
+RENEW_BATCH_SIZE = 500  # pairs per renew_buyer_research_briefs call (server cap: 1000)
+
+# Scheduling (see schedule.py): buyers are ranked by a weighted score of
+# urgency, tender window proximity, expected value and brief staleness, each
+# in [0, 1]; a missing signal scores 0.5
+PRIORITY_WEIGHTS = {"urgency": 0.35, "window": 0.25, "value": 0.25, "staleness": 0.15}
+URGENCY_SCORES = {"overdue": 1.0, "imminent": 0.85, "upcoming": 0.6, "horizon": 0.35, "distant": 0.15}
+WINDOW_HALF_LIFE_DAYS = 45        # window score halves every 45 days until the predicted tender
+VALUE_FULL_SCORE_EUR = 50_000_000  # expected value (EUR x probability) scoring 1.0, log scale
+STALE_FULL_SCORE_DAYS = 90        # days past expiry at which an expired brief scores 1.0
+
+# Prompt compaction (--max-input-tokens): cap on estimated input tokens per
+# request, system prompt included; award-history lists are trimmed to fit. Unset = no cap
+MAX_INPUT_TOKENS = int(os.environ["ENRICH_MAX_INPUT_TOKENS"]) if os.environ.get("ENRICH_MAX_INPUT_TOKENS") else None
+
+# Per-request cost estimate for --budget-usd (input tokens are estimated from the prompt)
+EST_OUTPUT_TOKENS = 800
+EST_WEB_SEARCHES = 1
+
+# HTTP connection pool (see clients.py), one per client: the Supabase and the
+# Anthropic client each talk to a single host, so these are per-host limits.
+# Keep-alive outlasts poll intervals and rate-limiter waits so those calls
+# reuse a connection instead of paying a new TCP + TLS handshake.
+# ENRICH_HTTP2: 1 / 0 to force; default on when the h2 package is installed
+HTTP_MAX_CONNECTIONS = int(os.environ.get("ENRICH_HTTP_MAX_CONNECTIONS", "64"))
+HTTP_MAX_KEEPALIVE = int(os.environ.get("ENRICH_HTTP_MAX_KEEPALIVE", str(HTTP_MAX_CONNECTIONS)))
+HTTP_KEEPALIVE_S = float(os.environ.get("ENRICH_HTTP_KEEPALIVE", "90"))
+HTTP2 = os.environ.get("ENRICH_HTTP2")
+
+# Award-history prefetch
+RPC_TIMEOUT_S = float(os.environ.get("ENRICH_RPC_TIMEOUT", "30"))
+PREFETCH_WORKERS = 8
+PREFETCH_RETRIES = 3
+PREFETCH_STREAM_CHUNK = 200    # buyers taken from a streamed list (and cache-checked) at a time
+AWARD_HISTORY_BULK_SIZE = 200  # pairs per get_buyer_award_history_bulk call (server cap: 1000)
+
+# Realtime lane (--realtime-days, see realtime.py): urgent buyers go to the
+# standard Messages API, paced by token buckets below the account's rate limits
+REALTIME_RPM = 50
+REALTIME_ITPM = 50_000          # input tokens per minute
+REALTIME_WORKERS = 8
+REALTIME_MAX_CONTINUATIONS = 3  # follow-up calls when a web-search turn is paused
+REALTIME_RETRIES = 4            # retries per call on rate-limit (429) and overloaded (529) errors
+
+# Shared research layer (--tenants, see shared.py): one brief per buyer in
+# SHARED_BRIEFS_TABLE, attached to each tenant's buyer_research_briefs
+SHARED_BRIEFS_TABLE = "shared_buyer_research_briefs"
+SHARED_BRIEF_CONFLICT_KEY = "buyer_name,country,category"
+ATTACH_BATCH_SIZE = 2000  # (tenant, buyer) pairs per attach_shared_buyer_research_briefs call (server cap: 5000)
+TENANT_WORKERS = 4        # tenants listed and cache-checked concurrently, one page each, round-robin
+
+# Submit: shards stay well inside the Batches API limits (100,000 requests / 256 MB)
+SHARD_MAX_REQUESTS = 10_000
+SHARD_MAX_BYTES = 200 * 1024 * 1024
+SUBMIT_WORKERS = 4
+
+# Poll: interval scales with requests still processing, doubling while stalled
+POLL_MIN_INTERVAL_S = 5
+POLL_MAX_INTERVAL_S = 300
+POLL_SECONDS_PER_REQUEST = 0.05
+POLL_RETRIES = 5  # transient retrieve errors retried per poll before the batch is reported failed
+
+# Ingest
+INGEST_CHUNK_SIZE = 50
+PARSE_CHUNK_SIZE = 32  # results per process-pool task
+STATE_DIR = os.environ.get("ENRICH_STATE_DIR", ".enrich_state")
+BRIEF_CONFLICT_KEY = "tenant_id,buyer_name,country,category"
+
+# Batch ledger (see ledger.py): SQLite, under STATE_DIR unless ENRICH_LEDGER is set
+LEDGER_PATH = os.environ.get("ENRICH_LEDGER") or os.path.join(STATE_DIR, "ledger.sqlite")
+
+# Award-history cache: SQLite under STATE_DIR, LRU-evicted past the size cap
+HISTORY_CACHE_PATH = os.path.join(STATE_DIR, "award_history.sqlite")
+HISTORY_CACHE_TTL_S = float(os.environ.get("ENRICH_HISTORY_TTL", str(24 * 3600)))
+HISTORY_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Metrics export (see metrics.py); unset = in-memory only
+METRICS_JSONL = os.environ.get("ENRICH_METRICS_JSONL")
+METRICS_PROM = os.environ.get("ENRICH_METRICS_PROM")
+
+# --profile (see profiling.py): stack sampling period and summary length
+PROFILE_SAMPLE_INTERVAL_S = 0.005
+PROFILE_TOP_N = 20
@@ -0,0 +1,509 @@
+"""
+Stage 1-2: pick buyers to enrich and fetch their award history.
+"""
+
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+from .clients import get_supabase
+from .config import (
+    BRIEF_TTL_DAYS, BUYER_PAGE_SIZE, CACHE_CHECK_BATCH_SIZE, PREFETCH_RETRIES, PREFETCH_STREAM_CHUNK,
+    PREFETCH_WORKERS, RENEW_BATCH_SIZE, TENANT_ID,
+)
+from .schedule import merge_prediction_rows
+
+
+# ---------------------------------------------------------------------------
+# Step 1: Fetch unique buyers from predictions
+# ---------------------------------------------------------------------------
+def fetch_buyers(include_overdue=False, tenant_id=TENANT_ID):
+    """
+    Get unique buyers from a tenant's predictions that need briefs.
+
+    Collects iter_buyer_pages(); see there for the sources and their order.
+    Buyers from get_enrichment_buyer_priorities[_page] (or the direct
+    fallback query) carry the urgency / window / value / brief-expiry
+    signals schedule.rank_buyers() scores; get_batch_enrichment_buyers rows
+    carry names only and rank on neutral defaults.
+    """
+    return [b for page in iter_buyer_pages(include_overdue=include_overdue, tenant_id=tenant_id) for b in page]
+
+
+def iter_buyer_pages(include_overdue=False, page_size=BUYER_PAGE_SIZE, tenant_id=TENANT_ID):
+    """
+    Yield unique buyers from predictions one page (list) at a time, so
+    callers can start work before the full list has arrived.
+
+    Pages come from get_enrichment_buyer_priorities_page, keyset-paginated on
+    (buyer_name, country) with DISTINCT applied server-side. If that RPC is
+    missing, the unpaged RPCs are tried and their result yielded as a single
+    page; failing those, predictions is read directly, keyset-paginated on
+    (buyer_name, country, id) so PostgREST's row cap cannot truncate it.
+    """
+    urgencies = ["upcoming"]
+    if include_overdue:
+        urgencies.append("overdue")
+
+    after = (None, None)
+    first = True
+    while True:
+        try:
+            resp, _ = _with_retries(lambda: get_supabase().rpc("get_enrichment_buyer_priorities_page", {
+                "p_tenant_id": tenant_id,
+                "p_category": "forecast",
+                "p_urgencies": urgencies,
+                "p_after_buyer_name": after[0],
+                "p_after_country": after[1],
+                "p_limit": page_size,
+            }).execute(), PREFETCH_RETRIES)
+        except Exception:
+            if not first:
+                raise
+            break
+        first = False
+        page = resp.data or []
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        after = (page[-1]["buyer_name"], page[-1]["country"])
+
+    for rpc, params in (
+        ("get_enrichment_buyer_priorities", {"p_tenant_id": tenant_id, "p_category": "forecast",
+                                             "p_urgencies": urgencies}),
+        ("get_batch_enrichment_buyers", {"p_tenant_id": tenant_id, "p_urgencies": urgencies}),
+    ):
+        try:
+            resp = get_supabase().rpc(rpc, params).execute()
+            if resp.data:
+                yield resp.data
+                return
+        except Exception:
+            pass
+
+    # Fallback: direct query if RPC doesn't exist yet
+    print("⚠ RPC not found, using direct query fallback...")
+    yield from _iter_prediction_buyers(urgencies, page_size, tenant_id)
+
+
+def _postgrest_value(value):
+    """Quote a value for a PostgREST or=(...) filter."""
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _iter_prediction_buyers(urgencies, page_size, tenant_id):
+    """
+    Read predictions ordered by (buyer_name, country, id), page_size rows at
+    a time after the last row seen, and merge each buyer's rows as they
+    arrive. A buyer is yielded once a later buyer's row shows its rows are
+    complete, so one spanning a page boundary is still merged whole.
+    """
+    after = None
+    rows = []
+    while True:
+        query = get_supabase().table("predictions") \
+            .select("id, buyer_name, country, urgency, predicted_tender_date, probability, total_value_eur") \
+            .eq("tenant_id", tenant_id) \
+            .in_("urgency", urgencies) \
+            .in_("validation_status", ["pending", "confirmed"]) \
+            .not_.is_("buyer_name", "null") \
+            .not_.is_("country", "null")
+        if after is not None:
+            name, country, row_id = (_postgrest_value(v) for v in after)
+            query = query.or_(f"buyer_name.gt.{name},"
+                              f"and(buyer_name.eq.{name},country.gt.{country}),"
+                              f"and(buyer_name.eq.{name},country.eq.{country},id.gt.{row_id})")
+        query = query.order("buyer_name").order("country").order("id").limit(page_size)
+        resp, _ = _with_retries(query.execute, PREFETCH_RETRIES)
+        data = resp.data or []
+
+        page = []
+        for row in data:
+            if rows and (row["buyer_name"], row["country"]) != (rows[0]["buyer_name"], rows[0]["country"]):
+                # Keep each buyer's most urgent / earliest / largest signals
+                page.extend(merge_prediction_rows(rows))
+                rows = []
+            rows.append(row)
+        if len(data) < page_size:
+            page.extend(merge_prediction_rows(rows))
+            if page:
+                yield page
+            return
+        if page:
+            yield page
+        last = data[-1]
+        after = (last["buyer_name"], last["country"], last["id"])
+
+
+def fetch_buyer_entity_ids(buyers, tenant_id=TENANT_ID):
+    """
+    Canonical buyer entity id per buyer (None where unresolved), aligned with
+    `buyers`, via get_buyer_entity_ids in CACHE_CHECK_BATCH_SIZE chunks.
+    Returns None when the RPC is unavailable; grouping then uses names only.
+    """
+    entity_ids = []
+    try:
+        for i in range(0, len(buyers), CACHE_CHECK_BATCH_SIZE):
+            chunk = buyers[i:i+CACHE_CHECK_BATCH_SIZE]
+            resp, _ = _with_retries(lambda: get_supabase().rpc("get_buyer_entity_ids", {
+                "p_tenant_id": tenant_id,
+                "p_buyer_names": [b["buyer_name"] for b in chunk],
+                "p_countries": [b["country"] for b in chunk],
+            }).execute(), PREFETCH_RETRIES)
+            ids = [None] * len(chunk)
+            for row in resp.data or []:
+                ids[row["idx"] - 1] = row.get("entity_id")
+            entity_ids.extend(ids)
+    except Exception as e:
+        print(f"  ⚠ get_buyer_entity_ids unavailable ({e}), grouping aliases by name only...")
+        return None
+    return entity_ids
+
+
+def filter_already_cached(buyers, quiet=False, tenant_id=TENANT_ID):
+    """
+    Remove buyers that already have a valid (non-expired) brief for the tenant.
+    quiet suppresses the summary line (streamed pages print one at the end).
+
+    Runs server-side through the get_uncached_buyers anti-join,
+    CACHE_CHECK_BATCH_SIZE pairs per call. Each kept buyer gains a
+    "brief_fingerprint" key: the input fingerprint of its expired brief, or
+    None. Falls back to buyer_name IN-list queries if the RPC is missing.
+    """
+    try:
+        filtered = _filter_uncached_rpc(buyers, tenant_id)
+    except Exception as e:
+        print(f"  ⚠ get_uncached_buyers unavailable ({e}), using IN-list fallback...")
+        filtered = _filter_cached_in_list(buyers, tenant_id)
+    if not quiet:
+        print(f"  {len(buyers) - len(filtered)} buyers already cached, {len(filtered)} need enrichment")
+    return filtered
+
+
+def _filter_uncached_rpc(buyers, tenant_id):
+    filtered = []
+    for i in range(0, len(buyers), CACHE_CHECK_BATCH_SIZE):
+        chunk = buyers[i:i+CACHE_CHECK_BATCH_SIZE]
+        resp, _ = _with_retries(lambda: get_supabase().rpc("get_uncached_buyers", {
+            "p_tenant_id": tenant_id,
+            "p_category": "forecast",
+            "p_buyer_names": [b["buyer_name"] for b in chunk],
+            "p_countries": [b["country"] for b in chunk],
+        }).execute(), PREFETCH_RETRIES)
+        for row in resp.data or []:
+            filtered.append({**chunk[row["idx"] - 1], "brief_fingerprint": row.get("expired_fingerprint")})
+    return filtered
+
+
+def _filter_cached_in_list(buyers, tenant_id):
+    cutoff = datetime.now(timezone.utc).isoformat()
+    cached_set = set()
+
+    # Check in batches of 50
+    for i in range(0, len(buyers), 50):
+        batch = buyers[i:i+50]
+        names = [b["buyer_name"] for b in batch]
+        resp = get_supabase().table("buyer_research_briefs") \
+            .select("buyer_name, country") \
+            .eq("tenant_id", tenant_id) \
+            .eq("category", "forecast") \
+            .eq("status", "complete") \
+            .gt("expires_at", cutoff) \
+            .in_("buyer_name", names) \
+            .execute()
+        if resp.data:
+            for row in resp.data:
+                cached_set.add((row["buyer_name"], row["country"]))
+
+    return [b for b in buyers if (b["buyer_name"], b["country"]) not in cached_set]
+
+
+def fetch_brief_fingerprints(buyers, tenant_id=TENANT_ID):
+    """
+    Input fingerprints of expired briefs for these buyers, as
+    {(buyer_name, country): fingerprint}. Briefs without a fingerprint are
+    left out. Uses the "brief_fingerprint" keys filter_already_cached() set
+    when it had them; otherwise queries, returning {} (and warning) if the
+    column is not deployed yet.
+    """
+    if buyers and all("brief_fingerprint" in b for b in buyers):
+        return {(b["buyer_name"], b["country"]): b["brief_fingerprint"]
+                for b in buyers if b["brief_fingerprint"]}
+
+    cutoff = datetime.now(timezone.utc).isoformat()
+    wanted = {(b["buyer_name"], b["country"]) for b in buyers}
+    fingerprints = {}
+    try:
+        for i in range(0, len(buyers), 50):
+            names = [b["buyer_name"] for b in buyers[i:i+50]]
+            resp = get_supabase().table("buyer_research_briefs") \
+                .select("buyer_name, country, input_fingerprint") \
+                .eq("tenant_id", tenant_id) \
+                .eq("category", "forecast") \
+                .eq("status", "complete") \
+                .lte("expires_at", cutoff) \
+                .not_.is_("input_fingerprint", "null") \
+                .in_("buyer_name", names) \
+                .execute()
+            for row in resp.data or []:
+                key = (row["buyer_name"], row["country"])
+                if key in wanted:
+                    fingerprints[key] = row["input_fingerprint"]
+    except Exception as e:
+        print(f"  ⚠ Brief fingerprints unavailable ({e}); expired briefs will be re-researched")
+        return {}
+    return fingerprints
+
+
+def renew_unchanged_briefs(unchanged, ttl_days=BRIEF_TTL_DAYS, tenant_id=TENANT_ID):
+    """
+    Extend expires_at for briefs whose stored fingerprint still matches.
+    unchanged is a list of (buyer_name, country, fingerprint); returns the set
+    of (buyer_name, country) the server actually renewed. A failed call
+    renews nothing, so those buyers are simply researched again.
+    """
+    renewed = set()
+    for i in range(0, len(unchanged), RENEW_BATCH_SIZE):
+        chunk = unchanged[i:i+RENEW_BATCH_SIZE]
+        try:
+            resp = get_supabase().rpc("renew_buyer_research_briefs", {
+                "p_tenant_id": tenant_id,
+                "p_category": "forecast",
+                "p_buyer_names": [c[0] for c in chunk],
+                "p_countries": [c[1] for c in chunk],
+                "p_fingerprints": [c[2] for c in chunk],
+                "p_ttl_days": ttl_days,
+            }).execute()
+        except Exception as e:
+            print(f"  ⚠ Brief renewal failed for {len(chunk)} buyers: {e}")
+            continue
+        for row in resp.data or []:
+            renewed.add((row["buyer_name"], row["country"]))
+    return renewed
+
+
+# ---------------------------------------------------------------------------
+# Step 2: Fetch award history for each buyer
+# ---------------------------------------------------------------------------
+def _rpc_award_history(buyer_name, country):
+    """Call the get_buyer_award_history RPC for a single buyer (raises on error)."""
+    resp = get_supabase().rpc("get_buyer_award_history", {
+        "p_buyer_name": buyer_name,
+        "p_country": country,
+    }).execute()
+    return resp.data if resp.data else None
+
+
+def fetch_award_history(buyer_name, country, cache=None):
+    """Call the get_buyer_award_history RPC for a single buyer, through `cache` if given."""
+    if cache is not None:
+        found = cache.get_many([(buyer_name, country)])
+        if (buyer_name, country) in found or cache.mode == "only":
+            return found.get((buyer_name, country))
+    try:
+        history = _rpc_award_history(buyer_name, country)
+    except Exception as e:
+        print(f"  ⚠ Award history failed for {buyer_name}: {e}")
+        return None
+    if cache is not None:
+        cache.put_many([((buyer_name, country), history)])
+    return history
+
+
+def award_history_bulk_available():
+    """
+    Probe for get_buyer_award_history_bulk (added 2026-03-02). False only
+    when PostgREST reports the function missing; transient errors are
+    retried and anything else raises, rather than silently falling back to
+    one RPC per buyer.
+    """
+    try:
+        _with_retries(lambda: get_supabase().rpc("get_buyer_award_history_bulk", {
+            "p_buyer_names": [],
+            "p_countries": [],
+        }).execute(), PREFETCH_RETRIES)
+        return True
+    except Exception as e:
+        if _is_missing_function(e):
+            return False
+        raise
+
+
+def fetch_award_history_bulk(buyers):
+    """
+    Fetch award history for a chunk of buyers in one get_buyer_award_history_bulk
+    call. Returns histories in the same order as `buyers` (None where empty).
+    Raises on error so the prefetch engine can retry the whole chunk.
+    """
+    resp = get_supabase().rpc("get_buyer_award_history_bulk", {
+        "p_buyer_names": [b["buyer_name"] for b in buyers],
+        "p_countries": [b["country"] for b in buyers],
+    }).execute()
+    return split_bulk_award_history(resp.data or [], len(buyers))
+
+
+def split_bulk_award_history(rows, n):
+    """Map keyed bulk rows (1-based idx) back onto a list of n histories."""
+    histories = [None] * n
+    for row in rows:
+        i = row.get("idx")
+        if isinstance(i, int) and 1 <= i <= n:
+            histories[i - 1] = row.get("award_history") or None
+    return histories
+
+
+# Postgres SQLSTATEs worth retrying: statement timeout, serialization failure,
+# deadlock, too many connections, cannot connect now.
+_TRANSIENT_PG_CODES = {"57014", "40001", "40P01", "53300", "57P03"}
+
+
+def _is_transient(exc):
+    """True for errors that are likely to succeed on retry."""
+    import httpx  # only reached on an error, once a client has imported it
+
+    if isinstance(exc, (httpx.TimeoutException, httpx.TransportError)):
+        return True
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in (429, 502, 503, 504)
+    return str(getattr(exc, "code", "") or "") in _TRANSIENT_PG_CODES
+
+
+def _is_missing_function(exc):
+    """True when PostgREST reports an RPC that is not deployed (PGRST202, or 42883 / 404 from older versions)."""
+    if str(getattr(exc, "code", "") or "") in ("PGRST202", "42883"):
+        return True
+    import httpx
+
+    return isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code == 404
+
+
+def _with_retries(fn, retries, base_delay=0.5):
+    """
+    Run fn() retrying transient failures with jittered exponential backoff.
+    Returns (result, attempts). Re-raises the last error once retries run out.
+    """
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return fn(), attempt
+        except Exception as e:
+            if attempt > retries or not _is_transient(e):
+                raise
+            time.sleep(base_delay * (2 ** (attempt - 1)) * (0.5 + random.random()))
+
+
+def prefetch_award_histories(buyers, workers=PREFETCH_WORKERS, retries=PREFETCH_RETRIES,
+                             bulk_fetch=None, bulk_size=100, cache=None):
+    """
+    Fetch award history for every buyer with bounded concurrency.
+
+    Work is split into units and run on a thread pool of `workers` threads.
+    Without `bulk_fetch` each unit is one get_buyer_award_history RPC; with
+    `bulk_fetch` (a callable taking a list of buyers and returning a list of
+    histories in the same order) each unit covers up to `bulk_size` buyers.
+    Transient failures are retried with backoff; a unit that still fails
+    leaves its buyers with award_history=None, as fetch_award_history does.
+
+    `buyers` may be any iterable, including a generator over
+    iter_buyer_pages(): it is consumed incrementally and units are submitted
+    as soon as enough buyers have arrived, so fetching overlaps the listing.
+
+    With an AwardHistoryCache, fresh cached histories are used as-is and only
+    misses are fetched; successful fetches are written back as each unit
+    completes. In cache mode "only" misses are not fetched at all.
+
+    Returns the buyers, in input order, each with an award_history key.
+    """
+    size = bulk_size if bulk_fetch else 1
+    # Buyers are taken from the input (and looked up in the cache) this many at a time
+    chunk_size = max(size, PREFETCH_STREAM_CHUNK)
+
+    def run_unit(unit):
+        if bulk_fetch:
+            return bulk_fetch(unit)
+        b = unit[0]
+        return [_rpc_award_history(b["buyer_name"], b["country"])]
+
+    all_buyers = []
+    histories = []
+    lock = threading.Lock()
+    stats = {"pending": 0, "units": 0, "skipped": 0, "done": 0, "retries": 0, "failed": 0}
+    started = time.monotonic()
+
+    def task(positions):
+        unit = [all_buyers[i] for i in positions]
+        try:
+            result, attempts = _with_retries(lambda: run_unit(unit), retries)
+        except Exception as e:
+            label = unit[0]["buyer_name"] if len(unit) == 1 else f"{len(unit)} buyers"
+            print(f"  ⚠ Award history failed for {label}: {e}")
+            result, attempts = [None] * len(unit), retries + 1
+            with lock:
+                stats["failed"] += len(unit)
+        else:
+            if cache is not None:
+                cache.put_many([((b["buyer_name"], b["country"]), h) for b, h in zip(unit, result)])
+        with lock:
+            for i, history in zip(positions, result):
+                histories[i] = history
+            stats["retries"] += attempts - 1
+            before = stats["done"]
+            stats["done"] += len(unit)
+            if stats["done"] // 50 > before // 50:
+                print(f"  {stats['done']}/{stats['pending']}...")
+
+    futures = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for chunk in _chunks(buyers, chunk_size):
+            with lock:
+                base = len(all_buyers)
+                all_buyers.extend(chunk)
+                histories.extend([None] * len(chunk))
+            pending = list(range(base, base + len(chunk)))
+            if cache is not None:
+                cached = cache.get_many([(b["buyer_name"], b["country"]) for b in chunk])
+                pending = []
+                for i, b in enumerate(chunk, start=base):
+                    key = (b["buyer_name"], b["country"])
+                    if key in cached:
+                        histories[i] = cached[key]
+                    else:
+                        pending.append(i)
+                if cache.mode == "only":
+                    stats["skipped"] += len(pending)
+                    pending = []
+            with lock:
+                stats["pending"] += len(pending)
+            for i in range(0, len(pending), size):
+                futures.append(pool.submit(task, pending[i:i+size]))
+        for fut in as_completed(futures):
+            fut.result()
+
+    elapsed = time.monotonic() - started
+    rate = stats["pending"] / elapsed if elapsed > 0 else 0.0
+    print(f"  Fetched {stats['pending']} award histories in {elapsed:.1f}s "
+          f"({rate:.1f} buyers/s, {len(futures)} requests, {workers} workers, "
+          f"{stats['retries']} retries, {stats['failed']} failed)")
+    if cache is not None:
+        print(f"  {cache.summary()}")
+        if stats["skipped"]:
+            print(f"  --cache-only: {stats['skipped']} buyers not in cache left without award history")
+
+    # Keep the buyer's other keys (priority, aliases, ...) for the request builder
+    return [{**b, "award_history": h} for b, h in zip(all_buyers, histories)]
+
+
+def _chunks(iterable, n):
+    """Lists of up to n items from any iterable, without materializing it."""
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == n:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
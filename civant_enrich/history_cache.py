@@ -0,0 +1,136 @@
+"""
+On-disk award-history cache.
+
+get_buyer_award_history payloads keyed by (buyer_name, country) in a SQLite
+file, so dry runs, --limit trials and prompt iteration stop re-fetching
+from Supabase. Entries expire after a TTL; once the file's payloads exceed
+a size cap the least recently used entries are evicted. Safe to share
+across the prefetch thread pool.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .config import HISTORY_CACHE_MAX_BYTES, HISTORY_CACHE_PATH, HISTORY_CACHE_TTL_S
+
+_SCHEMA = """
+create table if not exists award_history (
+  buyer_name  text not null,
+  country     text not null,
+  payload     text not null,
+  size        integer not null,
+  fetched_at  real not null,
+  accessed_at real not null,
+  primary key (buyer_name, country)
+);
+create index if not exists award_history_accessed_at_idx on award_history (accessed_at);
+"""
+
+
+class AwardHistoryCache:
+    """
+    mode is "use" (read and write), "refresh" (ignore stored entries but
+    store fresh ones) or "only" (never fetch; misses stay without history).
+    """
+
+    def __init__(self, path=HISTORY_CACHE_PATH, ttl_s=HISTORY_CACHE_TTL_S,
+                 max_bytes=HISTORY_CACHE_MAX_BYTES, mode="use"):
+        if mode not in ("use", "refresh", "only"):
+            raise ValueError(f"unknown cache mode {mode!r}")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self.mode = mode
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "stored": 0, "evicted": 0}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("pragma journal_mode=wal")
+        self._db.executescript(_SCHEMA)
+
+    def get_many(self, keys):
+        """
+        Look up (buyer_name, country) keys. Returns {key: history} for fresh
+        hits only (history may be None for buyers known to have none). In
+        "refresh" mode nothing is a hit.
+        """
+        if self.mode == "refresh":
+            with self._lock:
+                self.stats["misses"] += len(keys)
+            return {}
+        now = time.time()
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), 400):
+                chunk = keys[i:i+400]
+                where = " or ".join(["(buyer_name = ? and country = ?)"] * len(chunk))
+                params = [v for key in chunk for v in key]
+                for name, country, payload, fetched_at in self._db.execute(
+                    f"select buyer_name, country, payload, fetched_at from award_history where {where}",
+                    params,
+                ):
+                    if now - fetched_at > self.ttl_s:
+                        self.stats["expired"] += 1
+                        continue
+                    found[(name, country)] = json.loads(payload)
+            if found:
+                self._db.executemany(
+                    "update award_history set accessed_at = ? where buyer_name = ? and country = ?",
+                    [(now, name, country) for name, country in found],
+                )
+            self.stats["hits"] += len(found)
+            self.stats["misses"] += len(keys) - len(found)
+        return found
+
+    def put_many(self, items):
+        """Store [((buyer_name, country), history)]; history None is cached too."""
+        now = time.time()
+        rows = []
+        for (name, country), history in items:
+            payload = json.dumps(history, separators=(",", ":"))
+            rows.append((name, country, payload, len(payload), now, now))
+        with self._lock:
+            self._db.executemany(
+                "insert or replace into award_history "
+                "(buyer_name, country, payload, size, fetched_at, accessed_at) values (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.stats["stored"] += len(rows)
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under max_bytes."""
+        with self._lock:
+            cur = self._db.execute("delete from award_history where fetched_at < ?",
+                                   (time.time() - self.ttl_s,))
+            evicted = cur.rowcount
+            total = self._db.execute("select coalesce(sum(size), 0) from award_history").fetchone()[0]
+            if total > self.max_bytes:
+                doomed = []
+                for name, country, size in self._db.execute(
+                    "select buyer_name, country, size from award_history order by accessed_at"
+                ):
+                    if total <= self.max_bytes:
+                        break
+                    doomed.append((name, country))
+                    total -= size
+                self._db.executemany(
+                    "delete from award_history where buyer_name = ? and country = ?", doomed,
+                )
+                evicted += len(doomed)
+            self.stats["evicted"] += evicted
+        return evicted
+
+    def summary(self):
+        s = self.stats
+        looked_up = s["hits"] + s["misses"]
+        rate = s["hits"] / looked_up * 100 if looked_up else 0.0
+        return (f"History cache: {s['hits']} hits, {s['misses']} misses ({s['expired']} expired), "
+                f"{rate:.0f}% hit rate, {s['stored']} stored, {s['evicted']} evicted")
+
+    def close(self):
+        self.evict()
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,471 @@
+"""
+Stage 7: stream batch results into buyer_research_briefs (or, under
+--tenants, into the shared research layer and attach them per tenant).
+"""
+
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from .clients import get_anthropic, get_supabase
+from .config import (
+    BRIEF_CONFLICT_KEY, BRIEF_TTL_DAYS, INGEST_CHUNK_SIZE, PARSE_CHUNK_SIZE, SHARED_BRIEF_CONFLICT_KEY,
+    SHARED_BRIEFS_TABLE, STATE_DIR, TENANT_ID,
+)
+from .fetch import _is_transient
+from .ledger import BatchLedger
+from .metrics import METRICS
+from .parse import parse_chunk
+from .realtime import REALTIME_PREFIX
+from .shared import attach_shared_briefs
+from .submit import load_id_map
+
+
+SCORE_BANDS = [(80, "80-100"), (60, "60-79"), (40, "40-59"), (20, "20-39"), (0, "0-19")]
+
+
+class IngestStats:
+    """Running aggregates over ingested briefs (no rows are retained)."""
+
+    def __init__(self):
+        self.succeeded = 0
+        self.errored = 0
+        self.skipped = 0
+        self.upserted = 0
+        self.write_failed = 0
+        self.alias_rows = 0
+        self.attached = 0
+        self.total_tokens = 0
+        self.total_cost = 0.0
+        self.score_count = 0
+        self.score_sum = 0
+        self.score_min = None
+        self.score_max = None
+        self.score_bands = {label: 0 for _, label in SCORE_BANDS}
+        self.strategies = {}
+
+    def add(self, row, strategy=None):
+        self.succeeded += 1
+        if strategy:
+            self.strategies[strategy] = self.strategies.get(strategy, 0) + 1
+        self.total_tokens += row.get("tokens_used") or 0
+        self.total_cost += row.get("research_cost_usd") or 0
+        score = row.get("opportunity_score")
+        if score is None:
+            return
+        self.score_count += 1
+        self.score_sum += score
+        self.score_min = score if self.score_min is None else min(self.score_min, score)
+        self.score_max = score if self.score_max is None else max(self.score_max, score)
+        for floor, label in SCORE_BANDS:
+            if score >= floor:
+                self.score_bands[label] += 1
+                break
+
+    def print_summary(self):
+        avg_score = self.score_sum / self.score_count if self.score_count else 0
+        print(f"\n{'='*60}")
+        print(f"✅ BATCH ENRICHMENT COMPLETE")
+        print(f"{'='*60}")
+        print(f"  Succeeded:  {self.succeeded}")
+        print(f"  Errored:    {self.errored}")
+        print(f"  Skipped:    {self.skipped}")
+        print(f"  Upserted:   {self.upserted}")
+        if self.write_failed:
+            print(f"  Not written: {self.write_failed} results (upsert failed)")
+        if self.alias_rows:
+            print(f"  Alias copies: {self.alias_rows}")
+        if self.attached:
+            print(f"  Attached:   {self.attached} tenant briefs")
+        print(f"  Total tokens: {self.total_tokens:,}")
+        print(f"  Total cost:   ${self.total_cost:.2f}")
+        print(f"  Avg opp score: {avg_score:.1f}")
+        if self.score_count:
+            print(f"  Score range:  {self.score_min}-{self.score_max}")
+            bands = ", ".join(f"{label}: {self.score_bands[label]}" for _, label in SCORE_BANDS)
+            print(f"  Score bands:  {bands}")
+        if self.strategies:
+            tiers = ", ".join(f"{k}: {v}" for k, v in sorted(self.strategies.items()))
+            print(f"  Parse tiers:  {tiers}")
+        print(f"{'='*60}")
+
+    def record(self, metrics):
+        """Add this batch's totals to a metrics registry."""
+        metrics.incr("results_total", self.succeeded, outcome="succeeded")
+        metrics.incr("results_total", self.errored, outcome="errored")
+        metrics.incr("results_total", self.skipped, outcome="skipped")
+        metrics.incr("briefs_upserted_total", self.upserted)
+        metrics.incr("brief_alias_copies_total", self.alias_rows)
+        metrics.incr("briefs_attached_total", self.attached)
+        metrics.incr("tokens_total", self.total_tokens)
+        metrics.incr("research_cost_usd_total", round(self.total_cost, 6))
+        for strategy, n in self.strategies.items():
+            metrics.incr("parse_strategy_total", n, strategy=strategy)
+
+
+def message_payload(message):
+    """Reduce a batch message to the picklable (raw_text, usage) a parse task needs."""
+    text_blocks = [b.text for b in message.content if b.type == "text"]
+    usage = message.usage
+    web_searches = 0
+    if hasattr(usage, 'server_tool_use') and usage.server_tool_use:
+        web_searches = getattr(usage.server_tool_use, 'web_search_requests', 0) or 0
+    return "\n".join(text_blocks), {
+        "input_tokens": usage.input_tokens or 0,
+        "output_tokens": usage.output_tokens or 0,
+        "cache_creation_input_tokens": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+        "cache_read_input_tokens": getattr(usage, "cache_read_input_tokens", 0) or 0,
+        "web_search_requests": web_searches,
+    }
+
+
+def write_briefs(chunk, table_name="buyer_research_briefs", on_conflict=BRIEF_CONFLICT_KEY):
+    """
+    Upsert a chunk of brief rows on (tenant_id, buyer_name, country, category),
+    or into table_name on the on_conflict key given; falls back to one row at
+    a time. Returns {(buyer_name, country): error} for the rows that could
+    not be written (empty when all were). Re-raises when no row could be
+    written and the failure is transient (e.g. Supabase unreachable) so the
+    caller does not advance its checkpoint past them.
+    """
+    table = get_supabase().table(table_name)
+    try:
+        table.upsert(chunk, on_conflict=on_conflict).execute()
+        return {}
+    except Exception as e:
+        # Try one by one on failure
+        print(f"  ⚠ Batch upsert failed, trying individually: {e}")
+        failed = {}
+        transient = True
+        for row in chunk:
+            try:
+                table.upsert(row, on_conflict=on_conflict).execute()
+            except Exception as e2:
+                print(f"  ❌ Failed: {row['buyer_name']}: {e2}")
+                failed[(row["buyer_name"], row["country"])] = f"upsert failed: {e2}"
+                transient = transient and _is_transient(e2)
+        if len(failed) == len(chunk) and transient:
+            raise
+        return failed
+
+
+# ---------------------------------------------------------------------------
+# Ingest checkpoints: {position, last_custom_id, complete, retry} per batch.
+# retry holds the parsed results whose rows could not all be upserted (ledger
+# row, brief rows, shared-layer attachments); the next pass writes them
+# first, and the batch is not complete while any remain.
+# ---------------------------------------------------------------------------
+def _checkpoint_path(batch_id):
+    return os.path.join(STATE_DIR, f"ingest_{batch_id}.json")
+
+
+def load_checkpoint(batch_id):
+    """Return the saved ingest checkpoint for a batch (or a fresh one)."""
+    try:
+        with open(_checkpoint_path(batch_id)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"position": 0, "last_custom_id": None, "complete": False}
+
+
+def save_checkpoint(batch_id, state):
+    """Write the checkpoint atomically (tmp file + rename)."""
+    os.makedirs(STATE_DIR, exist_ok=True)
+    path = _checkpoint_path(batch_id)
+    state = {**state, "updated_at": datetime.now(timezone.utc).isoformat()}
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f)
+    os.replace(path + ".tmp", path)
+
+
+def ingest_results(batch_id, chunk_size=INGEST_CHUNK_SIZE, restart=False, parse_workers=1,
+                   id_map=None, ledger=None):
+    """
+    Stream batch results into buyer_research_briefs.
+
+    Results are parsed as they are downloaded and upserted in chunks of
+    `chunk_size` rows, so memory stays flat regardless of batch size. After
+    every committed chunk the result position and its custom_id are saved to
+    a checkpoint; a re-run resumes after that point, and a re-run of a fully
+    ingested batch is a no-op. Results whose rows could not all be upserted
+    stay in the checkpoint and are retried by the next run; until they are
+    written the batch is not marked complete. Safe to run from cron.
+
+    With parse_workers > 1, JSON extraction and row building run in a
+    process pool; rows still reach the database in result order.
+
+    id_map defaults to the batch's map in the ledger (a BatchLedger at
+    LEDGER_PATH unless one is given), read one custom_id at a time, or to a
+    legacy batch_<id>_map.json. Each result's status, tokens, cost, parse
+    strategy and ingest state are recorded in the ledger as its chunk is
+    committed. Returns the IngestStats of this pass, or None when there was
+    nothing to ingest.
+    """
+    own_ledger = ledger is None
+    if own_ledger:
+        ledger = BatchLedger()
+    try:
+        return _ingest_batch(batch_id, chunk_size, restart, parse_workers, id_map, ledger)
+    finally:
+        if own_ledger:
+            ledger.close()
+
+
+def _ingest_batch(batch_id, chunk_size, restart, parse_workers, id_map, ledger):
+    checkpoint = {"position": 0, "last_custom_id": None, "complete": False} \
+        if restart else load_checkpoint(batch_id)
+    if checkpoint.get("complete"):
+        print(f"\n✅ Batch {batch_id} already ingested "
+              f"({checkpoint.get('upserted', 0)} briefs). Use --restart to ingest again.")
+        return
+
+    if batch_id.startswith(REALTIME_PREFIX):
+        # A realtime lane has no results to download again: only its unwritten rows are left
+        if id_map is None:
+            id_map = load_id_map(batch_id, ledger)
+        print(f"\n📥 Retrying {len(checkpoint.get('retry') or [])} unwritten results of {batch_id}...")
+        stats = _ingest_stream(batch_id, id_map or {}, checkpoint, chunk_size, parse_workers, ledger, results=())
+        return _finish(batch_id, checkpoint, stats, ledger)
+
+    batch = get_anthropic().messages.batches.retrieve(batch_id)
+    ledger.update_batch(batch_id, processing_status=batch.processing_status,
+                        ended_at=batch.ended_at.isoformat() if batch.ended_at else None)
+    if batch.processing_status != "ended":
+        print(f"\n⏳ Batch {batch_id} is still {batch.processing_status}; nothing to ingest yet.")
+        return
+
+    print(f"\n📥 Downloading results for batch {batch_id}...")
+
+    if id_map is None:
+        id_map = load_id_map(batch_id, ledger)
+    if id_map is None:
+        return
+
+    stats = _ingest_stream(batch_id, id_map, checkpoint, chunk_size, parse_workers, ledger)
+    if stats is None:
+        # Result order changed since the checkpoint; upserts make a full pass safe.
+        print("  ⚠ Checkpoint does not match result order, re-ingesting from the start...")
+        checkpoint = {"position": 0, "last_custom_id": None, "complete": False}
+        stats = _ingest_stream(batch_id, id_map, checkpoint, chunk_size, parse_workers, ledger)
+
+    return _finish(batch_id, checkpoint, stats, ledger)
+
+
+def ingest_stream(batch_id, results, id_map, chunk_size=INGEST_CHUNK_SIZE, parse_workers=1, ledger=None,
+                  realtime=False):
+    """
+    Ingest an iterable of batch-shaped results (objects with custom_id and
+    result.type / .message / .error) that did not come from a batch, e.g.
+    the realtime lane's responses as they complete. Same parsing, upserts,
+    alias copies and ledger records as ingest_results(); realtime=True
+    prices rows at standard rather than batch rates. Returns IngestStats.
+    """
+    checkpoint = {"position": 0, "last_custom_id": None, "complete": False}
+    stats = _ingest_stream(batch_id, id_map, checkpoint, chunk_size, parse_workers, ledger,
+                           results=results, realtime=realtime)
+    return _finish(batch_id, checkpoint, stats, ledger)
+
+
+def _finish(batch_id, checkpoint, stats, ledger):
+    retry = checkpoint.get("retry") or []
+    save_checkpoint(batch_id, {
+        "position": checkpoint["position"],
+        "last_custom_id": checkpoint["last_custom_id"],
+        "complete": not retry,
+        "upserted": checkpoint.get("upserted", 0),
+        "retry": retry,
+    })
+    if ledger is not None and not retry:
+        ledger.update_batch(batch_id, ingest_state="complete", ingested_at=datetime.now(timezone.utc).isoformat())
+    stats.print_summary()
+    if retry:
+        print(f"  ⚠ {len(retry)} results are not written yet; retry with: "
+              f"python -m civant_enrich --ingest {batch_id}")
+    stats.record(METRICS)
+    METRICS.event("batch_ingested", batch_id=batch_id, succeeded=stats.succeeded, errored=stats.errored,
+                  skipped=stats.skipped, upserted=stats.upserted, parse_strategies=stats.strategies)
+    return stats
+
+
+def _ingest_stream(batch_id, id_map, checkpoint, chunk_size, parse_workers=1, ledger=None, results=None,
+                   realtime=False):
+    """
+    One pass over the batch results (or `results`), resuming after checkpoint["position"].
+    Updates `checkpoint` in place, and the ledger's per-request outcomes,
+    after every flush. Returns IngestStats, or None when the result at the
+    checkpoint position is not the recorded one.
+    """
+    resume_at = checkpoint.get("position") or 0
+    if resume_at:
+        print(f"  Resuming after result {resume_at} ({checkpoint.get('last_custom_id')})")
+
+    stats = IngestStats()
+    outcomes = []  # ledger rows: (custom_id, result_status, tokens, cost, strategy, ingest_state, error)
+    # Parsed results of the current chunk, unwritten ones from the last pass first:
+    # {"outcome": ledger row, "rows": brief rows, "shared": rows go to the shared
+    # layer (--tenants), "attach": [(tenant_id, buyer_name, country)]}
+    parsed = list(checkpoint.get("retry") or [])
+    checkpoint["retry"] = []
+    if parsed:
+        print(f"  Retrying {len(parsed)} results whose briefs were not written")
+    aliases = {}
+    tenants = {}
+    mismatch = []
+    row_defaults = {"tenant_id": TENANT_ID, "ttl_days": BRIEF_TTL_DAYS, "realtime": realtime}
+    if results is None:
+        results = get_anthropic().messages.batches.results(batch_id)
+
+    def flush(position, custom_id):
+        pending = [row for p in parsed if not p["shared"] for row in p["rows"]]
+        shared_pending = [row for p in parsed if p["shared"] for row in p["rows"]]
+        failed = write_briefs(pending) if pending else {}
+        failed_shared = write_briefs(shared_pending, SHARED_BRIEFS_TABLE, SHARED_BRIEF_CONFLICT_KEY) \
+            if shared_pending else {}
+        written = len(pending) + len(shared_pending) - len(failed) - len(failed_shared)
+        # A result counts as written only once every row it produced (aliases
+        # included) was upserted; the others are kept for the next pass
+        attachments = []
+        for p in parsed:
+            errors = [e for e in map((failed_shared if p["shared"] else failed).get,
+                                     ((r["buyer_name"], r["country"]) for r in p["rows"])) if e]
+            if errors:
+                stats.write_failed += 1
+                checkpoint["retry"].append(p)
+                outcomes.append((*p["outcome"][:5], "failed", errors[0]))
+            else:
+                attachments.extend(p["attach"])
+                outcomes.append(tuple(p["outcome"]))
+        if attachments:
+            stats.attached += attach_shared_briefs([tuple(a) for a in attachments])
+        stats.upserted += written
+        checkpoint["position"] = position
+        checkpoint["last_custom_id"] = custom_id
+        checkpoint["upserted"] = checkpoint.get("upserted", 0) + written
+        save_checkpoint(batch_id, checkpoint)
+        if ledger is not None:
+            ledger.record_results(batch_id, outcomes)
+        outcomes.clear()
+        parsed.clear()
+
+    def items():
+        """(position, custom_id, task, note) per result; task is None when there is nothing to parse."""
+        for position, result in enumerate(results, start=1):
+            custom_id = result.custom_id
+            if position < resume_at:
+                continue
+            if position == resume_at:
+                if custom_id != checkpoint.get("last_custom_id"):
+                    mismatch.append(custom_id)
+                    return
+                continue
+            if result.result.type == "errored":
+                yield position, custom_id, None, ("errored", str(result.result.error))
+                continue
+            if result.result.type != "succeeded":
+                yield position, custom_id, None, ("skipped", result.result.type)
+                continue
+            # Resolve custom_id via id_map
+            entry = id_map.get(custom_id)
+            if entry is None:
+                yield position, custom_id, None, ("unknown", None)
+                continue
+            if entry.get("aliases"):
+                aliases[custom_id] = entry["aliases"]
+            if "tenants" in entry:
+                tenants[custom_id] = (entry["tenants"], entry.get("alias_tenants") or [])
+            raw_text, usage = message_payload(result.result.message)
+            yield position, custom_id, {
+                **row_defaults,
+                "buyer_name": entry["buyer_name"],
+                "country": entry["country"],
+                "input_fingerprint": entry.get("input_fingerprint"),
+                "raw_text": raw_text,
+                "usage": usage,
+            }, None
+
+    position = resume_at
+    custom_id = checkpoint.get("last_custom_id")
+    for position, custom_id, outcome, note in parse_in_order(items(), parse_workers):
+        if note and note[0] == "errored":
+            stats.errored += 1
+            outcomes.append((custom_id, "errored", None, None, None, "failed", note[1]))
+            print(f"  ❌ {custom_id}: {note[1]}")
+            continue
+        if note:
+            if note[0] == "unknown":
+                print(f"  ⚠ Unknown custom_id: {custom_id}")
+            else:
+                outcomes.append((custom_id, note[1], None, None, None, "skipped", None))
+            stats.skipped += 1
+            continue
+        if outcome["error"]:
+            stats.skipped += 1
+            outcomes.append((custom_id, "succeeded", None, None, None, "failed", outcome["error"]))
+            print(f"  ❌ {custom_id}: parse failed in worker: {outcome['error']}")
+            continue
+
+        row = outcome["row"]
+        stats.add(row, outcome["strategy"])
+        # --tenants: one shared row, attached to each tenant that needs it
+        shared = tenants.pop(custom_id, None)
+        attach = []
+        if shared is not None:
+            row = {k: v for k, v in row.items() if k != "tenant_id"}
+            attach.extend((t, row["buyer_name"], row["country"]) for t in shared[0])
+        rows = [row]
+        # The same brief for every alias of the researched buyer; its cost is
+        # counted once, on the representative's row
+        for i, (alias_name, alias_country) in enumerate(aliases.pop(custom_id, ())):
+            rows.append({**row, "buyer_name": alias_name, "country": alias_country,
+                         "tokens_used": 0, "research_cost_usd": 0})
+            stats.alias_rows += 1
+            if shared is not None and i < len(shared[1]):
+                attach.extend((t, alias_name, alias_country) for t in shared[1][i])
+        parsed.append({"outcome": (custom_id, "succeeded", row.get("tokens_used"), row.get("research_cost_usd"),
+                                   outcome["strategy"], "written", None),
+                       "rows": rows, "shared": shared is not None, "attach": attach})
+
+        if sum(len(p["rows"]) for p in parsed) >= chunk_size:
+            flush(position, custom_id)
+            print(f"  {stats.upserted}/{stats.succeeded} written...")
+
+    if mismatch:
+        return None
+    if position > resume_at or parsed:
+        flush(position, custom_id)
+    return stats
+
+
+def parse_in_order(items, workers=1, chunk=PARSE_CHUNK_SIZE):
+    """
+    Parse (position, custom_id, task, note) items, yielding
+    (position, custom_id, outcome, note) in input order. With workers > 1,
+    tasks are sent in chunks to a process pool while the results download
+    continues on this thread; at most 4 chunks per worker are in flight.
+    """
+    if workers <= 1:
+        for group in _chunks(items, chunk):
+            yield from parse_chunk(group)
+        return
+
+    window = deque()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for group in _chunks(items, chunk):
+            window.append(pool.submit(parse_chunk, group))
+            while len(window) >= workers * 4:
+                yield from window.popleft().result()
+        while window:
+            yield from window.popleft().result()
+
+
+def _chunks(iterable, size):
+    group = []
+    for item in iterable:
+        group.append(item)
+        if len(group) >= size:
+            yield group
+            group = []
+    if group:
+        yield group
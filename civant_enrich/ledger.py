@@ -0,0 +1,389 @@
+"""
+Batch ledger: every submitted request, its buyer and what became of it.
+
+One SQLite file (WAL mode, LEDGER_PATH) replaces the per-batch
+batch_<id>_map.json files and manifest_<id>.json written to the working
+directory, so ingest runs from anywhere that shares the ledger (an
+absolute ENRICH_STATE_DIR or ENRICH_LEDGER) and never loads a whole map:
+each custom_id is one primary-key lookup. Per request it keeps
+the id_map entry plus result status, tokens, cost, parse strategy and
+ingest state, indexed for queries across batches. import_json_maps() takes
+in maps written before the ledger existed.
+
+custom_ids repeat across runs (ES_0000, ...), so requests are keyed on
+(batch_id, custom_id).
+
+request_tenants records which tenants each request writes briefs for (one
+row per tenant, with its brief count: the buyer plus aliases it lists), so
+a --tenants run that combines every tenant into one set of batches can
+still be accounted per tenant (tenant_report()).
+"""
+
+import glob
+import json
+import os
+import re
+import sqlite3
+import threading
+from collections.abc import Mapping
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from .config import LEDGER_PATH, TENANT_ID
+
+_SCHEMA = """
+create table if not exists manifests (
+  manifest_id   text primary key,
+  created_at    text not null,
+  rejected      text not null default '[]',
+  failed_shards text not null default '[]'
+);
+create table if not exists batches (
+  batch_id          text primary key,
+  manifest_id       text,
+  submitted_at      text not null,
+  requests          integer not null,
+  processing_status text,
+  ended_at          text,
+  ingest_state      text not null default 'pending',
+  ingested_at       text
+);
+create index if not exists batches_manifest_idx on batches (manifest_id);
+create table if not exists requests (
+  batch_id       text not null,
+  custom_id      text not null,
+  buyer_name     text not null,
+  country        text not null,
+  entry          text not null,
+  result_status  text,
+  tokens         integer,
+  cost_usd       real,
+  parse_strategy text,
+  ingest_state   text not null default 'pending',
+  error          text,
+  ingested_at    text,
+  primary key (batch_id, custom_id)
+) without rowid;
+create index if not exists requests_buyer_idx on requests (buyer_name, country);
+create index if not exists requests_state_idx on requests (result_status, ingest_state);
+create table if not exists request_tenants (
+  batch_id  text not null,
+  custom_id text not null,
+  tenant_id text not null,
+  briefs    integer not null,
+  primary key (batch_id, custom_id, tenant_id)
+) without rowid;
+create index if not exists request_tenants_tenant_idx on request_tenants (tenant_id);
+"""
+
+# pragma user_version: 1 once request_tenants is filled for requests
+# recorded before it existed
+_SCHEMA_VERSION = 1
+
+# requests.ingest_state: pending until ingest sees the result, then
+# written (brief upserted), failed (errored or unparseable) or skipped
+# (canceled / expired). batches.ingest_state: pending until ingest
+# finishes the batch, then complete.
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _entry_tenants(entry):
+    """
+    {tenant_id: briefs} an id_map entry writes: its "tenants" for the
+    buyer and "alias_tenants" for each alias under --tenants, otherwise
+    TENANT_ID for the buyer and every alias.
+    """
+    if "tenants" not in entry:
+        return {TENANT_ID: 1 + len(entry.get("aliases", ()))}
+    counts = {}
+    for tenants in (entry["tenants"], *entry.get("alias_tenants", ())):
+        for tenant_id in tenants:
+            counts[tenant_id] = counts.get(tenant_id, 0) + 1
+    return counts
+
+
+def _tenant_rows(batch_id, id_map):
+    return [(batch_id, custom_id, tenant_id, briefs)
+            for custom_id, e in id_map.items() for tenant_id, briefs in _entry_tenants(e).items()]
+
+
+class BatchLedger:
+    """Safe to share across threads; every statement runs under one lock."""
+
+    def __init__(self, path=LEDGER_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("pragma journal_mode=wal")
+        self._db.execute("pragma synchronous=normal")
+        self._db.executescript(_SCHEMA)
+        if self._db.execute("pragma user_version").fetchone()[0] < _SCHEMA_VERSION:
+            self._backfill_request_tenants()
+
+    def _backfill_request_tenants(self):
+        with self._transaction() as db:
+            rows = db.execute("select batch_id, custom_id, entry from requests").fetchall()
+            db.executemany(
+                "insert or ignore into request_tenants (batch_id, custom_id, tenant_id, briefs) values (?, ?, ?, ?)",
+                [r for batch_id, custom_id, entry in rows
+                 for r in _tenant_rows(batch_id, {custom_id: json.loads(entry)})],
+            )
+            db.execute(f"pragma user_version = {_SCHEMA_VERSION}")
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._db.execute("begin")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("rollback")
+                raise
+            self._db.execute("commit")
+
+    # --- submit -----------------------------------------------------------
+    def record_manifest(self, manifest):
+        """Store a run manifest's rejected requests and failed shards."""
+        failed = [s for s in manifest["shards"] if not s.get("batch_id")]
+        with self._lock:
+            self._db.execute(
+                "insert or replace into manifests (manifest_id, created_at, rejected, failed_shards) "
+                "values (?, ?, ?, ?)",
+                (manifest["manifest_id"], manifest["created_at"], json.dumps(manifest["rejected"]),
+                 json.dumps(failed)),
+            )
+
+    def record_batch(self, batch_id, id_map, manifest_id=None, submitted_at=None, replace=True):
+        """
+        Store a created batch and its {custom_id: entry} map. With
+        replace=False an already recorded batch (or request) is left as it
+        is, results included; imports use that to stay idempotent.
+        """
+        verb = "insert or replace" if replace else "insert or ignore"
+        rows = [(batch_id, custom_id, e["buyer_name"], e["country"], json.dumps(e, separators=(",", ":")))
+                for custom_id, e in id_map.items()]
+        with self._transaction() as db:
+            db.execute(
+                f"{verb} into batches (batch_id, manifest_id, submitted_at, requests) values (?, ?, ?, ?)",
+                (batch_id, manifest_id, submitted_at or _now(), len(rows)),
+            )
+            db.executemany(
+                f"{verb} into requests (batch_id, custom_id, buyer_name, country, entry) values (?, ?, ?, ?, ?)",
+                rows,
+            )
+            if replace:
+                db.execute("delete from request_tenants where batch_id = ?", (batch_id,))
+            db.executemany(
+                f"{verb} into request_tenants (batch_id, custom_id, tenant_id, briefs) values (?, ?, ?, ?)",
+                _tenant_rows(batch_id, id_map),
+            )
+
+    # --- lookup -----------------------------------------------------------
+    def has_manifest(self, manifest_id):
+        with self._lock:
+            return self._db.execute("select 1 from manifests where manifest_id = ?",
+                                    (manifest_id,)).fetchone() is not None
+
+    def manifest_batch_ids(self, manifest_id):
+        with self._lock:
+            return [r[0] for r in self._db.execute(
+                "select batch_id from batches where manifest_id = ? order by submitted_at, batch_id",
+                (manifest_id,),
+            )]
+
+    def has_batch(self, batch_id):
+        with self._lock:
+            return self._db.execute("select 1 from batches where batch_id = ?",
+                                    (batch_id,)).fetchone() is not None
+
+    def id_map(self, batch_id):
+        """A read-only {custom_id: entry} view of one batch, or None if it is not recorded."""
+        return LedgerIdMap(self, batch_id) if self.has_batch(batch_id) else None
+
+    def entry(self, batch_id, custom_id):
+        with self._lock:
+            row = self._db.execute("select entry from requests where batch_id = ? and custom_id = ?",
+                                   (batch_id, custom_id)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # --- ingest -----------------------------------------------------------
+    def record_results(self, batch_id, results):
+        """
+        results: [(custom_id, result_status, tokens, cost_usd, parse_strategy,
+        ingest_state, error)] for results whose fate is now committed.
+        """
+        now = _now()
+        with self._transaction() as db:
+            db.executemany(
+                "update requests set result_status = ?, tokens = ?, cost_usd = ?, parse_strategy = ?, "
+                "ingest_state = ?, error = ?, ingested_at = ? where batch_id = ? and custom_id = ?",
+                [(status, tokens, cost, strategy, state, error, now, batch_id, custom_id)
+                 for custom_id, status, tokens, cost, strategy, state, error in results],
+            )
+
+    def update_batch(self, batch_id, **fields):
+        """Set processing_status / ended_at / ingest_state / ingested_at on a recorded batch."""
+        allowed = {"processing_status", "ended_at", "ingest_state", "ingested_at"}
+        unknown = set(fields) - allowed
+        if unknown:
+            raise ValueError(f"unknown batch fields {sorted(unknown)}")
+        if not fields:
+            return
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock:
+            self._db.execute(f"update batches set {assignments} where batch_id = ?",
+                             [*fields.values(), batch_id])
+
+    # --- reporting --------------------------------------------------------
+    def report(self, batch_ids=None, limit=20):
+        """
+        Per-batch totals, newest first: batch_id, manifest_id, submitted_at,
+        requests, succeeded, errored, written, failed, pending, tokens,
+        cost_usd, ingest_state. All recorded batches (up to limit) when
+        batch_ids is None.
+        """
+        where, params = "", []
+        if batch_ids is not None:
+            where = f"where b.batch_id in ({', '.join('?' * len(batch_ids))})"
+            params = list(batch_ids)
+        sql = f"""
+            select b.batch_id, b.manifest_id, b.submitted_at, b.requests,
+                   count(*) filter (where r.result_status = 'succeeded'),
+                   count(*) filter (where r.result_status = 'errored'),
+                   count(*) filter (where r.ingest_state = 'written'),
+                   count(*) filter (where r.ingest_state = 'failed'),
+                   count(*) filter (where r.ingest_state = 'pending'), coalesce(sum(r.tokens), 0),
+                   coalesce(sum(r.cost_usd), 0), b.ingest_state
+            from batches b join requests r using (batch_id)
+            {where}
+            group by b.batch_id
+            order by b.submitted_at desc, b.batch_id
+            limit ?
+        """
+        keys = ("batch_id", "manifest_id", "submitted_at", "requests", "succeeded", "errored", "written",
+                "failed", "pending", "tokens", "cost_usd", "ingest_state")
+        with self._lock:
+            return [dict(zip(keys, row)) for row in self._db.execute(sql, [*params, limit])]
+
+    def tenant_report(self, batch_ids=None):
+        """
+        Per-tenant totals across batch_ids (every recorded batch when None),
+        most expensive first: tenant_id, requests, briefs, succeeded,
+        errored, pending, tokens, cost_usd. A request shared by several
+        tenants is split between them in proportion to the briefs it writes
+        for each, so the tenants' tokens and cost add up to the batches'.
+        """
+        where, params = "", []
+        if batch_ids is not None:
+            where = f"where t.batch_id in ({', '.join('?' * len(batch_ids))})"
+            params = list(batch_ids)
+        sql = f"""
+            with shares as (
+              select t.tenant_id, t.briefs, r.result_status, r.ingest_state, r.tokens, r.cost_usd,
+                     t.briefs * 1.0 / sum(t.briefs) over (partition by t.batch_id, t.custom_id) as share
+              from request_tenants t join requests r using (batch_id, custom_id)
+              {where}
+            )
+            select tenant_id, count(*), sum(briefs),
+                   count(*) filter (where result_status = 'succeeded'),
+                   count(*) filter (where result_status = 'errored'),
+                   count(*) filter (where ingest_state = 'pending'),
+                   cast(round(coalesce(sum(tokens * share), 0)) as integer), coalesce(sum(cost_usd * share), 0)
+            from shares
+            group by tenant_id
+            order by 8 desc, tenant_id
+        """
+        keys = ("tenant_id", "requests", "briefs", "succeeded", "errored", "pending", "tokens", "cost_usd")
+        with self._lock:
+            return [dict(zip(keys, row)) for row in self._db.execute(sql, params)]
+
+    def buyer_history(self, buyer_name, country):
+        """Every request for one buyer across batches, newest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "select r.batch_id, r.custom_id, b.submitted_at, r.result_status, r.ingest_state, "
+                "r.tokens, r.cost_usd from requests r join batches b using (batch_id) "
+                "where r.buyer_name = ? and r.country = ? order by b.submitted_at desc",
+                (buyer_name, country),
+            ).fetchall()
+        keys = ("batch_id", "custom_id", "submitted_at", "result_status", "ingest_state", "tokens", "cost_usd")
+        return [dict(zip(keys, row)) for row in rows]
+
+    # --- import -----------------------------------------------------------
+    def import_json_maps(self, paths=None):
+        """
+        Import manifest_<id>.json and batch_<id>_map.json files (default: those
+        in the working directory). Batches already in the ledger are left
+        untouched. Returns (batches, requests) imported.
+        """
+        if paths is None:
+            paths = sorted(glob.glob("manifest_*.json")) + sorted(glob.glob("batch_*_map.json"))
+        batches = requests = 0
+        seen = set()
+        for path in paths:
+            name = os.path.basename(path)
+            with open(path) as f:
+                data = json.load(f)
+            if name.startswith("manifest_"):
+                self.record_manifest(data)
+                for shard in data["shards"]:
+                    batch_id = shard.get("batch_id")
+                    if not batch_id or batch_id in seen or self.has_batch(batch_id):
+                        continue
+                    id_map = {cid: data["id_map"][cid] for cid in shard.get("custom_ids", ())
+                              if cid in data["id_map"]}
+                    self.record_batch(batch_id, id_map, manifest_id=data["manifest_id"],
+                                      submitted_at=data["created_at"], replace=False)
+                    seen.add(batch_id)
+                    batches += 1
+                    requests += len(id_map)
+                continue
+            match = re.fullmatch(r"batch_(.+)_map\.json", name)
+            if not match:
+                print(f"  ⚠ Not a manifest or batch map, skipped: {path}")
+                continue
+            batch_id = match.group(1)
+            if batch_id in seen or self.has_batch(batch_id):
+                continue
+            submitted_at = datetime.fromtimestamp(os.path.getmtime(path), timezone.utc).isoformat()
+            self.record_batch(batch_id, data, submitted_at=submitted_at, replace=False)
+            seen.add(batch_id)
+            batches += 1
+            requests += len(data)
+        return batches, requests
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class LedgerIdMap(Mapping):
+    """
+    The id_map of one recorded batch, read from the ledger one custom_id at
+    a time; drop-in for the dict ingest used to load from JSON.
+    """
+
+    def __init__(self, ledger, batch_id):
+        self._ledger = ledger
+        self._batch_id = batch_id
+
+    def __getitem__(self, custom_id):
+        entry = self._ledger.entry(self._batch_id, custom_id)
+        if entry is None:
+            raise KeyError(custom_id)
+        return entry
+
+    def __iter__(self):
+        with self._ledger._lock:
+            rows = self._ledger._db.execute("select custom_id from requests where batch_id = ?",
+                                            (self._batch_id,)).fetchall()
+        return iter(r[0] for r in rows)
+
+    def __len__(self):
+        with self._ledger._lock:
+            return self._ledger._db.execute("select count(*) from requests where batch_id = ?",
+                                            (self._batch_id,)).fetchone()[0]
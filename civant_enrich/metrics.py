@@ -0,0 +1,347 @@
+"""
+Pipeline instrumentation: stage timings, counters and latency histograms.
+
+One process-wide registry, METRICS. Stages are timed with
+
+    with METRICS.stage("prefetch") as s:
+        ...
+        s.items = len(histories)
+
+and every HTTP call either SDK client makes goes through metered_transport(),
+which records per-route latency, status and bytes each way, and whether the
+call opened a connection or reused a pooled one. Events stream
+to a JSON-lines file as they happen (--metrics-jsonl); at exit a Prometheus
+textfile for the node_exporter textfile collector is written atomically
+(--metrics-prom). With neither configured, metrics are only kept in memory.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import ExitStack, contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PREFIX = "civant_enrich_"
+
+_HELP = {
+    "stage_duration_seconds": ("gauge", "Wall time of the last run of each pipeline stage."),
+    "stage_items": ("gauge", "Items processed by the last run of each pipeline stage."),
+    "stage_failures_total": ("counter", "Pipeline stages that raised."),
+    "http_request_duration_seconds": ("histogram", "Time to response headers per HTTP route."),
+    "http_requests_total": ("counter", "HTTP requests per route and status."),
+    "http_errors_total": ("counter", "HTTP requests that failed without a response."),
+    "http_bytes_sent_total": ("counter", "Request body bytes sent per HTTP route."),
+    "http_bytes_received_total": ("counter", "Response body bytes received per HTTP route."),
+    "http_connections_total": ("counter", "HTTP requests per route that opened a new connection or reused a pooled one."),
+    "http_connect_duration_seconds": ("histogram", "TCP connect plus TLS handshake time of new HTTP connections."),
+    "parse_strategy_total": ("counter", "Ingested results per extract_json strategy."),
+    "results_total": ("counter", "Batch results ingested per outcome."),
+    "briefs_upserted_total": ("counter", "Brief rows written to buyer_research_briefs."),
+    "brief_alias_copies_total": ("counter", "Brief rows written to aliases of a researched buyer."),
+    "briefs_attached_total": ("counter", "Shared briefs attached to a tenant's buyer_research_briefs (--tenants)."),
+    "buyers_listed_total": ("counter", "Unique buyers read from predictions while streaming buyer pages."),
+    "buyer_aliases_total": ("counter", "Buyers folded into another buyer's enrichment request."),
+    "buyer_tenant_pairs_total": ("counter", "(tenant, buyer) pairs needing a brief before the shared-layer merge."),
+    "tenant_buyers_total": ("counter", "Buyers per tenant, listed from predictions and still needing a brief (--tenants)."),
+    "tenant_listing_seconds": ("gauge", "Seconds into the concurrent tenant listing at which each tenant's buyer list was complete."),
+    "briefs_renewed_total": ("counter", "Expired briefs renewed because their input was unchanged."),
+    "tokens_total": ("counter", "Tokens used by ingested results."),
+    "research_cost_usd_total": ("counter", "Estimated USD cost of ingested results."),
+    "realtime_requests_total": ("counter", "Realtime lane Messages API requests per outcome."),
+    "realtime_throttled_seconds_total": ("counter", "Seconds realtime lane workers waited on the rate limiter."),
+    "requests_submitted_total": ("counter", "Batch requests accepted by the Batches API."),
+    "requests_rejected_total": ("counter", "Batch requests rejected by the Batches API."),
+    "batches_submitted_total": ("counter", "Batches created."),
+    "prompts_compacted_total": ("counter", "Prompts whose award history was trimmed to --max-input-tokens."),
+    "requests_deferred_total": ("counter", "Requests left out of the run by --budget-usd."),
+    "history_cache_total": ("counter", "Award-history cache lookups and writes per result."),
+    "last_run_timestamp_seconds": ("gauge", "Unix time the last run finished."),
+    "last_run_success": ("gauge", "1 if the last run finished without an exception."),
+}
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+class _Stage:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.run_id = uuid.uuid4().hex[:12]
+        self.command = None
+        self.jsonl_path = None
+        self.prom_path = None
+        self._jsonl = None
+        # Context-manager factories entered around every stage, e.g. profiling.Profiler.stage
+        self.stage_hooks = []
+
+    def configure(self, jsonl_path=None, prom_path=None, command=None):
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self.command = command
+        if jsonl_path:
+            os.makedirs(os.path.dirname(os.path.abspath(jsonl_path)), exist_ok=True)
+            self._jsonl = open(jsonl_path, "a", buffering=1)
+        self.event("run_start")
+
+    # --- recording -------------------------------------------------------
+    def incr(self, name, value=1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self.gauges[_key(name, labels)] = value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = _Histogram(buckets)
+            hist.observe(value)
+
+    def event(self, kind, **fields):
+        if self._jsonl is None:
+            return
+        line = json.dumps({"ts": round(time.time(), 3), "run_id": self.run_id, "command": self.command,
+                           "event": kind, **fields}, default=str)
+        with self._lock:
+            self._jsonl.write(line + "\n")
+
+    @contextmanager
+    def stage(self, name):
+        """Time a pipeline stage; set .items on the yielded object."""
+        s = _Stage(name)
+        with ExitStack() as hooks:
+            for hook in self.stage_hooks:
+                hooks.enter_context(hook(name))
+            started = time.perf_counter()
+            status = "ok"
+            try:
+                yield s
+            except BaseException:
+                status = "error"
+                self.incr("stage_failures_total", stage=name)
+                raise
+            finally:
+                self.record_stage(name, time.perf_counter() - started, s.items, status)
+
+    def record_stage(self, name, duration, items, status="ok"):
+        """
+        Record a stage timed piecewise, e.g. buyer listing interleaved with
+        the prefetch that consumes it: duration is the summed time spent in it.
+        """
+        self.set_gauge("stage_duration_seconds", round(duration, 6), stage=name)
+        self.set_gauge("stage_items", items, stage=name)
+        self.event("stage", stage=name, status=status, duration_s=round(duration, 6), items=items)
+
+    # --- export ----------------------------------------------------------
+    def snapshot(self):
+        """Counters, gauges and histogram summaries as plain dicts."""
+        def fmt(key):
+            name, labels = key
+            return name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else "")
+        with self._lock:
+            return {
+                "counters": {fmt(k): v for k, v in self.counters.items()},
+                "gauges": {fmt(k): v for k, v in self.gauges.items()},
+                "histograms": {fmt(k): {"count": h.count, "sum": round(h.sum, 6)}
+                               for k, h in self.histograms.items()},
+            }
+
+    def prometheus_text(self):
+        def labels_str(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+        with self._lock:
+            series = {}
+            for (name, labels), value in sorted(self.counters.items(), key=lambda kv: kv[0]):
+                series.setdefault(name, []).append(f"{PREFIX}{name}{labels_str(labels)} {value}")
+            for (name, labels), value in sorted(self.gauges.items(), key=lambda kv: kv[0]):
+                series.setdefault(name, []).append(f"{PREFIX}{name}{labels_str(labels)} {value}")
+            for (name, labels), h in sorted(self.histograms.items(), key=lambda kv: kv[0]):
+                lines = series.setdefault(name, [])
+                cumulative = 0
+                for bound, n in zip(h.buckets, h.counts):
+                    cumulative += n
+                    lines.append(f"{PREFIX}{name}_bucket{labels_str(labels, [('le', bound)])} {cumulative}")
+                lines.append(f"{PREFIX}{name}_bucket{labels_str(labels, [('le', '+Inf')])} {h.count}")
+                lines.append(f"{PREFIX}{name}_sum{labels_str(labels)} {round(h.sum, 6)}")
+                lines.append(f"{PREFIX}{name}_count{labels_str(labels)} {h.count}")
+
+        out = []
+        for name in sorted(series):
+            kind, help_text = _HELP.get(name, ("counter" if name.endswith("_total") else "gauge", name))
+            out.append(f"# HELP {PREFIX}{name} {help_text}")
+            out.append(f"# TYPE {PREFIX}{name} {kind}")
+            out.extend(series[name])
+        return "\n".join(out) + "\n"
+
+    def write_prometheus(self, path):
+        """Write atomically; a directory path gets one civant_enrich_<command>.prom per command."""
+        if os.path.isdir(path):
+            path = os.path.join(path, f"civant_enrich_{self.command or 'run'}.prom")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(tmp, "w") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, path)
+
+    def close(self, success=True):
+        """Record the run outcome, write the textfile and close the JSON-lines stream."""
+        self.set_gauge("last_run_timestamp_seconds", int(time.time()), command=self.command or "")
+        self.set_gauge("last_run_success", 1 if success else 0, command=self.command or "")
+        if self.prom_path:
+            self.write_prometheus(self.prom_path)
+        self.event("run_end", success=success, **self.snapshot())
+        if self._jsonl is not None:
+            self._jsonl.close()
+            self._jsonl = None
+
+
+METRICS = Registry()
+
+
+# ---------------------------------------------------------------------------
+# HTTP instrumentation shared by the Supabase and Anthropic clients
+# ---------------------------------------------------------------------------
+def http_route(path):
+    """Low-cardinality route label: rpc/<fn>, <table>, messages/batches/{id}/results, ..."""
+    for prefix in ("/rest/v1/", "/v1/"):
+        if path.startswith(prefix):
+            path = path[len(prefix):]
+            break
+    return "/".join("{id}" if seg.startswith("msgbatch_") else seg for seg in path.strip("/").split("/"))
+
+
+def metered_transport(http, client, **transport_kwargs):
+    """
+    An HTTPTransport from `http` (the httpx package, or the httpx fork an SDK
+    is built on; both expose the same transport API) that records METRICS
+    per (client, route): latency to response headers, status, bytes each way,
+    and, through the connection pool's "trace" extension, whether a new
+    connection was opened (and how long connecting took) or a pooled one
+    reused. transport_kwargs go to HTTPTransport (limits, http2, ...).
+    """
+    return _metered_class(http)(http.HTTPTransport(**transport_kwargs), client)
+
+
+_METERED = {}
+
+
+class _ConnectTrace:
+    """
+    httpcore "trace" callback for one request: times the connect_tcp and
+    start_tls steps, which only run when the pool opens a connection.
+    Forwards every event to a trace callback the caller set, if any.
+    """
+
+    def __init__(self, inner=None):
+        self._inner = inner
+        self._started = None
+        self.opened = False
+        self.seconds = 0.0
+
+    def __call__(self, event, info):
+        step, _, phase = event.rpartition(".")
+        if step.endswith((".connect_tcp", ".connect_unix_socket", ".start_tls")):
+            if phase == "started":
+                self._started = time.perf_counter()
+            elif self._started is not None:
+                self.opened = True
+                self.seconds += time.perf_counter() - self._started
+                self._started = None
+        if self._inner is not None:
+            self._inner(event, info)
+
+
+def _metered_class(http):
+    cls = _METERED.get(http.__name__)
+    if cls is not None:
+        return cls
+
+    class CountingStream(http.SyncByteStream):
+        def __init__(self, inner, on_close):
+            self._inner = inner
+            self._on_close = on_close
+            self._bytes = 0
+
+        def __iter__(self):
+            for chunk in self._inner:
+                self._bytes += len(chunk)
+                yield chunk
+
+        def close(self):
+            try:
+                self._inner.close()
+            finally:
+                if self._on_close is not None:
+                    self._on_close(self._bytes)
+                    self._on_close = None
+
+    class MeteredTransport(http.BaseTransport):
+        def __init__(self, inner, client):
+            self._inner = inner
+            self._client = client
+
+        def handle_request(self, request):
+            labels = {"client": self._client, "route": http_route(request.url.path)}
+            METRICS.incr("http_bytes_sent_total", int(request.headers.get("content-length") or 0), **labels)
+            connect = _ConnectTrace(request.extensions.get("trace"))
+            request.extensions["trace"] = connect
+            started = time.perf_counter()
+            try:
+                response = self._inner.handle_request(request)
+            except Exception:
+                METRICS.incr("http_errors_total", **labels)
+                raise
+            METRICS.observe("http_request_duration_seconds", time.perf_counter() - started, **labels)
+            METRICS.incr("http_requests_total", status=str(response.status_code), **labels)
+            METRICS.incr("http_connections_total", connection="new" if connect.opened else "reused", **labels)
+            if connect.opened:
+                METRICS.observe("http_connect_duration_seconds", connect.seconds, client=self._client)
+            response.stream = CountingStream(
+                response.stream, lambda n: METRICS.incr("http_bytes_received_total", n, **labels))
+            return response
+
+        def close(self):
+            self._inner.close()
+
+    _METERED[http.__name__] = MeteredTransport
+    return MeteredTransport
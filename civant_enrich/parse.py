@@ -0,0 +1,334 @@
+"""
+Response parsing: JSON extraction and brief row construction.
+
+Finds the brief object in free-form model output that may contain web-search
+<cite> tags, markdown fences, preamble text, raw newlines inside strings and
+trailing commas.
+
+Well-formed output is decoded straight from its opening brace by the C JSON
+decoder. Otherwise one tokenizing pass over the candidate text finds the
+top-level object holding "summary" and records trailing commas, so candidate
+selection and repair happen in the same linear pass. Only truncated or
+otherwise unparseable output falls through to per-field salvage.
+
+build_brief_row()/parse_chunk() turn a parsed response into a
+buyer_research_briefs row; they import nothing heavier than the standard
+library so ingest can run them in worker processes.
+
+Returned dict shapes match the edge function's extractJson():
+  - parsed brief dict (always has a truthy "summary"), or
+  - salvaged subset of fields with "sources" defaulting to [], or
+  - {"summary": <first 400 chars>, "sources": []} when there is no JSON.
+"""
+
+import json
+import re
+from datetime import datetime, timezone, timedelta
+
+from .config import (
+    BATCH_INPUT_USD_PER_MTOK, BATCH_OUTPUT_USD_PER_MTOK, CACHE_READ_MULTIPLIER, CACHE_WRITE_MULTIPLIER,
+    STANDARD_INPUT_USD_PER_MTOK, STANDARD_OUTPUT_USD_PER_MTOK, WEB_SEARCH_USD,
+)
+
+_TAG_RE = re.compile(r"<[^>]+>")
+_FENCE_RE = re.compile(r"```(?:json)?\s*([\s\S]*?)```")
+# Scanner tokens: whole JSON strings or a structural character; everything
+# in between is skipped inside the regex engine.
+_TOKEN_RE = re.compile(r'"(?:[^"\\]|\\.)*"|[{}\[\],]')
+_DECODER = json.JSONDecoder()
+_WS_RE = re.compile(r"\s*")
+
+STRING_FIELDS = ("summary", "timing_insight", "opportunity_reasoning", "intent_confidence", "intent_reasoning")
+OBJECT_FIELDS = ("procurement_patterns", "incumbent_landscape", "organizational_context")
+_FIELD_RE = re.compile(
+    r'"(' + "|".join(STRING_FIELDS + OBJECT_FIELDS + ("opportunity_score", "risk_factors")) + r')"\s*:\s*'
+)
+_STRING_VALUE_RE = re.compile(r'"((?:[^"\\]|\\.)*)"')
+_INT_VALUE_RE = re.compile(r"\d+")
+_FLAT_ARRAY_RE = re.compile(r"\[[^\]]*\]")
+_SOURCES_KEY = '"sources"'
+
+# Parse strategies, reported by parse_brief() for instrumentation.
+STRATEGY_JSON = "json"
+STRATEGY_JSON_REPAIRED = "json_repaired"
+STRATEGY_FIELDS = "fields"
+STRATEGY_TEXT = "text"
+
+
+def _flatten(s):
+    """Raw newlines/tabs inside model strings are invalid JSON; make them spaces."""
+    return s.replace("\n", " ").replace("\r", " ").replace("\t", " ")
+
+
+def _scan(s):
+    """
+    Single pass over s. Returns (objects, commas) where objects is a list of
+    (start, end, has_summary) for every top-level {...} span and commas is the
+    list of positions of trailing commas (followed by } or ]) outside strings.
+    """
+    objects = []
+    commas = []
+    depth = 0
+    start = -1
+    has_summary = False
+    prev_comma = -1
+    for m in _TOKEN_RE.finditer(s):
+        tok = m.group()
+        c = tok[0]
+        if c == '"':
+            prev_comma = -1
+            if depth == 1 and tok == '"summary"':
+                k = _WS_RE.match(s, m.end()).end()
+                if k < len(s) and s[k] == ":":
+                    has_summary = True
+        elif c == "{" or c == "[":
+            prev_comma = -1
+            if depth == 0:
+                if c == "[":
+                    continue
+                start = m.start()
+                has_summary = False
+            depth += 1
+        elif c == "}" or c == "]":
+            if depth == 0:
+                continue
+            if prev_comma > -1:
+                commas.append(prev_comma)
+                prev_comma = -1
+            depth -= 1
+            if depth == 0 and c == "}":
+                objects.append((start, m.start(), has_summary))
+        elif depth:
+            # A comma: trailing if the next token closes a container.
+            prev_comma = m.start()
+        else:
+            prev_comma = -1
+    return objects, commas
+
+
+def _balanced_end(s, start):
+    """Index of the bracket closing the one at s[start] (string-aware), or -1."""
+    depth = 0
+    for m in _TOKEN_RE.finditer(s, start):
+        c = m.group()[0]
+        if c == "{" or c == "[":
+            depth += 1
+        elif c == "}" or c == "]":
+            depth -= 1
+            if depth == 0:
+                return m.start()
+    return -1
+
+
+def _without(s, start, end, commas):
+    """s[start:end+1] with the trailing commas inside that span removed."""
+    cut = [p for p in commas if start <= p <= end]
+    if not cut:
+        return s[start:end + 1], False
+    parts = []
+    prev = start
+    for p in cut:
+        parts.append(s[prev:p])
+        prev = p + 1
+    parts.append(s[prev:end + 1])
+    return "".join(parts), True
+
+
+def _salvage_fields(cleaned):
+    """Pull individual fields out of JSON that does not parse as a whole."""
+    result = {"sources": []}
+    for m in _FIELD_RE.finditer(cleaned):
+        field = m.group(1)
+        if field in result:
+            continue
+        at = m.end()
+        if field in STRING_FIELDS:
+            v = _STRING_VALUE_RE.match(cleaned, at)
+            if v:
+                result[field] = v.group(1).replace('\\"', '"').replace("\\n", " ")
+        elif field == "opportunity_score":
+            v = _INT_VALUE_RE.match(cleaned, at)
+            if v:
+                result[field] = int(v.group(0))
+        elif field == "risk_factors":
+            v = _FLAT_ARRAY_RE.match(cleaned, at)
+            if v:
+                try:
+                    result[field] = json.loads(_flatten(v.group(0)))
+                except json.JSONDecodeError:
+                    pass
+        elif cleaned.startswith("{", at):
+            end = _balanced_end(cleaned, at)
+            if end > at:
+                try:
+                    result[field] = json.loads(_flatten(cleaned[at:end + 1]))
+                except json.JSONDecodeError:
+                    pass
+
+    si = cleaned.rfind(_SOURCES_KEY)
+    if si > -1:
+        at = cleaned.find("[", si)
+        if at > -1:
+            end = _balanced_end(cleaned, at)
+            if end > at:
+                try:
+                    result["sources"] = json.loads(_flatten(cleaned[at:end + 1]))
+                except json.JSONDecodeError:
+                    pass
+    return result
+
+
+def parse_brief(raw_text):
+    """
+    Extract the brief dict from a model response.
+    Returns (brief, strategy) where strategy is one of the STRATEGY_* names.
+    """
+    # Strip HTML/XML tags (cite tags from web search)
+    cleaned = _TAG_RE.sub("", raw_text)
+
+    # Prefer a markdown code fence when present
+    fence = _FENCE_RE.search(cleaned)
+    fenced = fence.group(1).strip() if fence else ""
+    candidate = _flatten(fenced or cleaned)
+
+    # Fast path: well-formed output decodes straight from its first brace
+    # (or the brace opening the "summary" object) without a Python-level scan.
+    first = candidate.find("{")
+    si = candidate.find('"summary"')
+    for at in dict.fromkeys((first, candidate.rfind("{", 0, si) if si > -1 else -1)):
+        if at < 0:
+            continue
+        try:
+            p, _ = _DECODER.raw_decode(candidate, at)
+        except ValueError:
+            continue
+        if isinstance(p, dict) and p.get("summary"):
+            return p, STRATEGY_JSON
+
+    objects, commas = _scan(candidate)
+    span = next(((a, b) for a, b, has_summary in objects if has_summary), None)
+    if span is None:
+        f = candidate.find("{")
+        l = candidate.rfind("}")
+        if f > -1 and l > f:
+            span = (f, l)
+
+    if span is None:
+        if not fenced:
+            return {"summary": cleaned[:400].strip(), "sources": []}, STRATEGY_TEXT
+        json_str, repaired = candidate, False
+    else:
+        json_str, repaired = _without(candidate, span[0], span[1], commas)
+
+    try:
+        p = json.loads(json_str)
+        if isinstance(p, dict) and p.get("summary"):
+            return p, STRATEGY_JSON_REPAIRED if repaired else STRATEGY_JSON
+    except json.JSONDecodeError:
+        pass
+
+    return _salvage_fields(cleaned), STRATEGY_FIELDS
+
+
+def extract_json(raw_text):
+    """
+    Extract the Civant Agent brief from raw model text.
+    Returns a dict with at minimum a 'summary' key when one could be found.
+    """
+    return parse_brief(raw_text)[0]
+
+
+# ---------------------------------------------------------------------------
+# Row construction (runs in ingest worker processes; no client imports)
+# ---------------------------------------------------------------------------
+MODEL_USED = "claude-haiku-4-5"  # buyer_research_briefs.model_used label
+
+
+def brief_cost_usd(usage, realtime=False):
+    """
+    Cost of one response from its usage dict (cache reads/writes priced
+    separately); batch rates, or standard rates for the realtime lane.
+    """
+    rate = (STANDARD_INPUT_USD_PER_MTOK if realtime else BATCH_INPUT_USD_PER_MTOK) / 1_000_000
+    output_rate = (STANDARD_OUTPUT_USD_PER_MTOK if realtime else BATCH_OUTPUT_USD_PER_MTOK) / 1_000_000
+    cost_usd = (
+        usage["input_tokens"] * rate
+        + usage.get("cache_creation_input_tokens", 0) * rate * CACHE_WRITE_MULTIPLIER
+        + usage.get("cache_read_input_tokens", 0) * rate * CACHE_READ_MULTIPLIER
+        + usage["output_tokens"] * output_rate
+    )
+    # Add web search cost if applicable
+    cost_usd += usage.get("web_search_requests", 0) * WEB_SEARCH_USD
+    return cost_usd
+
+
+def usage_tokens(usage):
+    """All input (cached or not) plus output tokens."""
+    return (
+        usage["input_tokens"]
+        + usage.get("cache_creation_input_tokens", 0)
+        + usage.get("cache_read_input_tokens", 0)
+        + usage["output_tokens"]
+    )
+
+
+def build_brief_row(task):
+    """
+    Turn a parse task {tenant_id, ttl_days, buyer_name, country, raw_text,
+    usage, input_fingerprint, realtime} into a buyer_research_briefs row.
+    Returns (row, strategy).
+    """
+    brief, strategy = parse_brief(task["raw_text"])
+    usage = task["usage"]
+
+    # Build procurement_intent JSONB (same as edge function)
+    procurement_intent = {
+        **(brief.get("procurement_patterns") or {}),
+        "intent_confidence": brief.get("intent_confidence"),
+        "intent_reasoning": brief.get("intent_reasoning"),
+        "opportunity_reasoning": brief.get("opportunity_reasoning"),
+        "timing_insight": brief.get("timing_insight"),
+    }
+
+    now = datetime.now(timezone.utc)
+    row = {
+        "tenant_id": task["tenant_id"],
+        "buyer_name": task["buyer_name"],
+        "country": task["country"],
+        "category": "forecast",
+        "summary": brief.get("summary"),
+        "procurement_intent": procurement_intent,
+        "organizational_context": brief.get("organizational_context"),
+        "incumbent_landscape": brief.get("incumbent_landscape"),
+        "risk_factors": brief.get("risk_factors"),
+        "opportunity_score": brief.get("opportunity_score") if isinstance(brief.get("opportunity_score"), int) else None,
+        "sources": brief.get("sources"),
+        "model_used": MODEL_USED,
+        "tokens_used": usage_tokens(usage),
+        "research_cost_usd": round(brief_cost_usd(usage, task.get("realtime", False)), 6),
+        "status": "complete",
+        "researched_at": now.isoformat(),
+        "expires_at": (now + timedelta(days=task["ttl_days"])).isoformat(),
+        "input_fingerprint": task.get("input_fingerprint"),
+    }
+    return row, strategy
+
+
+def parse_chunk(items):
+    """
+    Process-pool entry point. items are (position, custom_id, task, note);
+    returns (position, custom_id, outcome, note) in the same order, where
+    outcome is {"row", "strategy", "error"} for tasks and None otherwise.
+    Exceptions are reported per item instead of failing the whole chunk.
+    """
+    out = []
+    for position, custom_id, task, note in items:
+        outcome = None
+        if task is not None:
+            try:
+                row, strategy = build_brief_row(task)
+                outcome = {"row": row, "strategy": strategy, "error": None}
+            except Exception as e:
+                outcome = {"row": None, "strategy": None, "error": f"{type(e).__name__}: {e}"}
+        out.append((position, custom_id, outcome, note))
+    return out
@@ -0,0 +1,133 @@
+"""
+Stage 6: poll batch status.
+
+One asyncio loop watches any number of batches. Each batch gets its own
+poll interval: short while little is left to process, longer for big
+batches, doubling while a batch makes no progress. With ingest enabled a
+batch is ingested as soon as it ends, while the others keep being polled.
+Transient retrieve errors are retried with backoff; a batch that still
+fails (or whose ingest fails) is reported on its own and does not stop the
+others.
+"""
+
+import asyncio
+import random
+from datetime import datetime
+
+from .clients import get_anthropic
+from .config import POLL_MAX_INTERVAL_S, POLL_MIN_INTERVAL_S, POLL_RETRIES, POLL_SECONDS_PER_REQUEST
+
+_TRANSIENT_STATUS = (408, 409, 429, 500, 502, 503, 504, 529)
+
+
+def _print_status(batch_id, batch):
+    counts = batch.request_counts
+    print(f"\n📊 Batch {batch_id}")
+    print(f"   Status: {batch.processing_status}")
+    print(f"   Processing: {counts.processing}")
+    print(f"   Succeeded:  {counts.succeeded}")
+    print(f"   Errored:    {counts.errored}")
+    print(f"   Canceled:   {counts.canceled}")
+    print(f"   Expired:    {counts.expired}")
+
+
+def next_interval(processing, previous=None, progressed=True,
+                  lo=POLL_MIN_INTERVAL_S, hi=POLL_MAX_INTERVAL_S):
+    """
+    Seconds to wait before the next retrieve. Scales with the number of
+    requests still processing; with no progress since the last poll the
+    previous interval is doubled instead.
+    """
+    interval = processing * POLL_SECONDS_PER_REQUEST
+    if not progressed and previous:
+        interval = max(interval, previous * 2)
+    return min(hi, max(lo, interval))
+
+
+def _is_transient(exc):
+    """True for Anthropic API errors that are likely to succeed on retry."""
+    import anthropic
+
+    if isinstance(exc, anthropic.APIConnectionError):  # includes APITimeoutError
+        return True
+    return getattr(exc, "status_code", None) in _TRANSIENT_STATUS
+
+
+async def _retrieve(batch_id, retries=POLL_RETRIES, base_delay=1.0):
+    """batches.retrieve, retrying transient failures with jittered exponential backoff."""
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            return await asyncio.to_thread(get_anthropic().messages.batches.retrieve, batch_id)
+        except Exception as e:
+            if attempt > retries or not _is_transient(e):
+                raise
+            delay = base_delay * (2 ** (attempt - 1)) * (0.5 + random.random())
+            print(f"   ⚠ {batch_id}: retrieve failed ({e}); retrying in {delay:.0f}s")
+            await asyncio.sleep(delay)
+
+
+async def _watch_one(batch_id, on_ended, lo, hi):
+    batch = await _retrieve(batch_id)
+    _print_status(batch_id, batch)
+    interval = None
+    while batch.processing_status != "ended":
+        processing = batch.request_counts.processing
+        progressed = interval is None or processing < last_processing
+        interval = next_interval(processing, interval, progressed, lo, hi)
+        last_processing = processing
+        await asyncio.sleep(interval)
+        batch = await _retrieve(batch_id)
+        counts = batch.request_counts
+        now = datetime.now().strftime("%H:%M:%S")
+        print(f"   [{now}] {batch_id}: processing={counts.processing} "
+              f"succeeded={counts.succeeded} errored={counts.errored} (waited {interval:.0f}s)")
+
+    print(f"\n✅ Batch {batch_id} complete!")
+    if on_ended is not None:
+        await on_ended(batch_id)
+    return batch
+
+
+async def watch_batches_async(batch_ids, ingest=None, lo=POLL_MIN_INTERVAL_S, hi=POLL_MAX_INTERVAL_S):
+    """
+    Watch batch_ids concurrently until all have ended. `ingest`, if given, is
+    a callable(batch_id) run in a worker thread as each batch ends; ingests
+    run one at a time so their progress output and DB writes do not
+    interleave. A batch whose polling or ingest fails is reported without
+    stopping the others. Returns {batch_id: final batch, or the exception
+    that ended its watch}.
+    """
+    lock = asyncio.Lock()
+
+    async def on_ended(batch_id):
+        async with lock:
+            await asyncio.to_thread(ingest, batch_id)
+
+    batches = await asyncio.gather(*(
+        _watch_one(b, on_ended if ingest else None, lo, hi) for b in batch_ids
+    ), return_exceptions=True)
+    failed = [(b, e) for b, e in zip(batch_ids, batches) if isinstance(e, BaseException)]
+    if failed:
+        print(f"\n❌ {len(failed)} of {len(batch_ids)} batches failed:")
+        for batch_id, e in failed:
+            print(f"   {batch_id}: {type(e).__name__}: {e}")
+    return dict(zip(batch_ids, batches))
+
+
+def watch_batches(batch_ids, ingest=None, lo=POLL_MIN_INTERVAL_S, hi=POLL_MAX_INTERVAL_S):
+    """Blocking wrapper around watch_batches_async()."""
+    return asyncio.run(watch_batches_async(batch_ids, ingest, lo, hi))
+
+
+def poll_batch(batch_id, wait=True):
+    """Check batch status, optionally polling until complete."""
+    if wait:
+        batch = watch_batches([batch_id])[batch_id]
+        if isinstance(batch, BaseException):
+            raise batch
+        return batch
+    batch = get_anthropic().messages.batches.retrieve(batch_id)
+    _print_status(batch_id, batch)
+    return batch
@@ -0,0 +1,129 @@
+"""
+--profile DIR: per-stage profiles of a run.
+
+Every METRICS stage runs under cProfile (deterministic, thread that runs the
+stage) and a wall-clock stack sampler (all threads, so the prefetch and
+submit pools and the watcher's worker threads are covered, including time
+blocked on the network). For each stage it writes
+
+  DIR/<command>-<stage>.pstats      python -m pstats / snakeviz
+  DIR/<command>-<stage>.collapsed   flamegraph.pl / speedscope
+
+and at the end of the run a top-N hot-function summary to stdout and
+DIR/<command>-summary.txt. Parse worker processes (--parse-workers > 1)
+are not profiled; profile ingest with --parse-workers 1 to see parse cost.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from .config import PROFILE_SAMPLE_INTERVAL_S, PROFILE_TOP_N
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ",")
+
+
+class StackSampler(threading.Thread):
+    """Samples every other thread's stack into collapsed-stack counts."""
+
+    def __init__(self, interval=PROFILE_SAMPLE_INTERVAL_S):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.stacks = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        while not self._done.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+class Profiler:
+    """Stage hook for metrics.Registry: METRICS.stage_hooks.append(profiler.stage)."""
+
+    def __init__(self, out_dir, command, top=PROFILE_TOP_N, interval=PROFILE_SAMPLE_INTERVAL_S):
+        os.makedirs(out_dir, exist_ok=True)
+        self.out_dir = out_dir
+        self.command = command or "run"
+        self.top = top
+        self.interval = interval
+        self.stages = []  # (label, cProfile.Profile, samples Counter)
+
+    def _label(self, name):
+        used = sum(1 for label, _, _ in self.stages if label == name or label.startswith(f"{name}."))
+        return name if not used else f"{name}.{used + 1}"
+
+    @contextmanager
+    def stage(self, name):
+        label = self._label(name)
+        sampler = StackSampler(self.interval)
+        prof = cProfile.Profile()
+        sampler.start()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            sampler.stop()
+            base = os.path.join(self.out_dir, f"{self.command}-{label}")
+            prof.dump_stats(base + ".pstats")
+            with open(base + ".collapsed", "w") as f:
+                for stack, n in sampler.stacks.most_common():
+                    f.write(f"{stack} {n}\n")
+            self.stages.append((label, prof, sampler.stacks))
+
+    def summary(self):
+        """Top-N functions by own CPU time (cProfile) and by wall-clock samples, per run."""
+        out = io.StringIO()
+        out.write(f"Profile summary ({self.command}), artifacts in {self.out_dir}\n")
+        if not self.stages:
+            out.write("  no stages ran\n")
+            return out.getvalue()
+
+        leaves = Counter()
+        for label, _, samples in self.stages:
+            total = sum(samples.values())
+            out.write(f"  {label:<16} {total:>7} samples (~{total * self.interval:.1f}s thread time)\n")
+            for stack, n in samples.items():
+                leaves[stack.rsplit(";", 1)[-1]] += n
+        all_samples = sum(leaves.values()) or 1
+
+        out.write(f"\nTop {self.top} by wall-clock samples (all threads, includes time blocked on I/O):\n")
+        for frame, n in leaves.most_common(self.top):
+            out.write(f"  {n / all_samples:6.1%}  {frame}\n")
+
+        combined = pstats.Stats(*(prof for _, prof, _ in self.stages))
+        rows = sorted(combined.stats.items(), key=lambda kv: kv[1][2], reverse=True)[:self.top]
+        out.write(f"\nTop {self.top} by own CPU time (cProfile, stage threads):\n")
+        out.write(f"  {'tottime':>9} {'cumtime':>9} {'calls':>9}  function\n")
+        for (filename, line, func), (_, ncalls, tottime, cumtime, _) in rows:
+            where = "" if filename == "~" else f" ({os.path.basename(filename)}:{line})"
+            out.write(f"  {tottime:9.3f} {cumtime:9.3f} {ncalls:9d}  {func}{where}\n")
+        return out.getvalue()
+
+    def close(self):
+        text = self.summary()
+        with open(os.path.join(self.out_dir, f"{self.command}-summary.txt"), "w") as f:
+            f.write(text)
+        print(f"\n{text}")
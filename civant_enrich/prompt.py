@@ -0,0 +1,329 @@
+"""
+Stage 3-4: build the Civant Agent prompts and batch request objects.
+"""
+
+import hashlib
+import json
+
+from .config import (
+    BATCH_INPUT_USD_PER_MTOK, BATCH_OUTPUT_USD_PER_MTOK, CHARS_PER_TOKEN, COUNTRY_NAMES, EST_OUTPUT_TOKENS,
+    EST_WEB_SEARCHES, MAX_TOKENS, MODEL, STANDARD_INPUT_USD_PER_MTOK, STANDARD_OUTPUT_USD_PER_MTOK,
+    WEB_SEARCH_TOOL_TOKENS, WEB_SEARCH_USD,
+)
+
+
+# ---------------------------------------------------------------------------
+# Step 3: Build prompts (replicates edge function buildPrompts exactly)
+# ---------------------------------------------------------------------------
+def build_prompts(buyer_name, country, award_history=None, category=None):
+    """
+    Replicates the TypeScript buildPrompts() from the edge function.
+    Returns (system_prompt, user_message) for the forecast context.
+    """
+    country_label = COUNTRY_NAMES.get(country, country)
+    has_history = (
+        award_history
+        and award_history.get("stats", {}).get("total_contracts", 0) > 0
+    )
+
+    # --- System prompt ---
+    history_note = "" if has_history else \
+        "\nNOTE: No historical award data was found for this buyer. Rely on web research alone but note the data gap."
+
+    system = (
+        "You are Civant Agent, a procurement intelligence analyst with access to both "
+        "historical contract award data and web research. Your job is to produce an actionable "
+        "intelligence brief for a company deciding whether to pursue a predicted procurement opportunity.\n\n"
+        "You have TWO information sources:\n"
+        "1. CANONICAL DATA: Real contract award history from official procurement portals (provided below). "
+        "This is factual and verified. Analyze it for: renewal cycles, spend trends, incumbent suppliers, "
+        "typical contract durations, category patterns, and budget trajectory.\n"
+        "2. WEB RESEARCH: Use your web search to find CURRENT intelligence: recent news, leadership changes, "
+        "budget announcements, organizational restructuring, upcoming projects, and policy shifts.\n\n"
+        "COMBINE both sources into a single coherent brief. Lead with data-backed insights (patterns from "
+        "the award history), then layer on web intelligence. If the award history shows clear patterns "
+        '(e.g. "renews IT services every 3 years at ~200k"), state them explicitly.\n'
+        f"{history_note}\n"
+        "Respond ONLY in JSON. Use this EXACT structure (do NOT add extra keys, do NOT nest differently):\n"
+        '{"summary":"3-4 sentence executive summary",'
+        '"procurement_patterns":{"renewal_cycle":"description","spend_trend":"increasing|stable|decreasing|insufficient_data",'
+        '"typical_value_range":"e.g. 50k-200k","preferred_categories":["categories"],"notes":"other patterns"},'
+        '"incumbent_landscape":{"known_suppliers":["suppliers"],"dominant_supplier":"name or null","contract_notes":"history"},'
+        '"organizational_context":{"type":"municipality|health_authority|university|ministry|agency|school|other",'
+        '"leadership":"name","recent_changes":"changes","size_indicator":"small|medium|large"},'
+        '"risk_factors":["risks"],'
+        '"timing_insight":"when to engage",'
+        '"opportunity_score":75,'
+        '"opportunity_reasoning":"why this score based on data",'
+        '"intent_confidence":"high|medium|low",'
+        '"intent_reasoning":"why this confidence level",'
+        '"sources":[{"url":"url","title":"title","relevance":"why"}]}\n\n'
+        "SCORING RULES for opportunity_score (integer 0-100):\n"
+        "- 80-100: Clear renewal cycle approaching, strong spend history, open competition\n"
+        "- 60-79: Good award history, moderate patterns, some incumbent lock-in but winnable\n"
+        "- 40-59: Limited data or mixed signals, worth monitoring\n"
+        "- 20-39: Sparse history, single low-value contract, or locked-in incumbent\n"
+        "- 0-19: No meaningful data, speculative only\n\n"
+        "INTENT CONFIDENCE based on DATA quality:\n"
+        "- high: 3+ contracts with clear renewal cadence and approaching end date\n"
+        "- medium: 1-2 contracts or irregular renewal pattern\n"
+        "- low: No canonical award data, relying on web research alone\n\n"
+        "CRITICAL: Return ONLY the raw JSON object. No markdown, no explanation, no preamble. Start with { end with }."
+    )
+
+    # --- User message ---
+    parts = [
+        "Research this public sector buyer for a predicted procurement opportunity:",
+        f"Buyer: {buyer_name}",
+        f"Country: {country_label}",
+    ]
+    if category:
+        parts.append(f"Sector: {category}")
+
+    if has_history:
+        h = award_history
+        s = h["stats"]
+        parts.append("")
+        parts.append("=== CANONICAL AWARD DATA (from official procurement portals) ===")
+        parts.append(f"Total contracts on record: {s['total_contracts']}")
+        parts.append(f"Unique suppliers: {s['unique_suppliers']}")
+        parts.append(f"Total spend: EUR {int(float(s.get('total_spend') or 0)):,}")
+        parts.append(f"Average contract value: EUR {int(float(s.get('avg_contract_value') or 0)):,}")
+        parts.append(f"Max contract value: EUR {int(float(s.get('max_contract_value') or 0)):,}")
+        parts.append(f"Award history span: {s.get('earliest_award', '?')} to {s.get('latest_award', '?')}")
+        parts.append(f"Average contract duration: {s.get('avg_duration_months', '?')} months")
+        parts.append(f"Framework agreements: {s.get('framework_count', 0)}")
+        if s.get("cpv_clusters"):
+            parts.append(f"Procurement categories: {', '.join(s['cpv_clusters'])}")
+
+        if h.get("top_suppliers"):
+            parts.append("")
+            parts.append("Top suppliers:")
+            for sup in h["top_suppliers"]:
+                parts.append(
+                    f"  - {sup['supplier']}: {sup['contracts']} contracts, "
+                    f"EUR {int(float(sup.get('total_value') or 0)):,}, "
+                    f"last award {sup.get('last_award', '?')}"
+                )
+
+        if h.get("renewal_patterns"):
+            parts.append("")
+            parts.append("Renewal patterns by category:")
+            for rp in h["renewal_patterns"]:
+                parts.append(
+                    f"  - {rp['cpv_cluster']}: {rp['occurrences']} contracts, "
+                    f"avg duration {rp.get('avg_duration', '?')} months, "
+                    f"avg value EUR {int(float(rp.get('avg_value') or 0)):,}, "
+                    f"last end date {rp.get('last_end_date', 'unknown')}"
+                )
+
+        if h.get("recent_contracts"):
+            parts.append("")
+            parts.append("Most recent contracts:")
+            for rc in h["recent_contracts"][:5]:
+                parts.append(
+                    f"  - EUR {int(float(rc.get('value_eur', 0) or 0)):,} | "
+                    f"{rc.get('supplier', 'unknown supplier')} | "
+                    f"awarded {rc.get('award_date', '?')} | "
+                    f"ends {rc.get('end_date', 'unknown')} | "
+                    f"CPV {rc.get('cpv_primary', 'n/a')} | "
+                    f"{rc.get('duration_months', '?')} months"
+                )
+
+        parts.append("")
+        parts.append("=== END CANONICAL DATA ===")
+    else:
+        parts.append("")
+        parts.append("No historical award data found for this buyer in our database.")
+
+    parts.append("")
+    parts.append(
+        "Now use web search to find current intelligence about this buyer, "
+        "then combine with the data above to produce the intelligence brief in JSON format."
+    )
+
+    return system, "\n".join(parts)
+
+
+# ---------------------------------------------------------------------------
+# Step 3b: Compact award histories to a per-request input-token cap
+# ---------------------------------------------------------------------------
+# Each level keeps (top suppliers, renewal categories, recent contracts, CPV
+# clusters); the rest of each list collapses into one "others" row carrying
+# its totals. Levels are tried in order until the prompt fits; the last one
+# is used if none does.
+COMPACTION_LEVELS = (
+    (10, 10, 5, 12),
+    (5, 6, 3, 8),
+    (3, 4, 2, 5),
+    (1, 2, 1, 3),
+    (0, 0, 0, 0),
+)
+
+
+def _collapse_suppliers(rows, keep):
+    if len(rows) <= keep:
+        return rows
+    tail = rows[keep:]
+    return rows[:keep] + [{
+        "supplier": f"{len(tail)} other suppliers",
+        "contracts": sum(int(r.get("contracts") or 0) for r in tail),
+        "total_value": sum(float(r.get("total_value") or 0) for r in tail),
+        "last_award": max((r["last_award"] for r in tail if r.get("last_award")), default="?"),
+    }]
+
+
+def _collapse_renewals(rows, keep):
+    if len(rows) <= keep:
+        return rows
+    tail = rows[keep:]
+    n = sum(int(r.get("occurrences") or 0) for r in tail)
+    durations = [(float(r["avg_duration"]), int(r.get("occurrences") or 0)) for r in tail
+                 if isinstance(r.get("avg_duration"), (int, float))]
+    weight = sum(w for _, w in durations)
+    return rows[:keep] + [{
+        "cpv_cluster": f"{len(tail)} other categories",
+        "occurrences": n,
+        "avg_duration": round(sum(d * w for d, w in durations) / weight) if weight else "?",
+        "avg_value": sum(float(r.get("avg_value") or 0) * int(r.get("occurrences") or 0) for r in tail) / n
+        if n else 0,
+        "last_end_date": max((r["last_end_date"] for r in tail if r.get("last_end_date")), default="unknown"),
+    }]
+
+
+def compact_award_history(award_history, suppliers, renewals, recent, clusters):
+    """
+    A copy of award_history with each list cut to the given length and the
+    supplier / renewal-pattern tails summarized in an "others" row, so totals
+    survive the trim. stats totals are left untouched.
+    """
+    h = dict(award_history)
+    if h.get("top_suppliers"):
+        h["top_suppliers"] = _collapse_suppliers(h["top_suppliers"], suppliers)
+    if h.get("renewal_patterns"):
+        h["renewal_patterns"] = _collapse_renewals(h["renewal_patterns"], renewals)
+    if h.get("recent_contracts"):
+        h["recent_contracts"] = h["recent_contracts"][:recent]
+    cpv = (h.get("stats") or {}).get("cpv_clusters")
+    if cpv and len(cpv) > clusters:
+        h["stats"] = {**h["stats"], "cpv_clusters": cpv[:clusters] + [f"+{len(cpv) - clusters} more"]}
+    return h
+
+
+def fit_prompt(buyer_name, country, award_history, max_input_tokens):
+    """
+    Prompts for one buyer, the award history compacted until the whole
+    request input (system prompt, tool definition and user turn) is at most
+    max_input_tokens. Returns (system, user_msg, tokens_before) where
+    tokens_before is None if no compaction was needed.
+    """
+    system, user_msg = build_prompts(buyer_name, country, award_history)
+    overhead = estimate_tokens(system) + WEB_SEARCH_TOOL_TOKENS
+    before = overhead + estimate_tokens(user_msg)
+    if not max_input_tokens or before <= max_input_tokens or not award_history:
+        return system, user_msg, None
+    for level in COMPACTION_LEVELS:
+        system, user_msg = build_prompts(buyer_name, country, compact_award_history(award_history, *level))
+        if overhead + estimate_tokens(user_msg) <= max_input_tokens:
+            break
+    return system, user_msg, before
+
+
+# ---------------------------------------------------------------------------
+# Step 4: Build batch request JSONL
+# ---------------------------------------------------------------------------
+def build_batch_requests(buyers_with_history, max_input_tokens=None):
+    """
+    Build the list of batch request objects.
+    Each entry: { custom_id, params: { model, max_tokens, system, messages, tools } }
+
+    With max_input_tokens, award histories are compacted (fit_prompt) and
+    id_map entries of compacted requests record "compacted_from_tokens".
+    Buyers grouped by aliases.group_aliases() carry their aliases into the
+    id_map entry as [buyer_name, country] pairs; ingest writes the brief to each.
+    Under --tenants, entries also carry "tenants" (and "alias_tenants",
+    aligned with aliases): ingest writes the shared brief and attaches it to those.
+    """
+    requests = []
+    id_map = {}
+    for idx, item in enumerate(buyers_with_history):
+        buyer_name = item["buyer_name"]
+        country = item["country"]
+        award_history = item.get("award_history")
+
+        system, user_msg, compacted_from = fit_prompt(buyer_name, country, award_history, max_input_tokens)
+
+        custom_id = f"{country}_{idx:04d}"
+        params = {
+            "model": MODEL,
+            "max_tokens": MAX_TOKENS,
+            "system": system,
+            "messages": [{"role": "user", "content": user_msg}],
+            "tools": [{"type": "web_search_20250305", "name": "web_search"}],
+        }
+        id_map[custom_id] = {
+            "buyer_name": buyer_name,
+            "country": country,
+            "input_fingerprint": request_fingerprint(params),
+        }
+        if compacted_from is not None:
+            id_map[custom_id]["compacted_from_tokens"] = compacted_from
+        if item.get("tenants"):
+            id_map[custom_id]["tenants"] = item["tenants"]
+        if item.get("aliases"):
+            id_map[custom_id]["aliases"] = [[a["buyer_name"], a["country"]] for a in item["aliases"]]
+            if item.get("tenants"):
+                id_map[custom_id]["alias_tenants"] = [a.get("tenants", []) for a in item["aliases"]]
+
+        requests.append({"custom_id": custom_id, "params": params})
+    return requests, id_map
+
+
+def request_fingerprint(params):
+    """
+    Stable hash of everything the model sees for one request: model, limits,
+    tools, system prompt and the user turn (which renders the award history).
+    Two runs with the same fingerprint would send the model identical input.
+    """
+    canonical = json.dumps(params, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Input-token estimate (dry run)
+# ---------------------------------------------------------------------------
+def estimate_tokens(text):
+    """Rough token count; good enough for cost previews, not for billing."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def request_input_tokens(request):
+    """Estimated input tokens of one request: system prompt, tool definition and user turn."""
+    params = request["params"]
+    return (estimate_tokens(params["system"]) + WEB_SEARCH_TOOL_TOKENS
+            + estimate_tokens(params["messages"][0]["content"]))
+
+
+def estimate_input_tokens(requests):
+    """Estimated input tokens and input cost at batch rates for a batch built by build_batch_requests()."""
+    tokens = sum(request_input_tokens(r) for r in requests)
+    return {
+        "requests": len(requests),
+        "input_tokens": tokens,
+        "cost_usd": tokens * BATCH_INPUT_USD_PER_MTOK / 1_000_000,
+    }
+
+
+def estimate_request_cost_usd(request, realtime=False):
+    """
+    Expected cost of one request: its input tokens, plus EST_OUTPUT_TOKENS
+    and EST_WEB_SEARCHES for the response, at batch rates or (realtime=True)
+    standard rates.
+    """
+    rate = (STANDARD_INPUT_USD_PER_MTOK if realtime else BATCH_INPUT_USD_PER_MTOK) / 1_000_000
+    output_rate = (STANDARD_OUTPUT_USD_PER_MTOK if realtime else BATCH_OUTPUT_USD_PER_MTOK) / 1_000_000
+    return (
+        request_input_tokens(request) * rate
+        + EST_OUTPUT_TOKENS * output_rate
+        + EST_WEB_SEARCHES * WEB_SEARCH_USD
+    )
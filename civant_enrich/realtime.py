@@ -0,0 +1,254 @@
+"""
+Stage 5b: realtime lane for urgent buyers.
+
+The Batches API can take hours; buyers whose predicted tender window opens
+within days cannot wait for it. Their requests go to the standard Messages
+API instead: concurrent calls, paced by token buckets on requests and input
+tokens per minute, at standard (undiscounted) prices. Responses are wrapped
+as batch results and fed to the same ingest path (ingest.ingest_stream), so
+parsing, upserts, alias copies and the ledger work exactly as for a batch.
+
+Every messages.create, pause_turn continuations included, is paced: it
+takes one request and its estimated input tokens (the whole conversation
+so far) from the buckets, and the input-token bucket is corrected with the
+usage the API reports. Rate-limit and overloaded errors are retried with
+backoff. If ingest fails, workers stop before making further paid calls.
+"""
+
+import json
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+
+from .clients import get_anthropic
+from .config import (
+    REALTIME_ITPM, REALTIME_MAX_CONTINUATIONS, REALTIME_RETRIES, REALTIME_RPM, REALTIME_WORKERS,
+    WEB_SEARCH_TOOL_TOKENS,
+)
+from .metrics import METRICS
+from .prompt import estimate_tokens
+
+REALTIME_PREFIX = "realtime_"
+_RETRY_STATUS = (429, 529)  # rate limited, overloaded
+
+
+class LaneStopped(Exception):
+    """The lane was stopped (its ingest failed) before this call was made."""
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `capacity` tokens, refilled at `rate_per_s`.
+    acquire(n) blocks until n tokens are available (n is capped at capacity,
+    so one oversized request waits for a full bucket rather than forever).
+    """
+
+    def __init__(self, rate_per_s, capacity):
+        self.rate_per_s = rate_per_s
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, n=1):
+        n = min(n, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_s)
+                self._updated = now
+                if self._tokens >= n:
+                    self._tokens -= n
+                    return waited
+                wait = (n - self._tokens) / self.rate_per_s
+            time.sleep(wait)
+            waited += wait
+
+    def credit(self, n):
+        """Return n tokens (or, for negative n, take more), within capacity."""
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + n)
+
+
+class RateLimiter:
+    """The lane's requests-per-minute and input-tokens-per-minute buckets, shared by its workers."""
+
+    def __init__(self, rpm, itpm):
+        self.requests = TokenBucket(rpm / 60, max(1, rpm // 6))
+        self.input_tokens = TokenBucket(itpm / 60, max(1, itpm // 6))
+        self.throttled_s = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, input_tokens):
+        """Take one request and input_tokens (estimated) before a call."""
+        self._throttled(self.requests.acquire() + self.input_tokens.acquire(input_tokens))
+
+    def settle(self, estimated, actual):
+        """Correct the input-token bucket once a call's actual input tokens are known."""
+        self.input_tokens.credit(min(estimated, self.input_tokens.capacity) - actual)
+
+    def backoff(self, seconds):
+        """Sleep after a rate-limit or overloaded error; counted as throttled time."""
+        time.sleep(seconds)
+        self._throttled(seconds)
+
+    def _throttled(self, seconds):
+        with self._lock:
+            self.throttled_s += seconds
+
+
+def is_urgent(buyer, within_days, today=None):
+    """True when the buyer's predicted tender window opens within `within_days` (or has opened)."""
+    tender = buyer.get("next_tender_date")
+    if not tender:
+        return False
+    today = today or datetime.now(timezone.utc).date()
+    return (date.fromisoformat(str(tender)[:10]) - today).days <= within_days
+
+
+def _content_text(content):
+    if isinstance(content, str):
+        return content
+    blocks = [b.model_dump() if hasattr(b, "model_dump") else vars(b) if hasattr(b, "__dict__") else b
+              for b in content]
+    return json.dumps(blocks, default=str)
+
+
+def input_tokens(params, messages):
+    """Estimated input tokens of one messages.create: system prompt, tool definition and every message."""
+    return (estimate_tokens(params["system"]) + WEB_SEARCH_TOOL_TOKENS
+            + sum(estimate_tokens(_content_text(m["content"])) for m in messages))
+
+
+def _retry_after(exc):
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _create(params, messages, limiter=None, stop=None, retries=REALTIME_RETRIES, base_delay=2.0):
+    """
+    One messages.create, paced by `limiter` and retried with jittered
+    exponential backoff (or the server's retry-after) on rate-limit and
+    overloaded errors. Raises LaneStopped once `stop` is set.
+    """
+    estimate = input_tokens(params, messages)
+    attempt = 0
+    while True:
+        if stop is not None and stop.is_set():
+            raise LaneStopped("realtime lane stopped")
+        if limiter is not None:
+            limiter.acquire(estimate)
+        try:
+            message = get_anthropic().messages.create(**{**params, "messages": messages})
+        except Exception as e:
+            if limiter is not None:
+                limiter.settle(estimate, 0)
+            attempt += 1
+            if attempt > retries or getattr(e, "status_code", None) not in _RETRY_STATUS:
+                raise
+            delay = _retry_after(e) or base_delay * (2 ** (attempt - 1)) * (0.5 + random.random())
+            if limiter is not None:
+                limiter.backoff(delay)
+            else:
+                time.sleep(delay)
+            continue
+        if limiter is not None:
+            limiter.settle(estimate, getattr(message.usage, "input_tokens", 0) or 0)
+        return message
+
+
+def _call(params, limiter=None, stop=None):
+    """
+    One messages.create, continued while the API pauses a long server-tool
+    turn (stop_reason "pause_turn"). Returns a message-like object with the
+    content of every turn and the usage summed across them.
+    """
+    messages = list(params["messages"])
+    content, usage = [], {"input_tokens": 0, "output_tokens": 0, "cache_creation_input_tokens": 0,
+                          "cache_read_input_tokens": 0, "web_search_requests": 0}
+    for _ in range(REALTIME_MAX_CONTINUATIONS + 1):
+        message = _create(params, messages, limiter, stop)
+        content.extend(message.content)
+        u = message.usage
+        for key in ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens"):
+            usage[key] += getattr(u, key, 0) or 0
+        server_tool_use = getattr(u, "server_tool_use", None)
+        usage["web_search_requests"] += (getattr(server_tool_use, "web_search_requests", 0) or 0) \
+            if server_tool_use else 0
+        if message.stop_reason != "pause_turn":
+            break
+        messages = [*params["messages"], {"role": "assistant", "content": content}]
+    web_searches = usage.pop("web_search_requests")
+    return SimpleNamespace(content=content, usage=SimpleNamespace(
+        **usage, server_tool_use=SimpleNamespace(web_search_requests=web_searches)))
+
+
+def run_realtime(requests, id_map, rpm=REALTIME_RPM, itpm=REALTIME_ITPM, workers=REALTIME_WORKERS,
+                 parse_workers=1, ledger=None):
+    """
+    Send `requests` through the Messages API and ingest each response as it
+    arrives. The lane is recorded in the ledger as one batch,
+    realtime_<timestamp>, outside any manifest. Returns (lane_id, IngestStats).
+    """
+    from .ingest import ingest_stream
+
+    lane_id = REALTIME_PREFIX + datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    limiter = RateLimiter(rpm, itpm)
+    stop = threading.Event()
+    done = queue.Queue()
+    counts = {"succeeded": 0, "errored": 0}
+    lock = threading.Lock()
+    started = time.monotonic()
+
+    print(f"\n⚡ Realtime lane {lane_id}: {len(requests)} urgent requests "
+          f"({workers} workers, {rpm} requests/min, {itpm:,} input tokens/min)")
+    if ledger is not None:
+        ledger.record_batch(lane_id, id_map)
+        ledger.update_batch(lane_id, processing_status="in_progress")
+
+    def task(request):
+        try:
+            result = SimpleNamespace(type="succeeded", message=_call(request["params"], limiter, stop))
+            outcome = "succeeded"
+        except LaneStopped:
+            return
+        except Exception as e:
+            result = SimpleNamespace(type="errored", error=f"{type(e).__name__}: {e}")
+            outcome = "errored"
+        with lock:
+            counts[outcome] += 1
+        done.put(SimpleNamespace(custom_id=request["custom_id"], result=result))
+
+    def results():
+        for _ in range(len(requests)):
+            yield done.get()
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for request in requests:
+            pool.submit(task, request)
+        try:
+            stats = ingest_stream(lane_id, results(), id_map, parse_workers=parse_workers, ledger=ledger,
+                                  realtime=True)
+        except BaseException:
+            # Nothing would store the remaining responses: make no more paid calls
+            stop.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    elapsed = time.monotonic() - started
+    if ledger is not None:
+        ledger.update_batch(lane_id, processing_status="ended", ended_at=datetime.now(timezone.utc).isoformat())
+    METRICS.incr("realtime_requests_total", counts["succeeded"], outcome="succeeded")
+    METRICS.incr("realtime_requests_total", counts["errored"], outcome="errored")
+    METRICS.incr("realtime_throttled_seconds_total", round(limiter.throttled_s, 3))
+    print(f"  ⚡ {counts['succeeded']} succeeded, {counts['errored']} errored in {elapsed:.1f}s "
+          f"({limiter.throttled_s:.1f}s spent waiting on the rate limiter across workers)")
+    return lane_id, stats
@@ -0,0 +1,166 @@
+"""
+Stage 1b: rank buyers and fit the run to a budget.
+
+Each buyer gets a priority in [0, 1], a PRIORITY_WEIGHTS-weighted sum of
+
+  urgency    most urgent open prediction (URGENCY_SCORES)
+  window     how soon the earliest predicted tender is (halves every
+             WINDOW_HALF_LIFE_DAYS; past dates score 1)
+  value      total_value_eur x probability, log scale up to VALUE_FULL_SCORE_EUR
+  staleness  1 for a buyer never researched, 0.5 rising to 1 over
+             STALE_FULL_SCORE_DAYS past the brief's expiry
+
+Signals come from get_enrichment_buyer_priorities (or the predictions
+fallback query); a signal that is missing scores a neutral 0.5. Buyers
+are processed in priority order, so --limit keeps the top N and
+--budget-usd fills the run greedily with the highest-priority requests
+whose estimated cost still fits.
+"""
+
+import math
+from datetime import date, datetime, timezone
+
+from .config import (
+    PRIORITY_WEIGHTS, STALE_FULL_SCORE_DAYS, URGENCY_SCORES, VALUE_FULL_SCORE_EUR, WINDOW_HALF_LIFE_DAYS,
+)
+
+NEUTRAL = 0.5
+_URGENCY_ORDER = ["overdue", "imminent", "upcoming", "horizon", "distant"]
+
+
+def _parse_date(value):
+    if not value:
+        return None
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _parse_timestamp(value):
+    if not value:
+        return None
+    ts = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    return ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)
+
+
+def merge_prediction_rows(rows):
+    """
+    Collapse predictions rows to one buyer per (buyer_name, country) with the
+    same signals get_enrichment_buyer_priorities returns; first-seen order.
+    """
+    merged = {}
+    for row in rows:
+        key = (row["buyer_name"], row["country"])
+        urgency = (row.get("urgency") or "").lower()
+        tender = _parse_date(row.get("predicted_tender_date"))
+        b = merged.get(key)
+        if b is None:
+            b = merged[key] = {"buyer_name": key[0], "country": key[1], "urgency": None,
+                               "next_tender_date": None, "probability": None,
+                               "total_value_eur": None, "predictions": 0}
+        b["predictions"] += 1
+        if urgency in URGENCY_SCORES and (
+                b["urgency"] is None or _URGENCY_ORDER.index(urgency) < _URGENCY_ORDER.index(b["urgency"])):
+            b["urgency"] = urgency
+        if tender and (b["next_tender_date"] is None or tender.isoformat() < b["next_tender_date"]):
+            b["next_tender_date"] = tender.isoformat()
+        if row.get("probability") is not None:
+            b["probability"] = max(float(row["probability"]), b["probability"] or 0.0)
+        if row.get("total_value_eur") is not None:
+            b["total_value_eur"] = (b["total_value_eur"] or 0.0) + float(row["total_value_eur"])
+    return list(merged.values())
+
+
+def priority_components(buyer, today=None):
+    """Per-signal scores in [0, 1] for one buyer."""
+    today = today or datetime.now(timezone.utc).date()
+
+    urgency = URGENCY_SCORES.get((buyer.get("urgency") or "").lower(), NEUTRAL)
+
+    tender = _parse_date(buyer.get("next_tender_date"))
+    if tender is None:
+        window = NEUTRAL
+    else:
+        days = (tender - today).days
+        window = 1.0 if days <= 0 else 0.5 ** (days / WINDOW_HALF_LIFE_DAYS)
+
+    total = buyer.get("total_value_eur")
+    if total is None:
+        value = NEUTRAL
+    else:
+        probability = buyer.get("probability")
+        expected = float(total) * (float(probability) if probability is not None else 1.0)
+        value = min(1.0, math.log10(1 + max(expected, 0.0)) / math.log10(1 + VALUE_FULL_SCORE_EUR))
+
+    if "brief_expires_at" not in buyer:
+        staleness = NEUTRAL
+    elif buyer["brief_expires_at"] is None:
+        staleness = 1.0
+    else:
+        days_expired = (datetime.now(timezone.utc) - _parse_timestamp(buyer["brief_expires_at"])).days
+        staleness = 0.5 + 0.5 * min(1.0, max(days_expired, 0) / STALE_FULL_SCORE_DAYS)
+
+    return {"urgency": urgency, "window": window, "value": value, "staleness": staleness}
+
+
+def priority_score(buyer, today=None):
+    components = priority_components(buyer, today)
+    return sum(PRIORITY_WEIGHTS[name] * score for name, score in components.items())
+
+
+def rank_buyers(buyers, today=None):
+    """Buyers sorted by descending priority (stable), each with a "priority" key."""
+    ranked = [{**b, "priority": round(priority_score(b, today), 4)} for b in buyers]
+    ranked.sort(key=lambda b: b["priority"], reverse=True)
+    return ranked
+
+
+def trim_to_budget(buyers, budget_usd, min_cost_usd):
+    """
+    The leading buyers a budget could possibly pay for at the cheapest
+    request cost, so prefetch skips buyers that can never fit. Buyers with
+    an expired brief fingerprint don't count: they may be renewed for free.
+    """
+    if min_cost_usd <= 0:
+        return buyers
+    cap = int(budget_usd // min_cost_usd)
+    kept, paid = [], 0
+    for b in buyers:
+        if not b.get("brief_fingerprint"):
+            if paid == cap:
+                continue
+            paid += 1
+        kept.append(b)
+    return kept
+
+
+def fit_budget(requests, id_map, budget_usd, cost_fn):
+    """
+    Keep requests in order (highest priority first) while their estimated
+    cost fits in budget_usd; a request that doesn't fit is deferred and
+    cheaper ones after it are still considered. Returns (requests, id_map,
+    deferred, total_cost); kept id_map entries gain "est_cost_usd".
+    """
+    kept, kept_map, total, deferred = [], {}, 0.0, 0
+    for r in requests:
+        cost = cost_fn(r)
+        if total + cost > budget_usd:
+            deferred += 1
+            continue
+        total += cost
+        kept.append(r)
+        kept_map[r["custom_id"]] = {**id_map[r["custom_id"]], "est_cost_usd": round(cost, 6)}
+    return kept, kept_map, deferred, total
+
+
+def priority_summary(buyers):
+    """One-line urgency mix and score range of ranked buyers."""
+    if not buyers:
+        return "no buyers"
+    mix = {}
+    for b in buyers:
+        u = (b.get("urgency") or "unknown").lower()
+        mix[u] = mix.get(u, 0) + 1
+    order = _URGENCY_ORDER + sorted(set(mix) - set(_URGENCY_ORDER))
+    parts = ", ".join(f"{mix[u]} {u}" for u in order if u in mix)
+    return f"{parts}; priority {buyers[0]['priority']:.2f} → {buyers[-1]['priority']:.2f}"
@@ -0,0 +1,243 @@
+"""
+Stage 1b: one research layer shared by every tenant (--tenants).
+
+Nothing a brief is built from depends on the tenant: the prompt, the award
+history and the web research are the same for a public buyer whoever asked.
+With several tenants, buyers are listed and cache-checked per tenant, merged
+on (buyer_name, country) and researched once into SHARED_BRIEFS_TABLE.
+attach_shared_buyer_research_briefs then copies each shared brief into
+buyer_research_briefs for every tenant that needs it (shared_brief_id points
+back), so readers keep querying one table per tenant and tenant-owned
+columns are never written. LLM requests grow with unique buyers, not with
+tenants x buyers.
+
+Each merged buyer carries "tenants": the tenants without a valid brief for
+it. Aliases folded into it keep their own list.
+
+Tenants are listed and cache-checked concurrently (collect_tenant_buyers)
+over the process-wide clients, so every tenant shares one connection pool
+per service; requests from all tenants then go into the same batches.
+"""
+
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .clients import get_supabase
+from .config import (
+    ATTACH_BATCH_SIZE, BRIEF_TTL_DAYS, CACHE_CHECK_BATCH_SIZE, PREFETCH_RETRIES, RENEW_BATCH_SIZE, TENANT_WORKERS,
+)
+from .fetch import _with_retries, fetch_buyer_entity_ids, filter_already_cached, iter_buyer_pages
+from .metrics import METRICS
+from .schedule import _URGENCY_ORDER
+
+
+def list_enrichment_tenants(include_overdue=False):
+    """
+    [(tenant_id, buyers)] for every tenant with buyers to enrich, largest
+    first (get_enrichment_tenants), for --all-tenants.
+    """
+    urgencies = ["upcoming"]
+    if include_overdue:
+        urgencies.append("overdue")
+    resp, _ = _with_retries(lambda: get_supabase().rpc("get_enrichment_tenants", {
+        "p_urgencies": urgencies,
+    }).execute(), PREFETCH_RETRIES)
+    return [(row["tenant_id"], row["buyers"]) for row in resp.data or []]
+
+
+def collect_tenant_buyers(tenant_ids, include_overdue=False, cache_check=True, workers=TENANT_WORKERS):
+    """
+    Buyers any of `tenant_ids` needs a brief for, merged across tenants.
+    With cache_check, a tenant that already has a valid brief for a buyer
+    is left out of its "tenants". Returns (buyers, listed) where listed is
+    the (tenant, buyer) pair count before the cache check.
+
+    Tenants are listed on `workers` threads, one buyer page (listed and
+    cache-checked) per task. Scheduling is round-robin: a tenant has at
+    most one page in flight and rejoins the back of the queue after each,
+    so a tenant with a hundred pages delays the others by a page at a
+    time, never by its whole listing. The merge keeps tenant_ids order.
+    """
+    pages = {t: iter_buyer_pages(include_overdue=include_overdue, tenant_id=t) for t in tenant_ids}
+    found = {t: [] for t in tenant_ids}
+    listed = dict.fromkeys(tenant_ids, 0)
+    workers = max(1, workers)
+    start = time.monotonic()
+
+    def next_page(tenant_id):
+        page = next(pages[tenant_id], None)
+        if page is None:
+            return None
+        return page, filter_already_cached(page, quiet=True, tenant_id=tenant_id) if cache_check else page
+
+    ready = deque(tenant_ids)
+    running = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while ready or running:
+            while ready and len(running) < workers:
+                tenant_id = ready.popleft()
+                running[pool.submit(next_page, tenant_id)] = tenant_id
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in sorted(done, key=lambda f: tenant_ids.index(running[f])):
+                tenant_id = running.pop(future)
+                result = future.result()
+                if result is None:
+                    elapsed = time.monotonic() - start
+                    METRICS.set_gauge("tenant_listing_seconds", elapsed, tenant=tenant_id)
+                    METRICS.incr("tenant_buyers_total", listed[tenant_id], tenant=tenant_id, state="listed")
+                    METRICS.incr("tenant_buyers_total", len(found[tenant_id]), tenant=tenant_id, state="needed")
+                    print(f"  {tenant_id}: {listed[tenant_id]} buyers, {len(found[tenant_id])} need a brief "
+                          f"({elapsed:.1f}s)")
+                    continue
+                page, needed = result
+                listed[tenant_id] += len(page)
+                found[tenant_id].extend(needed)
+                ready.append(tenant_id)
+    return merge_tenant_buyers([(t, found[t]) for t in tenant_ids]), sum(listed.values())
+
+
+def merge_tenant_buyers(per_tenant):
+    """
+    Merge [(tenant_id, buyers)] into one buyer per (buyer_name, country) in
+    first-seen order, keeping the strongest scheduling signal of any tenant:
+    most urgent, earliest tender, highest probability, summed value and
+    predictions, and the oldest brief expiry (None, never briefed, wins).
+    """
+    merged = {}
+    for tenant_id, buyers in per_tenant:
+        for b in buyers:
+            key = (b["buyer_name"], b["country"])
+            m = merged.get(key)
+            if m is None:
+                m = merged[key] = {k: v for k, v in b.items() if k != "brief_fingerprint"}
+                m["tenants"] = [tenant_id]
+                continue
+            m["tenants"].append(tenant_id)
+            urgency = (b.get("urgency") or "").lower()
+            if urgency in _URGENCY_ORDER and (
+                    (m.get("urgency") or "").lower() not in _URGENCY_ORDER
+                    or _URGENCY_ORDER.index(urgency) < _URGENCY_ORDER.index(m["urgency"].lower())):
+                m["urgency"] = urgency
+            if b.get("next_tender_date") and (not m.get("next_tender_date")
+                                              or str(b["next_tender_date"]) < str(m["next_tender_date"])):
+                m["next_tender_date"] = b["next_tender_date"]
+            if b.get("probability") is not None:
+                m["probability"] = max(float(b["probability"]), float(m.get("probability") or 0.0))
+            if b.get("total_value_eur") is not None:
+                m["total_value_eur"] = float(m.get("total_value_eur") or 0.0) + float(b["total_value_eur"])
+            if b.get("predictions"):
+                m["predictions"] = (m.get("predictions") or 0) + b["predictions"]
+            if "brief_expires_at" in b and m.get("brief_expires_at") is not None and (
+                    b["brief_expires_at"] is None or str(b["brief_expires_at"]) < str(m["brief_expires_at"])):
+                m["brief_expires_at"] = b["brief_expires_at"]
+    return list(merged.values())
+
+
+def filter_shared_cached(buyers):
+    """
+    Split merged buyers on the shared layer: (uncached, fresh). uncached
+    have no valid shared brief and gain "brief_fingerprint" (that of the
+    expired shared brief, or None), as filter_already_cached() sets for one
+    tenant; fresh only need attaching. Uses get_uncached_shared_buyers,
+    CACHE_CHECK_BATCH_SIZE pairs per call.
+    """
+    uncached, fresh = [], []
+    for i in range(0, len(buyers), CACHE_CHECK_BATCH_SIZE):
+        chunk = buyers[i:i+CACHE_CHECK_BATCH_SIZE]
+        resp, _ = _with_retries(lambda: get_supabase().rpc("get_uncached_shared_buyers", {
+            "p_category": "forecast",
+            "p_buyer_names": [b["buyer_name"] for b in chunk],
+            "p_countries": [b["country"] for b in chunk],
+        }).execute(), PREFETCH_RETRIES)
+        expired = {row["idx"]: row.get("expired_fingerprint") for row in resp.data or []}
+        for idx, b in enumerate(chunk, start=1):
+            if idx in expired:
+                uncached.append({**b, "brief_fingerprint": expired[idx]})
+            else:
+                fresh.append(b)
+    return uncached, fresh
+
+
+def shared_entity_ids(buyers):
+    """
+    fetch_buyer_entity_ids() for merged buyers: each tenant resolves the
+    buyers it lists, the first resolved id wins. None when the RPC is
+    unavailable.
+    """
+    entity_ids = [None] * len(buyers)
+    tenant_ids = list(dict.fromkeys(t for b in buyers for t in b["tenants"]))
+    for tenant_id in tenant_ids:
+        positions = [i for i, b in enumerate(buyers) if tenant_id in b["tenants"] and entity_ids[i] is None]
+        if not positions:
+            continue
+        ids = fetch_buyer_entity_ids([buyers[i] for i in positions], tenant_id=tenant_id)
+        if ids is None:
+            return None
+        for i, entity_id in zip(positions, ids):
+            entity_ids[i] = entity_id
+    return entity_ids
+
+
+def renew_shared_briefs(unchanged, ttl_days=BRIEF_TTL_DAYS):
+    """
+    renew_unchanged_briefs() against the shared layer: extend expires_at of
+    shared briefs whose fingerprint still matches. unchanged is a list of
+    (buyer_name, country, fingerprint); returns the renewed (buyer_name,
+    country) set. Renewed briefs still need attaching to their tenants.
+    """
+    renewed = set()
+    for i in range(0, len(unchanged), RENEW_BATCH_SIZE):
+        chunk = unchanged[i:i+RENEW_BATCH_SIZE]
+        try:
+            resp = get_supabase().rpc("renew_shared_buyer_research_briefs", {
+                "p_category": "forecast",
+                "p_buyer_names": [c[0] for c in chunk],
+                "p_countries": [c[1] for c in chunk],
+                "p_fingerprints": [c[2] for c in chunk],
+                "p_ttl_days": ttl_days,
+            }).execute()
+        except Exception as e:
+            print(f"  ⚠ Shared brief renewal failed for {len(chunk)} buyers: {e}")
+            continue
+        for row in resp.data or []:
+            renewed.add((row["buyer_name"], row["country"]))
+    return renewed
+
+
+def tenant_attachments(buyers, only=None):
+    """
+    (tenant_id, buyer_name, country) for every tenant of every buyer and of
+    its aliases; with `only` (a set of (buyer_name, country)), just those.
+    """
+    out = []
+    for b in buyers:
+        for name in (b, *b.get("aliases", ())):
+            key = (name["buyer_name"], name["country"])
+            if only is None or key in only:
+                out.extend((t, *key) for t in name.get("tenants", ()))
+    return out
+
+
+def attach_shared_briefs(attachments):
+    """
+    Copy valid shared briefs into buyer_research_briefs for each
+    (tenant_id, buyer_name, country), ATTACH_BATCH_SIZE per call. Returns
+    the number attached. A failed call is reported and skipped: the shared
+    brief stays valid, so the next run attaches it without a new request.
+    """
+    attached = 0
+    for i in range(0, len(attachments), ATTACH_BATCH_SIZE):
+        chunk = attachments[i:i+ATTACH_BATCH_SIZE]
+        try:
+            resp, _ = _with_retries(lambda: get_supabase().rpc("attach_shared_buyer_research_briefs", {
+                "p_category": "forecast",
+                "p_tenant_ids": [a[0] for a in chunk],
+                "p_buyer_names": [a[1] for a in chunk],
+                "p_countries": [a[2] for a in chunk],
+            }).execute(), PREFETCH_RETRIES)
+        except Exception as e:
+            print(f"  ⚠ Attaching {len(chunk)} shared briefs failed: {e}")
+            continue
+        attached += len(resp.data or [])
+    return attached
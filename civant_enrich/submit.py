@@ -0,0 +1,185 @@
+"""
+Stage 5: shard and submit batches, and record the custom_id → buyer map.
+
+A run's requests are split into shards that respect the Batches API
+per-batch limits, the shards are submitted concurrently, and one manifest
+ties every shard batch ID to the run. Batches, their custom_id → buyer
+maps and the manifest go to the batch ledger (ledger.py). --poll and
+--ingest accept either a single batch ID or a manifest ID; manifests and
+maps written as JSON files before the ledger are still read.
+"""
+
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from .clients import get_anthropic
+from .config import SHARD_MAX_BYTES, SHARD_MAX_REQUESTS, SUBMIT_WORKERS
+from .ledger import BatchLedger
+
+MANIFEST_PREFIX = "enrich_"
+
+
+def submit_batch(requests):
+    """Submit batch to Anthropic Messages Batches API."""
+    print(f"\n📤 Submitting batch of {len(requests)} requests...")
+    batch = get_anthropic().messages.batches.create(requests=requests)
+    print(f"✅ Batch created: {batch.id}")
+    print(f"   Status: {batch.processing_status}")
+    print(f"   Expires: {batch.expires_at}")
+    return batch.id
+
+
+def shard_requests(requests, max_requests=SHARD_MAX_REQUESTS, max_bytes=SHARD_MAX_BYTES):
+    """
+    Split requests into consecutive shards of at most max_requests entries
+    and max_bytes of serialized JSON each. Returns a list of (requests, bytes).
+    """
+    shards = []
+    current, size = [], 0
+    for r in requests:
+        n = len(json.dumps(r, ensure_ascii=False).encode("utf-8"))
+        if current and (len(current) >= max_requests or size + n > max_bytes):
+            shards.append((current, size))
+            current, size = [], 0
+        current.append(r)
+        size += n
+    if current:
+        shards.append((current, size))
+    return shards
+
+
+def _is_request_rejection(exc):
+    """True when the API rejected the batch contents (4xx other than auth/rate limit)."""
+    status = getattr(exc, "status_code", None)
+    return status is not None and 400 <= status < 500 and status not in (401, 403, 429)
+
+
+def _create_shard(requests):
+    """
+    Create one batch. If the API rejects the contents, bisect so a single bad
+    request only drops itself. Returns (created, rejected) where created is a
+    list of (batch_id, requests) and rejected a list of (custom_id, error).
+    """
+    try:
+        batch = get_anthropic().messages.batches.create(requests=requests)
+        return [(batch.id, requests)], []
+    except Exception as e:
+        if not _is_request_rejection(e):
+            raise
+        if len(requests) == 1:
+            return [], [(requests[0]["custom_id"], str(e))]
+        mid = len(requests) // 2
+        left = _create_shard(requests[:mid])
+        right = _create_shard(requests[mid:])
+        return left[0] + right[0], left[1] + right[1]
+
+
+def submit_sharded(requests, id_map, max_requests=SHARD_MAX_REQUESTS,
+                   max_bytes=SHARD_MAX_BYTES, workers=SUBMIT_WORKERS, ledger=None):
+    """
+    Shard, submit concurrently and record every created batch and the
+    manifest in the ledger (a BatchLedger at LEDGER_PATH unless one is
+    given). Returns the manifest dict ({manifest_id, created_at, shards,
+    rejected, id_map}). A shard whose submission fails outright is recorded
+    with its error; the rest still go.
+    """
+    shards = shard_requests(requests, max_requests, max_bytes)
+    print(f"\n📤 Submitting {len(requests)} requests as {len(shards)} batch(es)...")
+
+    def submit(shard):
+        reqs, size = shard
+        try:
+            created, rejected = _create_shard(reqs)
+            return {"bytes": size, "created": created, "rejected": rejected, "error": None}
+        except Exception as e:
+            return {"bytes": size, "created": [], "rejected": [], "error": str(e),
+                    "requests": len(reqs)}
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        outcomes = list(pool.map(submit, shards))
+
+    created_at = datetime.now(timezone.utc)
+    manifest = {
+        "manifest_id": MANIFEST_PREFIX + created_at.strftime("%Y%m%dT%H%M%SZ"),
+        "created_at": created_at.isoformat(),
+        "shards": [],
+        "rejected": [],
+        "id_map": id_map,
+    }
+    own_ledger = ledger is None
+    if own_ledger:
+        ledger = BatchLedger()
+    for outcome in outcomes:
+        if outcome["error"]:
+            print(f"  ❌ Shard of {outcome['requests']} requests failed: {outcome['error']}")
+            manifest["shards"].append({"batch_id": None, "requests": outcome["requests"],
+                                       "bytes": outcome["bytes"], "error": outcome["error"]})
+            continue
+        for batch_id, reqs in outcome["created"]:
+            print(f"  ✅ {batch_id}: {len(reqs)} requests")
+            manifest["shards"].append({"batch_id": batch_id, "requests": len(reqs),
+                                       "custom_ids": [r["custom_id"] for r in reqs]})
+            ledger.record_batch(batch_id, {r["custom_id"]: id_map[r["custom_id"]] for r in reqs},
+                                manifest_id=manifest["manifest_id"], submitted_at=manifest["created_at"])
+        for custom_id, err in outcome["rejected"]:
+            print(f"  ⚠ Rejected {custom_id}: {err}")
+            manifest["rejected"].append({"custom_id": custom_id, "error": err})
+
+    ledger.record_manifest(manifest)
+    print(f"   Manifest {manifest['manifest_id']} recorded in {ledger.path}")
+    if own_ledger:
+        ledger.close()
+    return manifest
+
+
+def _manifest_file(manifest_id):
+    return f"manifest_{manifest_id}.json"
+
+
+def load_manifest(manifest_id):
+    """A manifest written as JSON before the ledger (see --import-maps)."""
+    with open(_manifest_file(manifest_id)) as f:
+        return json.load(f)
+
+
+def resolve_batch_ids(ref, ledger=None):
+    """
+    Batch IDs behind a --poll/--ingest argument, as (batch_ids, id_map). For a
+    manifest in the ledger that is every submitted shard and id_map None (each
+    batch's map is read from the ledger); for a legacy manifest file it is
+    every shard plus the run's id_map; for a plain batch ID it is ([ref], None).
+    """
+    if ledger is not None and ledger.has_manifest(ref):
+        batch_ids = ledger.manifest_batch_ids(ref)
+        print(f"📦 Manifest {ref}: {len(batch_ids)} batch(es)")
+        return batch_ids, None
+    if ref.startswith(MANIFEST_PREFIX) or os.path.exists(_manifest_file(ref)):
+        manifest = load_manifest(ref)
+        batch_ids = [s["batch_id"] for s in manifest["shards"] if s.get("batch_id")]
+        print(f"📦 Manifest {ref}: {len(batch_ids)} batch(es) (from {_manifest_file(ref)})")
+        return batch_ids, manifest["id_map"]
+    return [ref], None
+
+
+def load_id_map(batch_id, ledger=None):
+    """
+    The id_map recorded at submit time: a ledger view when the batch is in
+    `ledger`, else a batch_<id>_map.json file written before the ledger.
+    None when neither has it.
+    """
+    if ledger is not None:
+        id_map = ledger.id_map(batch_id)
+        if id_map is not None:
+            return id_map
+    map_file = f"batch_{batch_id}_map.json"
+    try:
+        with open(map_file) as f:
+            id_map = json.load(f)
+    except FileNotFoundError:
+        print(f"  ❌ Batch {batch_id} is not in the ledger and {map_file} was not found")
+        print(f"     Import maps from the submit directory with --import-maps, or run from there.")
+        return None
+    print(f"  Loaded {len(id_map)} entries from {map_file} (not in the ledger; see --import-maps)")
+    return id_map
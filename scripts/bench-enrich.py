@@ -0,0 +1,1019 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark for civant_enrich against local stand-ins for Supabase
+(PostgREST) and the Anthropic Messages Batches API. No network, no spend.
+
+A child process runs two fake HTTP servers seeded with a synthetic workload:
+  - PostgREST: predictions, buyer_research_briefs and
+    shared_buyer_research_briefs tables (eq/in/gt/lt/is/not/or filters,
+    order, limit, upsert, a max-rows cap on selects) plus the enrichment
+    RPCs. With --tenants N, N tenants predict overlapping buyer sets.
+  - Batches API: create / retrieve / results, with configurable time to
+    completion, error rate and share of malformed (repair/salvage) JSON;
+    plus POST /v1/messages for the realtime lane (same responses, a fixed
+    latency per call, errors as retryable 529s).
+The parent then drives the real pipeline stage by stage through the real
+SDK clients and reports wall time, throughput and peak RSS per stage, and
+per client the HTTP calls made, new connections opened and mean latency.
+--connect-latency-ms makes each new connection to the fakes cost a
+handshake, as TCP + TLS to the real services does.
+
+Usage:
+  python3 scripts/bench-enrich.py                           # 1k buyers
+  python3 scripts/bench-enrich.py --buyers 1k 10k 100k      # baseline sweep
+  python3 scripts/bench-enrich.py --buyers 10k --parse-workers 4 --json bench.json
+  python3 scripts/bench-enrich.py --error-rate 0.05 --malformed-rate 0.3
+  python3 scripts/bench-enrich.py --buyers 10k --stream     # buyer pages feed the prefetch
+  python3 scripts/bench-enrich.py --realtime-days 14         # urgent buyers via /v1/messages
+  python3 scripts/bench-enrich.py --tenants 5                # one shared brief per buyer, attached per tenant
+  # httpx's stock pool vs. the clients' pooled transport, one award-history RPC per buyer
+  python3 scripts/bench-enrich.py --connect-latency-ms 30 --rpc-latency-ms 20 --workers 32 --bulk-size 0 --http-pool default
+  python3 scripts/bench-enrich.py --connect-latency-ms 30 --rpc-latency-ms 20 --workers 32 --bulk-size 0
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "tests", "fixtures", "extract_json")
+sys.path.insert(0, ROOT)
+
+
+# ---------------------------------------------------------------------------
+# Workload generator
+# ---------------------------------------------------------------------------
+COUNTRY_WEIGHTS = [("ES", 0.60), ("FR", 0.25), ("IE", 0.15)]
+NAME_TEMPLATES = {
+    "ES": ["Ayuntamiento de {}", "Alcaldía del Ayuntamiento de {}", "Pleno del Ayuntamiento de {}",
+           "Diputación Provincial de {}", "Consejería de Sanidad de {}", "Universidad de {}",
+           "Junta de Gobierno Local de {}"],
+    "FR": ["Mairie de {}", "Communauté de communes de {}", "Centre hospitalier de {}",
+           "Département de {}", "Syndicat intercommunal de {}"],
+    "IE": ["{} County Council", "{} City Council", "{} Education and Training Board",
+           "Health Service Executive {}"],
+}
+# Other names the same authority appears under in predictions (organ
+# prefixes, honorifics, the Irish-language name); ~10% of buyers get one
+ALIAS_TEMPLATES = {
+    "Ayuntamiento de {}": ["Alcaldía del Ayuntamiento de {}", "Pleno del Ayuntamiento de {}",
+                           "Excmo. Ayuntamiento de {}", "Junta de Gobierno Local de {}"],
+    "Mairie de {}": ["Ville de {}", "Commune de {}", "Conseil municipal de {}"],
+    "{} County Council": ["Comhairle Contae {}"],
+}
+ALIAS_RATE = 0.10
+# Extra prediction rows per buyer (several predicted tenders), so buyer lists
+# must be DISTINCT; PostgREST's db-max-rows caps every table select
+EXTRA_PREDICTIONS = (0, 0, 1, 2)
+MAX_ROWS = 1000
+SYLLABLES = ["San", "ta", "lé", "ón", "ria", "ca", "bre", "güe", "ña", "vil", "mont", "bel",
+             "cour", "lin", "dun", "kil", "más", "rí", "ber", "go", "sa", "nt", "ville", "ros"]
+SUPPLIERS = ["Acciona", "Ferrovial", "Indra", "Sacyr", "Veolia", "Suez", "Bouygues", "Eiffage",
+             "Sodexo", "Engie", "Telefónica", "Capgemini", "Accenture", "Sisk", "BAM Ireland"]
+CPV_CLUSTERS = ["cluster_it", "cluster_construction", "cluster_health", "cluster_facilities",
+                "cluster_transport", "cluster_energy", "cluster_consulting"]
+TENANT = "civant_default"
+# --tenants N: the first tenant predicts every buyer, each other tenant this share
+TENANT_OVERLAP = 0.6
+
+
+def tenant_ids(n):
+    return [TENANT] + [f"tenant_{i:02d}" for i in range(2, n + 1)]
+
+
+def parse_count(text):
+    text = text.lower().replace(",", "").replace("_", "")
+    return int(float(text[:-1]) * 1000) if text.endswith("k") else int(text)
+
+
+def generate_workload(n, seed):
+    """n unique (buyer_name, country) pairs, deterministic for a seed."""
+    rng = random.Random(seed)
+    countries = [c for c, _ in COUNTRY_WEIGHTS]
+    weights = [w for _, w in COUNTRY_WEIGHTS]
+    seen = set()
+    buyers = []
+    while len(buyers) < n:
+        country = rng.choices(countries, weights)[0]
+        place = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+        name = rng.choice(NAME_TEMPLATES[country]).format(place)
+        if (name, country) in seen:
+            name = f"{name} {len(buyers)}"
+        seen.add((name, country))
+        buyers.append((name, country))
+        template = next((t for t in ALIAS_TEMPLATES if t.format(place) == name), None)
+        if template and rng.random() < ALIAS_RATE and len(buyers) < n:
+            alias = rng.choice(ALIAS_TEMPLATES[template]).format(place)
+            if (alias, country) not in seen:
+                seen.add((alias, country))
+                buyers.append((alias, country))
+    return buyers
+
+
+def prediction_signals(buyer_name, country, seed, index=0):
+    """Synthetic scheduling signals for one of a buyer's predictions."""
+    key = f"{seed}|signals|{buyer_name}|{country}" + (f"|{index}" if index else "")
+    rng = random.Random(zlib.crc32(key.encode()))
+    return {
+        "urgency": "upcoming",
+        "predicted_tender_date": (datetime.now(timezone.utc) + timedelta(days=rng.randint(-10, 365))).date().isoformat(),
+        "probability": round(rng.uniform(0.2, 0.95), 2),
+        "total_value_eur": round(10 ** rng.uniform(3, 7.5), 2) if rng.random() < 0.9 else None,
+    }
+
+
+def award_history(buyer_name, country, seed):
+    """Synthetic get_buyer_award_history payload; ~30% of buyers have none."""
+    rng = random.Random(zlib.crc32(f"{seed}|{buyer_name}|{country}".encode()))
+    if rng.random() < 0.3:
+        return {"stats": {"total_contracts": 0, "unique_suppliers": 0}}
+    k = rng.randint(1, 40)
+    base = datetime(2018, 1, 1)
+
+    def day(lo, hi):
+        return (base + timedelta(days=rng.randint(lo, hi))).date().isoformat()
+
+    clusters = rng.sample(CPV_CLUSTERS, rng.randint(1, 4))
+    suppliers = rng.sample(SUPPLIERS, min(k, rng.randint(1, 5)))
+    if rng.random() < 0.05:  # ministries / health authorities: long supplier and category tails
+        k = rng.randint(200, 2000)
+        suppliers = [f"{rng.choice(SUPPLIERS)} {i}" for i in range(rng.randint(20, 150))]
+        clusters = [f"{rng.choice(CPV_CLUSTERS)}_{i}" for i in range(rng.randint(8, 40))]
+    return {
+        "stats": {
+            "total_contracts": k,
+            "unique_suppliers": len(suppliers),
+            "total_spend": round(rng.uniform(2e4, 5e6), 2),
+            "avg_contract_value": round(rng.uniform(1e4, 4e5), 2),
+            "max_contract_value": round(rng.uniform(4e5, 2e6), 2),
+            "earliest_award": day(0, 900),
+            "latest_award": day(900, 2900),
+            "avg_duration_months": rng.randint(6, 48),
+            "framework_count": rng.randint(0, 3),
+            "cpv_clusters": clusters,
+        },
+        "top_suppliers": [
+            {"supplier": s, "contracts": rng.randint(1, k), "total_value": round(rng.uniform(1e4, 2e6), 2),
+             "last_award": day(900, 2900)}
+            for s in suppliers
+        ],
+        "renewal_patterns": [
+            {"cpv_cluster": c, "occurrences": rng.randint(1, k), "avg_duration": rng.randint(6, 48),
+             "avg_value": round(rng.uniform(1e4, 4e5), 2), "last_end_date": day(2000, 3400)}
+            for c in clusters
+        ],
+        "recent_contracts": [
+            {"value_eur": round(rng.uniform(5e3, 9e5), 2), "supplier": rng.choice(SUPPLIERS),
+             "award_date": day(1500, 2900), "end_date": day(2900, 3600), "cpv_primary": "72000000",
+             "duration_months": rng.randint(6, 48)}
+            for _ in range(min(k, 10))
+        ],
+    }
+
+
+# ---------------------------------------------------------------------------
+# Fake servers (run in the child process)
+# ---------------------------------------------------------------------------
+def _iso(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat()
+
+
+def _split_in_list(text):
+    """Parse a PostgREST in.(a,"b, c",d) value list."""
+    values, cur, quoted, i = [], "", False, 0
+    while i < len(text):
+        ch = text[i]
+        if quoted:
+            if ch == "\\" and i + 1 < len(text):
+                cur += text[i + 1]
+                i += 1
+            elif ch == '"':
+                quoted = False
+            else:
+                cur += ch
+        elif ch == '"':
+            quoted = True
+        elif ch == ",":
+            values.append(cur)
+            cur = ""
+        else:
+            cur += ch
+        i += 1
+    values.append(cur)
+    return values
+
+
+def _split_terms(text):
+    """Split a PostgREST or=(...) body on top-level commas, keeping quotes."""
+    terms, cur, depth, quoted, i = [], "", 0, False, 0
+    while i < len(text):
+        ch = text[i]
+        if quoted and ch == "\\" and i + 1 < len(text):
+            cur += text[i:i + 2]
+            i += 2
+            continue
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and ch == ",":
+            terms.append(cur)
+            cur = ""
+            i += 1
+            continue
+        cur += ch
+        i += 1
+    terms.append(cur)
+    return terms
+
+
+def _matches_logic(row, op, body):
+    """and(...) / or(...) of col.op.value terms, nested."""
+    results = []
+    for term in _split_terms(body):
+        if term.startswith(("and(", "or(")):
+            inner_op, _, rest = term.partition("(")
+            results.append(_matches_logic(row, inner_op, rest[:-1]))
+        else:
+            column, _, expr = term.partition(".")
+            head, _, arg = expr.partition(".")
+            if arg.startswith('"'):
+                arg = _split_in_list(arg)[0]
+            results.append(_matches(row, column, f"{head}.{arg}"))
+    return all(results) if op == "and" else any(results)
+
+
+def _matches(row, column, expr):
+    if column in ("or", "and"):
+        return _matches_logic(row, column, expr.strip("()"))
+    negate = expr.startswith("not.")
+    if negate:
+        expr = expr[4:]
+    op, _, arg = expr.partition(".")
+    value = row.get(column)
+    if op == "eq":
+        ok = value is not None and str(value) == arg
+    elif op == "neq":
+        ok = value is not None and str(value) != arg
+    elif op in ("gt", "gte", "lt", "lte"):
+        if value is None:
+            ok = False
+        else:
+            a, b = str(value), arg
+            ok = {"gt": a > b, "gte": a >= b, "lt": a < b, "lte": a <= b}[op]
+    elif op == "in":
+        ok = value is not None and str(value) in set(_split_in_list(arg.strip("()")))
+    elif op == "is":
+        ok = value is None if arg == "null" else str(value).lower() == arg
+    else:
+        raise ValueError(f"unsupported filter {op}")
+    return ok != negate
+
+
+class FakePostgrest:
+    """In-memory PostgREST: two tables and the civant_enrich RPCs."""
+
+    def __init__(self, buyers, seed, cached_frac, unchanged_frac, latency_s, tenants=1):
+        self.seed = seed
+        self.latency_s = latency_s
+        self.buyers = buyers
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "bytes_in": 0, "bytes_out": 0, "by_route": {}}
+        rng = random.Random(seed + 2)
+        tenant_rng = random.Random(seed + 3)
+        self.tables = {
+            "predictions": [
+                {"tenant_id": tenant, "buyer_name": n, "country": c, "validation_status": "pending",
+                 **prediction_signals(n, c, seed, k)}
+                for n, c in buyers
+                for tenant in tenant_ids(tenants)
+                if tenant == TENANT or tenant_rng.random() < TENANT_OVERLAP
+                for k in range(1 + rng.choice(EXTRA_PREDICTIONS))
+            ],
+        }
+        for i, row in enumerate(self.tables["predictions"]):
+            row["id"] = f"pred-{i:08d}"
+        self.merged = {}
+        self.briefs = {}
+        self.shared = {}
+        self._seed_briefs(cached_frac, unchanged_frac)
+
+    def _seed_briefs(self, cached_frac, unchanged_frac):
+        from civant_enrich.prompt import build_batch_requests
+
+        rng = random.Random(self.seed + 1)
+        now = time.time()
+        for name, country in self.buyers:
+            r = rng.random()
+            if r < cached_frac:
+                expires, fingerprint = now + 86400 * 3, None
+            elif r < cached_frac + unchanged_frac:
+                history = award_history(name, country, self.seed)
+                _, id_map = build_batch_requests([{"buyer_name": name, "country": country,
+                                                   "award_history": history}])
+                expires, fingerprint = now - 86400, next(iter(id_map.values()))["input_fingerprint"]
+            else:
+                continue
+            self.briefs[(TENANT, name, country, "forecast")] = {
+                "tenant_id": TENANT, "buyer_name": name, "country": country, "category": "forecast",
+                "status": "complete", "expires_at": _iso(expires), "input_fingerprint": fingerprint,
+            }
+
+    def _brief_rows(self):
+        return list(self.briefs.values())
+
+    def _buyer_priorities(self, p):
+        from civant_enrich.schedule import merge_prediction_rows
+
+        key = (p["p_tenant_id"], *sorted(p["p_urgencies"]))
+        with self.lock:
+            if key not in self.merged:  # predictions never change; merge once per tenant and urgency set
+                rows = [r for r in self.tables["predictions"] if r["tenant_id"] == key[0] and r["urgency"] in key[1:]]
+                self.merged[key] = sorted(merge_prediction_rows(rows), key=lambda b: (b["buyer_name"], b["country"]))
+        out = []
+        for b in self.merged[key]:
+            brief = self.briefs.get((p["p_tenant_id"], b["buyer_name"], b["country"], p["p_category"]))
+            out.append({**b, "brief_expires_at": brief["expires_at"] if brief else None})
+        return out
+
+    def rpc(self, name, p):
+        now_iso = _iso(time.time())
+        if name == "get_batch_enrichment_buyers":
+            return 200, [{"buyer_name": n, "country": c} for n, c in self.buyers]
+        if name == "get_enrichment_buyer_priorities":
+            return 200, self._buyer_priorities(p)
+        if name == "get_enrichment_buyer_priorities_page":
+            out = self._buyer_priorities(p)
+            if p.get("p_after_buyer_name") is not None:
+                after = (p["p_after_buyer_name"], p["p_after_country"])
+                out = [b for b in out if (b["buyer_name"], b["country"]) > after]
+            return 200, out[:p["p_limit"]]
+        if name == "get_enrichment_tenants":
+            counts = {}
+            for r in self.tables["predictions"]:
+                if r["urgency"] in p["p_urgencies"]:
+                    counts.setdefault(r["tenant_id"], set()).add((r["buyer_name"], r["country"]))
+            return 200, sorted(({"tenant_id": t, "buyers": len(b)} for t, b in counts.items()),
+                               key=lambda row: (-row["buyers"], row["tenant_id"]))
+        if name == "get_buyer_entity_ids":
+            # Only the Irish county councils resolve: the English and Irish names share no spelling
+            out = []
+            for idx, n in enumerate(p["p_buyer_names"], start=1):
+                place = n[:-len(" County Council")] if n.endswith(" County Council") else \
+                    n[len("Comhairle Contae "):] if n.startswith("Comhairle Contae ") else None
+                out.append({"idx": idx, "entity_id": f"ie-county:{place}" if place else None})
+            return 200, out
+        if name == "get_uncached_buyers":
+            out = []
+            for idx, (n, c) in enumerate(zip(p["p_buyer_names"], p["p_countries"]), start=1):
+                brief = self.briefs.get((p["p_tenant_id"], n, c, p["p_category"]))
+                if brief and brief["status"] == "complete" and brief["expires_at"] > now_iso:
+                    continue
+                out.append({"idx": idx, "buyer_name": n, "country": c,
+                            "expired_fingerprint": brief.get("input_fingerprint") if brief else None})
+            return 200, out
+        if name == "get_buyer_award_history_bulk":
+            return 200, [
+                {"idx": idx, "buyer_name": n, "country": c, "award_history": award_history(n, c, self.seed)}
+                for idx, (n, c) in enumerate(zip(p["p_buyer_names"], p["p_countries"]), start=1)
+            ]
+        if name == "get_buyer_award_history":
+            return 200, award_history(p["p_buyer_name"], p["p_country"], self.seed)
+        if name == "renew_buyer_research_briefs":
+            out = []
+            expires = _iso(time.time() + 86400 * p["p_ttl_days"])
+            with self.lock:
+                for n, c, fp in zip(p["p_buyer_names"], p["p_countries"], p["p_fingerprints"]):
+                    brief = self.briefs.get((p["p_tenant_id"], n, c, p["p_category"]))
+                    if brief and brief["status"] == "complete" and brief.get("input_fingerprint") == fp:
+                        brief["expires_at"] = expires
+                        out.append({"buyer_name": n, "country": c, "expires_at": expires})
+            return 200, out
+        if name == "get_uncached_shared_buyers":
+            out = []
+            for idx, (n, c) in enumerate(zip(p["p_buyer_names"], p["p_countries"]), start=1):
+                brief = self.shared.get((n, c, p["p_category"]))
+                if brief and brief["status"] == "complete" and brief["expires_at"] > now_iso:
+                    continue
+                out.append({"idx": idx, "buyer_name": n, "country": c,
+                            "expired_fingerprint": brief.get("input_fingerprint") if brief else None})
+            return 200, out
+        if name == "renew_shared_buyer_research_briefs":
+            out = []
+            expires = _iso(time.time() + 86400 * p["p_ttl_days"])
+            with self.lock:
+                for n, c, fp in zip(p["p_buyer_names"], p["p_countries"], p["p_fingerprints"]):
+                    brief = self.shared.get((n, c, p["p_category"]))
+                    if brief and brief["status"] == "complete" and brief.get("input_fingerprint") == fp:
+                        brief["expires_at"] = expires
+                        out.append({"buyer_name": n, "country": c, "expires_at": expires})
+            return 200, out
+        if name == "attach_shared_buyer_research_briefs":
+            out = []
+            with self.lock:
+                for t, n, c in zip(p["p_tenant_ids"], p["p_buyer_names"], p["p_countries"]):
+                    brief = self.shared.get((n, c, p["p_category"]))
+                    if not brief or brief["status"] != "complete" or brief["expires_at"] <= now_iso:
+                        continue
+                    key = (t, n, c, p["p_category"])
+                    self.briefs[key] = {**self.briefs.get(key, {}), **brief, "tenant_id": t, "tokens_used": 0,
+                                        "research_cost_usd": 0, "shared_brief_id": brief["id"]}
+                    self.briefs[key].pop("id", None)
+                    out.append({"tenant_id": t, "buyer_name": n, "country": c})
+            return 200, out
+        return 404, {"code": "PGRST202", "message": f"Could not find the function public.{name}"}
+
+    def select(self, table, query):
+        rows = self._brief_rows() if table == "buyer_research_briefs" else \
+            list(self.shared.values()) if table == "shared_buyer_research_briefs" else self.tables.get(table)
+        if rows is None:
+            return 404, {"code": "42P01", "message": f'relation "public.{table}" does not exist'}
+        columns, order, limit, offset = None, None, None, 0
+        filters = []
+        for key, value in query:
+            if key == "select":
+                columns = None if value == "*" else [c.strip() for c in value.split(",")]
+            elif key == "order":
+                order = value
+            elif key == "limit":
+                limit = int(value)
+            elif key == "offset":
+                offset = int(value)
+            else:
+                filters.append((key, value))
+        rows = [r for r in rows if all(_matches(r, k, v) for k, v in filters)]
+        if order:
+            for part in reversed(order.split(",")):
+                col, _, direction = part.partition(".")
+                rows.sort(key=lambda r: (r.get(col) is None, r.get(col) or ""),
+                          reverse=direction.startswith("desc"))
+        limit = min(limit, MAX_ROWS) if limit is not None else MAX_ROWS
+        rows = rows[offset:offset + limit]
+        if columns:
+            rows = [{c: r.get(c) for c in columns} for r in rows]
+        return 200, rows
+
+    def upsert(self, table, rows, query):
+        if table not in ("buyer_research_briefs", "shared_buyer_research_briefs"):
+            return 404, {"code": "42P01", "message": f'relation "public.{table}" does not exist'}
+        rows = rows if isinstance(rows, list) else [rows]
+        store = self.briefs if table == "buyer_research_briefs" else self.shared
+        default_key = "tenant_id,buyer_name,country,category" if store is self.briefs else "buyer_name,country,category"
+        key_cols = dict(query).get("on_conflict", default_key).split(",")
+        with self.lock:
+            for row in rows:
+                key = tuple(row.get(c) for c in key_cols)
+                store[key] = {**store.get(key, {"id": str(uuid.uuid4())} if store is self.shared else {}), **row}
+        return 201, rows
+
+
+class FakeBatches:
+    """In-memory Messages Batches API with synthetic results."""
+
+    MAX_REQUESTS = 100_000
+    MAX_BYTES = 256 * 1024 * 1024
+
+    def __init__(self, seed, latency_s, error_rate, malformed_rate):
+        from civant_enrich.parse import STRATEGY_JSON, parse_brief
+
+        self.seed = seed
+        self.latency_s = latency_s
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.batches = {}
+        self.lock = threading.Lock()
+        self.clean, self.malformed = [], []
+        for name in sorted(f for f in os.listdir(FIXTURES) if f.endswith(".txt")):
+            with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+                raw = f.read()
+            (self.clean if parse_brief(raw)[1] == STRATEGY_JSON else self.malformed).append(raw)
+
+    def create(self, body, size):
+        requests = body.get("requests") or []
+        if len(requests) > self.MAX_REQUESTS or size > self.MAX_BYTES:
+            return 413, {"type": "error", "error": {"type": "request_too_large",
+                                                    "message": "Batch exceeds request count or size limit"}}
+        batch_id = f"msgbatch_bench_{uuid.uuid4().hex[:16]}"
+        now = time.time()
+        with self.lock:
+            self.batches[batch_id] = {"ids": [r["custom_id"] for r in requests], "created": now}
+        return 200, self.batch_object(batch_id)
+
+    def batch_object(self, batch_id, base_url=""):
+        b = self.batches[batch_id]
+        n = len(b["ids"])
+        elapsed = time.time() - b["created"]
+        done = n if elapsed >= self.latency_s else int(n * elapsed / self.latency_s)
+        ended = done >= n
+        errored = sum(1 for cid in b["ids"][:done] if self._outcome(cid)[0] == "errored") if ended else 0
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {"processing": n - done, "succeeded": done - errored, "errored": errored,
+                               "canceled": 0, "expired": 0},
+            "created_at": _iso(b["created"]),
+            "expires_at": _iso(b["created"] + 86400),
+            "ended_at": _iso(b["created"] + self.latency_s) if ended else None,
+            "cancel_initiated_at": None,
+            "archived_at": None,
+            "results_url": f"{base_url}/v1/messages/batches/{batch_id}/results" if ended else None,
+        }
+
+    def _outcome(self, custom_id):
+        rng = random.Random(zlib.crc32(f"{self.seed}|{custom_id}".encode()))
+        r = rng.random()
+        if r < self.error_rate:
+            return "errored", None
+        pool = self.malformed if rng.random() < self.malformed_rate and self.malformed else self.clean
+        return "succeeded", (pool[rng.randrange(len(pool))], rng)
+
+    def _message(self, key, text, rng):
+        return {
+            "id": f"msg_{key}", "type": "message", "role": "assistant",
+            "model": "claude-haiku-4-5-20251001",
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn", "stop_sequence": None,
+            "usage": {"input_tokens": rng.randint(1500, 4000), "output_tokens": rng.randint(400, 1500),
+                      "cache_creation_input_tokens": 0, "cache_read_input_tokens": 0,
+                      "server_tool_use": {"web_search_requests": rng.randint(1, 4)}},
+        }
+
+    def result_line(self, custom_id):
+        kind, payload = self._outcome(custom_id)
+        if kind == "errored":
+            result = {"type": "errored", "error": {"type": "error", "error": {
+                "type": "overloaded_error", "message": "Overloaded"}}}
+        else:
+            result = {"type": "succeeded", "message": self._message(custom_id, *payload)}
+        return json.dumps({"custom_id": custom_id, "result": result}) + "\n"
+
+    def create_message(self, body, latency_s):
+        """POST /v1/messages: the same synthetic briefs, keyed by the user turn."""
+        time.sleep(latency_s)
+        key = f"{zlib.crc32(json.dumps(body.get('messages'), sort_keys=True).encode()):08x}"
+        if random.random() < self.error_rate:
+            return 529, {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}}
+        kind, payload = self._outcome(key)
+        if kind == "errored":  # deterministic errors are batch-only; a realtime call just succeeds
+            payload = (self.clean[0], random.Random(key))
+        return 200, self._message(key, *payload)
+
+
+def make_handler(route, stats, latency_s, connect_latency_s=0):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self):
+            # One handler per connection: stands in for the TCP + TLS handshake
+            stats["connections"] = stats.get("connections", 0) + 1
+            if connect_latency_s:
+                time.sleep(connect_latency_s)
+            super().setup()
+
+        def log_message(self, *args):
+            pass
+
+        def _body(self):
+            n = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(n) if n else b""
+            stats["bytes_in"] += len(raw)
+            return raw
+
+        def send_json(self, status, payload):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            stats["bytes_out"] += len(data)
+
+        def send_chunked(self, lines):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/binary")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            buf = []
+            for line in lines:
+                buf.append(line)
+                if len(buf) >= 256:
+                    self._chunk("".join(buf).encode())
+                    buf = []
+            if buf:
+                self._chunk("".join(buf).encode())
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _chunk(self, data):
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            stats["bytes_out"] += len(data)
+
+        def handle_any(self, method):
+            stats["requests"] += 1
+            parts = urlsplit(self.path)
+            route_key = f"{method} {parts.path.rsplit('/', 1)[0] if 'msgbatch' in parts.path else parts.path}"
+            stats["by_route"][route_key] = stats["by_route"].get(route_key, 0) + 1
+            if latency_s:
+                time.sleep(latency_s)
+            raw = self._body() if method in ("POST", "PATCH") else b""
+            try:
+                route(self, method, unquote(parts.path), parse_qsl(parts.query, keep_blank_values=True), raw)
+            except Exception as e:  # surface fake bugs as 500s rather than hung sockets
+                self.send_json(500, {"message": f"fake server error: {e}"})
+
+        def do_GET(self):
+            self.handle_any("GET")
+
+        def do_POST(self):
+            self.handle_any("POST")
+
+        def do_PATCH(self):
+            self.handle_any("PATCH")
+
+    return Handler
+
+
+def serve_fakes(args):
+    """Child-process entry: start both fakes, print their ports, serve until killed."""
+    n = parse_count(args.buyers[0])
+    buyers = generate_workload(n, args.seed)
+    pg = FakePostgrest(buyers, args.seed, args.cached_frac, args.unchanged_frac, 0, tenants=args.tenants)
+    ab = FakeBatches(args.seed, args.batch_latency, args.error_rate, args.malformed_rate)
+
+    def pg_route(h, method, path, query, raw):
+        if path == "/__stats":
+            return h.send_json(200, {**pg.stats, "briefs": len(pg.briefs), "shared_briefs": len(pg.shared)})
+        prefix = "/rest/v1/"
+        if not path.startswith(prefix):
+            return h.send_json(404, {"message": "not found"})
+        name = path[len(prefix):]
+        if name.startswith("rpc/"):
+            status, payload = pg.rpc(name[4:], json.loads(raw or b"{}"))
+        elif method == "GET":
+            status, payload = pg.select(name, query)
+        else:
+            status, payload = pg.upsert(name, json.loads(raw or b"[]"), query)
+        h.send_json(status, payload)
+
+    def ab_route(h, method, path, query, raw):
+        if path == "/__stats":
+            return h.send_json(200, ab_stats)
+        base = f"http://127.0.0.1:{ab_server.server_address[1]}"
+        if path == "/v1/messages" and method == "POST":
+            return h.send_json(*ab.create_message(json.loads(raw), args.message_latency))
+        if path == "/v1/messages/batches" and method == "POST":
+            return h.send_json(*ab.create(json.loads(raw), len(raw)))
+        tail = path[len("/v1/messages/batches/"):] if path.startswith("/v1/messages/batches/") else ""
+        batch_id, _, action = tail.partition("/")
+        if batch_id not in ab.batches:
+            return h.send_json(404, {"type": "error", "error": {"type": "not_found_error",
+                                                                "message": f"batch {batch_id} not found"}})
+        if action == "results":
+            return h.send_chunked(ab.result_line(cid) for cid in ab.batches[batch_id]["ids"])
+        h.send_json(200, ab.batch_object(batch_id, base))
+
+    ab_stats = {"requests": 0, "bytes_in": 0, "bytes_out": 0, "by_route": {}}
+    connect_s = args.connect_latency_ms / 1000
+    pg_server = ThreadingHTTPServer(("127.0.0.1", 0),
+                                    make_handler(pg_route, pg.stats, args.rpc_latency_ms / 1000, connect_s))
+    ab_server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(ab_route, ab_stats, 0, connect_s))
+    for server in (pg_server, ab_server):
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"READY {pg_server.server_address[1]} {ab_server.server_address[1]}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+# ---------------------------------------------------------------------------
+# Stage measurement (parent process)
+# ---------------------------------------------------------------------------
+def current_rss():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Stage:
+    """Wall time and sampled peak RSS of one pipeline stage; set .items inside the block."""
+
+    def __init__(self, name, results):
+        self.name = name
+        self.items = 0
+        self.results = results
+
+    def __enter__(self):
+        self.peak = current_rss()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        self.started = time.perf_counter()
+        return self
+
+    def _sample(self):
+        while not self._stop.wait(0.005):
+            self.peak = max(self.peak, current_rss())
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.started
+        self._stop.set()
+        self._sampler.join()
+        self.peak = max(self.peak, current_rss())
+        self.results.append({"stage": self.name, "items": self.items, "wall_s": round(wall, 4),
+                             "items_per_s": round(self.items / wall, 1) if wall > 0 else None,
+                             "peak_rss_mb": round(self.peak / 2**20, 1)})
+
+
+def _fake_stats(port):
+    import httpx
+    return httpx.get(f"http://127.0.0.1:{port}/__stats").json()
+
+
+def _http_summary(metrics):
+    """Per client: HTTP calls, new connections and mean time to response headers."""
+    out = {}
+    with metrics._lock:
+        for (name, labels), value in metrics.counters.items():
+            if name == "http_connections_total":
+                labels = dict(labels)
+                c = out.setdefault(labels["client"], {"requests": 0, "new_connections": 0, "mean_ms": None})
+                c["requests"] += value
+                if labels["connection"] == "new":
+                    c["new_connections"] += value
+        for client, c in out.items():
+            hists = [h for (name, labels), h in metrics.histograms.items()
+                     if name == "http_request_duration_seconds" and dict(labels)["client"] == client]
+            count = sum(h.count for h in hists)
+            if count:
+                c["mean_ms"] = round(1000 * sum(h.sum for h in hists) / count, 2)
+    return out
+
+
+def run_workload(n, args, workdir):
+    from civant_enrich import clients
+    from civant_enrich.fetch import (
+        fetch_award_history_bulk, fetch_brief_fingerprints, fetch_buyer_entity_ids, fetch_buyers,
+        filter_already_cached, iter_buyer_pages, prefetch_award_histories, renew_unchanged_briefs,
+    )
+    from civant_enrich.ingest import ingest_results
+    from civant_enrich.ledger import BatchLedger
+    from civant_enrich.metrics import METRICS
+    from civant_enrich.realtime import is_urgent, run_realtime
+    from civant_enrich.poll import watch_batches
+    from civant_enrich.prompt import build_batch_requests
+    from civant_enrich.aliases import group_aliases
+    from civant_enrich.schedule import rank_buyers
+    from civant_enrich.shared import (
+        attach_shared_briefs, collect_tenant_buyers, filter_shared_cached, renew_shared_briefs, shared_entity_ids,
+        tenant_attachments,
+    )
+    from civant_enrich.submit import submit_sharded
+
+    cmd = [sys.executable, os.path.abspath(__file__), "--serve", "--buyers", str(n),
+           "--seed", str(args.seed), "--cached-frac", str(args.cached_frac),
+           "--unchanged-frac", str(args.unchanged_frac), "--rpc-latency-ms", str(args.rpc_latency_ms),
+           "--batch-latency", str(args.batch_latency), "--error-rate", str(args.error_rate),
+           "--malformed-rate", str(args.malformed_rate), "--message-latency", str(args.message_latency),
+           "--tenants", str(args.tenants), "--connect-latency-ms", str(args.connect_latency_ms)]
+    child = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    try:
+        line = child.stdout.readline().split()
+        if not line or line[0] != "READY":
+            raise RuntimeError("fake servers failed to start")
+        pg_port, ab_port = int(line[1]), int(line[2])
+        os.environ["SUPABASE_URL"] = f"http://127.0.0.1:{pg_port}"
+        os.environ["SUPABASE_SERVICE_ROLE_KEY"] = "bench"
+        os.environ["ANTHROPIC_API_KEY"] = "bench"
+        os.environ["ANTHROPIC_BASE_URL"] = f"http://127.0.0.1:{ab_port}"
+        clients._supabase = clients._anthropic = None
+        if args.http_pool == "default":
+            # httpx's own pool, as the clients used before pooled_transport(): 20 kept-alive
+            # connections for 5 s, HTTP/1.1
+            clients.HTTP_MAX_CONNECTIONS, clients.HTTP_MAX_KEEPALIVE, clients.HTTP_KEEPALIVE_S = 100, 20, 5.0
+            clients.HTTP2 = "0"
+        clients.get_supabase()  # build both clients (and import the SDKs) outside the timed stages
+        clients.get_anthropic()
+        with METRICS._lock:  # count this workload's HTTP calls only
+            METRICS.counters.clear()
+            METRICS.histograms.clear()
+
+        stages = []
+        bulk_fetch = fetch_award_history_bulk if args.bulk_size > 0 else None
+        shared = args.tenants > 1
+        pairs = None
+        log_path = os.path.join(workdir, f"bench_{n}.log")
+        with open(log_path, "w") as log, contextlib.redirect_stdout(log):
+            if shared:
+                # As the CLI does with --tenants: tenants listed concurrently and merged, then the
+                # shared-layer check
+                with Stage("fetch_buyers", stages) as s:
+                    buyers, s.items = collect_tenant_buyers(tenant_ids(args.tenants), workers=args.tenant_workers)
+                pairs = sum(len(b["tenants"]) for b in buyers)
+                with Stage("cache_check", stages) as s:
+                    s.items = len(buyers)
+                    buyers, fresh = filter_shared_cached(buyers)
+                with Stage("attach", stages) as s:
+                    s.items = attach_shared_briefs(tenant_attachments(fresh))
+            elif args.stream:
+                # As the CLI does without --limit / --budget-usd: list, cache-check
+                # and prefetch overlap, ranking and alias grouping come after
+                with Stage("list+prefetch", stages) as s:
+                    buyers = prefetch_award_histories(
+                        (b for page in iter_buyer_pages() for b in filter_already_cached(page, quiet=True)),
+                        workers=args.workers, bulk_fetch=bulk_fetch,
+                        bulk_size=args.bulk_size)
+                    s.items = len(buyers)
+            else:
+                with Stage("fetch_buyers", stages) as s:
+                    buyers = fetch_buyers()
+                    s.items = len(buyers)
+                with Stage("cache_check", stages) as s:
+                    s.items = len(buyers)
+                    buyers = filter_already_cached(buyers)
+            with Stage("schedule", stages) as s:
+                buyers = rank_buyers(buyers)
+                s.items = len(buyers)
+            with Stage("dedupe", stages) as s:
+                s.items = len(buyers)
+                buyers = group_aliases(buyers, shared_entity_ids(buyers) if shared else fetch_buyer_entity_ids(buyers))
+            if args.stream and not shared:
+                history = buyers
+            else:
+                with Stage("prefetch", stages) as s:
+                    history = prefetch_award_histories(buyers, workers=args.workers,
+                                                       bulk_fetch=bulk_fetch,
+                                                       bulk_size=args.bulk_size)
+                    s.items = len(history)
+            with Stage("build_requests", stages) as s:
+                requests, id_map = build_batch_requests(history)
+                s.items = len(requests)
+            with Stage("renew", stages) as s:
+                previous = fetch_brief_fingerprints(buyers)
+                unchanged = [(name, country, e["input_fingerprint"]) for e in id_map.values()
+                             if previous.get((e["buyer_name"], e["country"])) == e["input_fingerprint"]
+                             for name, country in [(e["buyer_name"], e["country"]), *e.get("aliases", ())]]
+                renewed = renew_shared_briefs(unchanged) if shared else renew_unchanged_briefs(unchanged)
+                if shared:
+                    attach_shared_briefs(tenant_attachments(history, only=renewed))
+                requests = [r for r in requests
+                            if (id_map[r["custom_id"]]["buyer_name"], id_map[r["custom_id"]]["country"])
+                            not in renewed]
+                id_map = {r["custom_id"]: id_map[r["custom_id"]] for r in requests}
+                s.items = len(unchanged)
+            urgent = []
+            if args.realtime_days is not None:
+                keys = {(b["buyer_name"], b["country"]) for b in history if is_urgent(b, args.realtime_days)}
+                urgent = [r for r in requests
+                          if (id_map[r["custom_id"]]["buyer_name"], id_map[r["custom_id"]]["country"]) in keys]
+                requests = [r for r in requests if r not in urgent]
+            with Stage("submit", stages) as s:
+                manifest = submit_sharded(requests, id_map, max_requests=args.shard_size)
+                batch_ids = [sh["batch_id"] for sh in manifest["shards"] if sh.get("batch_id")]
+                s.items = len(requests)
+            if urgent:
+                with Stage("realtime", stages) as s:
+                    ledger = BatchLedger()
+                    run_realtime(urgent, {r["custom_id"]: id_map[r["custom_id"]] for r in urgent},
+                                 rpm=args.realtime_rpm, itpm=args.realtime_itpm,
+                                 workers=args.realtime_workers, ledger=ledger)
+                    ledger.close()
+                    s.items = len(urgent)
+            with Stage("poll", stages) as s:
+                watch_batches(batch_ids, lo=0.2, hi=2)
+                s.items = len(batch_ids)
+            with Stage("ingest", stages) as s:
+                for batch_id in batch_ids:
+                    ingest_results(batch_id, parse_workers=args.parse_workers)
+                s.items = len(requests)
+            by_tenant = None
+            if shared:
+                ledger = BatchLedger()
+                by_tenant = ledger.tenant_report(batch_ids)
+                ledger.close()
+
+        return {"buyers": n, "tenants": args.tenants, "tenant_pairs": pairs,
+                "renewed": len(renewed), "submitted": len(requests), "realtime": len(urgent),
+                "by_tenant": by_tenant, "http": _http_summary(METRICS),
+                "stages": stages, "total_s": round(sum(st["wall_s"] for st in stages), 3),
+                "postgrest": _fake_stats(pg_port), "batches": _fake_stats(ab_port), "log": log_path}
+    finally:
+        child.terminate()
+        child.wait()
+
+
+def print_report(result):
+    realtime = f", {result['realtime']:,} realtime" if result.get("realtime") else ""
+    print(f"\n=== {result['buyers']:,} buyers ({result['submitted']:,} submitted{realtime}, "
+          f"{result['renewed']:,} renewed) ===")
+    if result.get("tenant_pairs") is not None:
+        print(f"{result['tenants']} tenants: {result['tenant_pairs']:,} (tenant, buyer) pairs needed a brief")
+    print(f"{'stage':<16} {'items':>9} {'wall s':>9} {'items/s':>11} {'peak RSS MB':>12}")
+    for st in result["stages"]:
+        rate = f"{st['items_per_s']:,.0f}" if st["items_per_s"] is not None else "-"
+        print(f"{st['stage']:<16} {st['items']:>9,} {st['wall_s']:>9.3f} {rate:>11} {st['peak_rss_mb']:>12.1f}")
+    print(f"{'total':<16} {'':>9} {result['total_s']:>9.3f}")
+    pg, ab = result["postgrest"], result["batches"]
+    print(f"fake PostgREST: {pg['requests']:,} requests, {pg['bytes_in'] / 2**20:.1f} MB in, "
+          f"{pg['bytes_out'] / 2**20:.1f} MB out, {pg['briefs']:,} briefs stored"
+          + (f", {pg['shared_briefs']:,} shared" if pg.get("shared_briefs") else ""))
+    if result.get("by_tenant"):
+        print(f"{'tenant':<16} {'requests':>9} {'briefs':>9} {'tokens':>11} {'cost':>9}")
+        for t in result["by_tenant"]:
+            print(f"{t['tenant_id']:<16} {t['requests']:>9,} {t['briefs']:>9,} {t['tokens']:>11,} "
+                  f"${t['cost_usd']:>8.2f}")
+    for client, c in sorted(result.get("http", {}).items()):
+        mean = f"{c['mean_ms']:.2f} ms" if c["mean_ms"] is not None else "-"
+        print(f"http {client:<10} {c['requests']:,} calls, {c['new_connections']:,} new connections, "
+              f"{mean} mean to headers")
+    print(f"fake Batches:   {ab['requests']:,} requests, {ab['bytes_in'] / 2**20:.1f} MB in, "
+          f"{ab['bytes_out'] / 2**20:.1f} MB out")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="civant_enrich end-to-end benchmark against local fakes")
+    parser.add_argument("--buyers", nargs="+", default=["1k"], help="Workload sizes, e.g. 1k 10k 100k")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--cached-frac", type=float, default=0.2, help="Buyers with a valid brief")
+    parser.add_argument("--unchanged-frac", type=float, default=0.1,
+                        help="Buyers with an expired brief whose input fingerprint still matches")
+    parser.add_argument("--rpc-latency-ms", type=float, default=2.0, help="Added latency per PostgREST request")
+    parser.add_argument("--batch-latency", type=float, default=1.0, help="Seconds until a batch ends")
+    parser.add_argument("--message-latency", type=float, default=0.3,
+                        help="Seconds per realtime (POST /v1/messages) call")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="Share of errored batch results")
+    parser.add_argument("--malformed-rate", type=float, default=0.1,
+                        help="Share of succeeded results needing JSON repair or salvage")
+    parser.add_argument("--connect-latency-ms", type=float, default=0.0,
+                        help="Added latency per new connection to either fake (handshake stand-in)")
+    parser.add_argument("--workers", type=int, default=8, help="Prefetch threads")
+    parser.add_argument("--bulk-size", type=int, default=200,
+                        help="Buyers per bulk award-history RPC; 0 = one RPC per buyer")
+    parser.add_argument("--http-pool", choices=("tuned", "default"), default="tuned",
+                        help="tuned: the clients' pooled transport; default: httpx's stock pool, for comparison")
+    parser.add_argument("--parse-workers", type=int, default=1, help="Ingest parse processes")
+    parser.add_argument("--shard-size", type=int, default=10_000, help="Requests per batch")
+    parser.add_argument("--realtime-days", type=int, metavar="DAYS",
+                        help="Send buyers tendering within DAYS through the realtime lane")
+    parser.add_argument("--realtime-rpm", type=int, default=600, help="Realtime lane requests per minute")
+    parser.add_argument("--realtime-itpm", type=int, default=2_000_000,
+                        help="Realtime lane input tokens per minute")
+    parser.add_argument("--realtime-workers", type=int, default=8, help="Concurrent realtime lane calls")
+    parser.add_argument("--tenants", type=int, default=1,
+                        help="Tenants with overlapping buyers; above 1, buyers are researched once into the "
+                             "shared layer and attached per tenant")
+    parser.add_argument("--tenant-workers", type=int, default=4, help="Tenants listed concurrently (--tenants)")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream buyer pages into the prefetch instead of listing all buyers first")
+    parser.add_argument("--json", metavar="PATH", help="Also write results as JSON")
+    parser.add_argument("--keep", action="store_true", help="Keep the working directory (logs, maps)")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve_fakes(args)
+        return
+
+    if args.json:
+        args.json = os.path.abspath(args.json)
+    workdir = tempfile.mkdtemp(prefix="bench-enrich-")
+    os.environ["ENRICH_STATE_DIR"] = os.path.join(workdir, "state")
+    os.chdir(workdir)
+    results = []
+    try:
+        for size in args.buyers:
+            result = run_workload(parse_count(size), args, workdir)
+            print_report(result)
+            results.append(result)
+    finally:
+        if args.keep:
+            print(f"\nWorking directory kept: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for civant_enrich.parse.extract_json().
+
+Every tests/fixtures/extract_json/<name>.txt is a captured Civant Agent
+response; <name>.json is the brief dict it must parse to, asserted by
+tests/python/test_parse.py (npm run test:python). The benchmark reports
+per-response parse cost for the current single-pass extractor against the
+legacy multi-tier one (frozen below as the baseline).
+
+Usage:
+  python3 scripts/bench-extract-json.py            # benchmark
+  python3 scripts/bench-extract-json.py --update   # rewrite goldens from current output
+  python3 scripts/bench-extract-json.py -n 5000    # iterations per fixture
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(ROOT, "tests", "fixtures", "extract_json")
+sys.path.insert(0, ROOT)
+
+from civant_enrich.parse import parse_brief  # noqa: E402
+
+
+# ---------------------------------------------------------------------------
+# Legacy extractor (batch_enrich.py before 2026-03), kept as the baseline
+# ---------------------------------------------------------------------------
+def legacy_extract_json(raw_text):
+    cleaned = re.sub(r"<[^>]+>", "", raw_text)
+    json_str = None
+
+    fence = re.search(r"```(?:json)?\s*([\s\S]*?)```", cleaned)
+    if fence:
+        json_str = fence.group(1).strip()
+
+    if not json_str:
+        si = cleaned.find('"summary"')
+        if si > -1:
+            bs = cleaned.rfind("{", 0, si)
+            if bs > -1:
+                depth = 0
+                be = -1
+                for i in range(bs, len(cleaned)):
+                    if cleaned[i] == "{": depth += 1
+                    elif cleaned[i] == "}": depth -= 1
+                    if depth == 0: be = i; break
+                if be > bs:
+                    json_str = cleaned[bs:be+1]
+
+    if not json_str:
+        f = cleaned.find("{")
+        l = cleaned.rfind("}")
+        if f > -1 and l > f:
+            json_str = cleaned[f:l+1]
+
+    if not json_str:
+        return {"summary": cleaned[:400].strip(), "sources": []}
+
+    json_str = json_str.replace("\n", " ").replace("\r", " ").replace("\t", " ")
+
+    try:
+        p = json.loads(json_str)
+        if isinstance(p, dict) and p.get("summary"):
+            return p
+    except json.JSONDecodeError:
+        pass
+
+    try:
+        fixed = re.sub(r",\s*}", "}", json_str)
+        fixed = re.sub(r",\s*]", "]", fixed)
+        p2 = json.loads(fixed)
+        if isinstance(p2, dict) and p2.get("summary"):
+            return p2
+    except json.JSONDecodeError:
+        pass
+
+    result = {"sources": []}
+    for fld in ["summary", "timing_insight", "opportunity_reasoning", "intent_confidence", "intent_reasoning"]:
+        m = re.search(r'"' + fld + r'"\s*:\s*"((?:[^"\\]|\\.)*)"', cleaned)
+        if m:
+            result[fld] = m.group(1).replace('\\"', '"').replace("\\n", " ")
+
+    score_m = re.search(r'"opportunity_score"\s*:\s*(\d+)', cleaned)
+    if score_m:
+        result["opportunity_score"] = int(score_m.group(1))
+
+    risk_m = re.search(r'"risk_factors"\s*:\s*(\[[^\]]*\])', cleaned)
+    if risk_m:
+        try: result["risk_factors"] = json.loads(risk_m.group(1).replace("\n", " "))
+        except json.JSONDecodeError: pass
+
+    for field in ["procurement_patterns", "incumbent_landscape", "organizational_context"]:
+        fi = cleaned.find(f'"{field}"')
+        if fi > -1:
+            os_idx = cleaned.find("{", fi)
+            if os_idx > -1 and os_idx < fi + len(field) + 10:
+                depth = 0; oe = -1
+                for i in range(os_idx, len(cleaned)):
+                    if cleaned[i] == "{": depth += 1
+                    elif cleaned[i] == "}": depth -= 1
+                    if depth == 0: oe = i; break
+                if oe > os_idx:
+                    try: result[field] = json.loads(cleaned[os_idx:oe+1].replace("\n", " "))
+                    except json.JSONDecodeError: pass
+
+    si2 = cleaned.rfind('"sources"')
+    if si2 > -1:
+        as_idx = cleaned.find("[", si2)
+        if as_idx > -1:
+            depth = 0; ae = -1
+            for i in range(as_idx, len(cleaned)):
+                if cleaned[i] == "[": depth += 1
+                elif cleaned[i] == "]": depth -= 1
+                if depth == 0: ae = i; break
+            if ae > as_idx:
+                try: result["sources"] = json.loads(cleaned[as_idx:ae+1].replace("\n", " "))
+                except json.JSONDecodeError: pass
+
+    return result
+
+
+def load_fixtures():
+    names = sorted(f[:-4] for f in os.listdir(FIXTURES) if f.endswith(".txt"))
+    fixtures = []
+    for name in names:
+        with open(os.path.join(FIXTURES, name + ".txt"), encoding="utf-8") as f:
+            fixtures.append((name, f.read()))
+    return fixtures
+
+
+def update(fixtures):
+    for name, raw in fixtures:
+        brief, strategy = parse_brief(raw)
+        with open(os.path.join(FIXTURES, name + ".json"), "w", encoding="utf-8") as f:
+            json.dump(brief, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        print(f"  wrote {name}.json ({strategy})")
+
+
+def bench(fixtures, iterations):
+    def per_call_us(fn, raw):
+        fn(raw)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn(raw)
+        return (time.perf_counter() - start) / iterations * 1e6
+
+    print(f"\n{'fixture':<40} {'bytes':>7} {'legacy µs':>10} {'current µs':>11} {'speedup':>8}")
+    total_legacy = total_current = 0.0
+    for name, raw in fixtures:
+        legacy = per_call_us(legacy_extract_json, raw)
+        current = per_call_us(lambda r: parse_brief(r)[0], raw)
+        total_legacy += legacy
+        total_current += current
+        print(f"{name:<40} {len(raw):>7} {legacy:>10.1f} {current:>11.1f} {legacy / current:>7.1f}x")
+    print(f"{'mean per response':<40} {'':>7} {total_legacy / len(fixtures):>10.1f} "
+          f"{total_current / len(fixtures):>11.1f} {total_legacy / total_current:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="extract_json benchmark")
+    parser.add_argument("--update", action="store_true", help="Rewrite golden .json files")
+    parser.add_argument("-n", type=int, default=2000, help="Iterations per fixture (default 2000)")
+    args = parser.parse_args()
+
+    fixtures = load_fixtures()
+    if args.update:
+        print(f"Updating goldens ({len(fixtures)} fixtures):")
+        update(fixtures)
+        return
+    bench(fixtures, args.n)
+
+
+if __name__ == "__main__":
+    main()
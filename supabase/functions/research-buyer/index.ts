@@ -343,7 +343,7 @@ serve(async (req) => {
 
     const { data: stored, error: storeErr } = await supabase
       .from("buyer_research_briefs")
-      .insert({
+      .upsert({
         tenant_id,
         buyer_name,
         country,
@@ -359,8 +359,13 @@ serve(async (req) => {
         tokens_used: inputTokens + outputTokens,
         research_cost_usd: costUsd,
         status: "complete",
+        researched_at: new Date().toISOString(),
         expires_at: new Date(Date.now() + 7 * 24 * 60 * 60 * 1000).toISOString(),
-      })
+        // Batch fingerprints describe batch prompts; this brief must not be renewed by them.
+        input_fingerprint: null,
+        // A freshly researched brief is the tenant's own, no longer a copy of a shared one.
+        shared_brief_id: null,
+      }, { onConflict: "tenant_id,buyer_name,country,category" })
       .select()
       .single();
 
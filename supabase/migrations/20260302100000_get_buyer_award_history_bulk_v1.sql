@@ -0,0 +1,66 @@
+-- =============================================================================
+-- Civant: Bulk award-history lookup for batch enrichment
+-- Migration: 20260302100000_get_buyer_award_history_bulk_v1.sql
+-- =============================================================================
+--
+-- PURPOSE:
+--   batch_enrich.py needs award history for hundreds to thousands of
+--   (buyer_name, country) pairs per run. Calling get_buyer_award_history()
+--   once per buyer costs one PostgREST round-trip each. This function takes
+--   parallel arrays and returns one keyed row per input pair, so a client can
+--   cover a few hundred buyers per call.
+--
+-- DESIGN:
+--   - Inputs are zipped with unnest(..) WITH ORDINALITY; idx is the 1-based
+--     position in the input arrays so the client can split results back
+--     per buyer without relying on name matching.
+--   - Reuses public.get_buyer_award_history() per pair so the payload shape
+--     is identical to the single-buyer RPC (stats / top_suppliers /
+--     renewal_patterns / recent_contracts).
+--   - Capped at 1000 pairs per call to keep statement time bounded.
+--   - service_role only (pipeline use).
+--
+-- ROLLBACK:
+--   DROP FUNCTION IF EXISTS public.get_buyer_award_history_bulk(text[], text[]);
+-- =============================================================================
+
+create or replace function public.get_buyer_award_history_bulk(
+  p_buyer_names text[],
+  p_countries   text[]
+)
+returns table (
+  idx           int,
+  buyer_name    text,
+  country       text,
+  award_history jsonb
+)
+language plpgsql
+stable
+security definer
+set search_path = public
+as $$
+begin
+  if coalesce(array_length(p_buyer_names, 1), 0) <> coalesce(array_length(p_countries, 1), 0) then
+    raise exception 'p_buyer_names and p_countries must have the same length' using errcode = '22023';
+  end if;
+
+  if coalesce(array_length(p_buyer_names, 1), 0) > 1000 then
+    raise exception 'at most 1000 buyers per call' using errcode = '22023';
+  end if;
+
+  return query
+  select
+    b.ord::int,
+    b.buyer_name,
+    b.country,
+    to_jsonb(public.get_buyer_award_history(b.buyer_name, b.country))
+  from unnest(p_buyer_names, p_countries) with ordinality as b(buyer_name, country, ord)
+  order by b.ord;
+end;
+$$;
+
+comment on function public.get_buyer_award_history_bulk(text[], text[]) is
+  'Award history for many (buyer_name, country) pairs in one call; idx is the 1-based input position.';
+
+revoke all on function public.get_buyer_award_history_bulk(text[], text[]) from public, anon, authenticated;
+grant execute on function public.get_buyer_award_history_bulk(text[], text[]) to service_role;
@@ -0,0 +1,51 @@
+-- =============================================================================
+-- Civant: One brief per (tenant, buyer, country, category)
+-- Migration: 20260302110000_buyer_research_briefs_unique_key_v1.sql
+-- =============================================================================
+--
+-- PURPOSE:
+--   Batch ingest (batch_enrich.py --ingest) and the research-buyer edge
+--   function now upsert briefs on (tenant_id, buyer_name, country, category)
+--   instead of inserting a new row per run. Re-running ingest for the same
+--   batch becomes a no-op rewrite rather than a duplicate brief.
+--
+-- DESIGN:
+--   - Collapse existing duplicates first, keeping the most recently
+--     researched row per key (researched_at, then created_at, then id).
+--   - Unique index backs PostgREST on_conflict=tenant_id,buyer_name,country,category.
+--   - Guarded with to_regclass so fresh environments without the table pass.
+--
+-- ROLLBACK:
+--   DROP INDEX IF EXISTS public.buyer_research_briefs_tenant_buyer_country_category_uidx;
+--   (deleted duplicate rows are not restored)
+-- =============================================================================
+
+do $$
+declare
+  v_deleted int;
+begin
+  if to_regclass('public.buyer_research_briefs') is null then
+    raise notice 'buyer_research_briefs not found; skipping unique key migration';
+    return;
+  end if;
+
+  with ranked as (
+    select
+      id,
+      row_number() over (
+        partition by tenant_id, buyer_name, country, category
+        order by researched_at desc nulls last, created_at desc nulls last, id desc
+      ) as rn
+    from public.buyer_research_briefs
+  )
+  delete from public.buyer_research_briefs b
+  using ranked r
+  where b.id = r.id
+    and r.rn > 1;
+
+  get diagnostics v_deleted = row_count;
+  raise notice 'buyer_research_briefs duplicate rows removed: %', v_deleted;
+
+  create unique index if not exists buyer_research_briefs_tenant_buyer_country_category_uidx
+    on public.buyer_research_briefs (tenant_id, buyer_name, country, category);
+end $$;
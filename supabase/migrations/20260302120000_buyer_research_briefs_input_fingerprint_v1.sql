@@ -0,0 +1,91 @@
+-- =============================================================================
+-- Civant: Input fingerprints and in-place renewal for research briefs
+-- Migration: 20260302120000_buyer_research_briefs_input_fingerprint_v1.sql
+-- =============================================================================
+--
+-- PURPOSE:
+--   Batch enrichment re-researches every buyer whose brief is past
+--   expires_at, even when nothing the model would see has changed. Most of
+--   the municipal long tail has static award history week to week.
+--   civant_enrich now stores a fingerprint of each request's model input
+--   (model, prompts and the award history rendered into them) with the
+--   brief, and renews expired briefs whose fingerprint still matches
+--   instead of resubmitting them.
+--
+-- DESIGN:
+--   - input_fingerprint is nullable; briefs written by the research-buyer
+--     edge function (different prompts) store null and are never renewed.
+--   - renew_buyer_research_briefs() takes parallel arrays and pushes
+--     expires_at out by p_ttl_days only where the stored fingerprint equals
+--     the supplied one, returning the renewed pairs. The match is checked
+--     server-side, so a stale client cannot renew a changed brief.
+--   - Capped at 1000 pairs per call; service_role only (pipeline use).
+--
+-- ROLLBACK:
+--   DROP FUNCTION IF EXISTS public.renew_buyer_research_briefs(text, text, text[], text[], text[], int);
+--   ALTER TABLE public.buyer_research_briefs DROP COLUMN IF EXISTS input_fingerprint;
+-- =============================================================================
+
+do $$
+begin
+  if to_regclass('public.buyer_research_briefs') is null then
+    raise notice 'buyer_research_briefs not found; skipping input_fingerprint column';
+    return;
+  end if;
+
+  alter table public.buyer_research_briefs
+    add column if not exists input_fingerprint text;
+end $$;
+
+create or replace function public.renew_buyer_research_briefs(
+  p_tenant_id    text,
+  p_category     text,
+  p_buyer_names  text[],
+  p_countries    text[],
+  p_fingerprints text[],
+  p_ttl_days     int
+)
+returns table (
+  buyer_name text,
+  country    text,
+  expires_at timestamptz
+)
+language plpgsql
+volatile
+security definer
+set search_path = public
+as $$
+#variable_conflict use_column
+begin
+  if coalesce(array_length(p_buyer_names, 1), 0) <> coalesce(array_length(p_countries, 1), 0)
+     or coalesce(array_length(p_buyer_names, 1), 0) <> coalesce(array_length(p_fingerprints, 1), 0) then
+    raise exception 'p_buyer_names, p_countries and p_fingerprints must have the same length' using errcode = '22023';
+  end if;
+
+  if coalesce(array_length(p_buyer_names, 1), 0) > 1000 then
+    raise exception 'at most 1000 buyers per call' using errcode = '22023';
+  end if;
+
+  if p_ttl_days is null or p_ttl_days < 1 then
+    raise exception 'p_ttl_days must be positive' using errcode = '22023';
+  end if;
+
+  return query
+  update public.buyer_research_briefs b
+     set expires_at = now() + make_interval(days => p_ttl_days)
+    from unnest(p_buyer_names, p_countries, p_fingerprints) as u(buyer_name, country, fingerprint)
+   where b.tenant_id = p_tenant_id
+     and b.category = p_category
+     and b.status = 'complete'
+     and b.buyer_name = u.buyer_name
+     and b.country = u.country
+     and b.input_fingerprint = u.fingerprint
+  returning b.buyer_name, b.country, b.expires_at;
+end;
+$$;
+
+comment on function public.renew_buyer_research_briefs(text, text, text[], text[], text[], int) is
+  'Extend expires_at for briefs whose stored input_fingerprint matches; returns the renewed pairs.';
+
+revoke all on function public.renew_buyer_research_briefs(text, text, text[], text[], text[], int) from public, anon, authenticated;
+grant execute on function public.renew_buyer_research_briefs(text, text, text[], text[], text[], int) to service_role;
@@ -0,0 +1,101 @@
+-- =============================================================================
+-- Civant: Set-based brief cache check for batch enrichment
+-- Migration: 20260302130000_get_uncached_buyers_v1.sql
+-- =============================================================================
+--
+-- PURPOSE:
+--   civant_enrich's cache check sent one PostgREST query per 50 buyer names,
+--   filtered on buyer_name only and matched country client-side. Long
+--   Spanish authority names made the IN-list URLs very large, and a
+--   10,000-buyer run took 200 round-trips. This function takes the candidate
+--   (buyer_name, country) pairs as arrays in a POST body and anti-joins them
+--   against valid briefs server-side, returning only pairs that need work.
+--
+-- DESIGN:
+--   - Inputs zipped with unnest(..) WITH ORDINALITY; idx is the 1-based input
+--     position, rows come back in input order.
+--   - NOT EXISTS against complete, unexpired briefs for the tenant/category.
+--   - Each returned pair also carries the input_fingerprint of its expired
+--     brief (null when there is none), so the client can renew unchanged
+--     briefs without a second lookup. The unique brief key guarantees at
+--     most one match.
+--   - Supporting index on (tenant_id, category, status, buyer_name, country,
+--     expires_at) makes both probes index-only range scans.
+--   - Capped at 5000 pairs per call; service_role only (pipeline use).
+--
+-- ROLLBACK:
+--   DROP FUNCTION IF EXISTS public.get_uncached_buyers(text, text, text[], text[]);
+--   DROP INDEX IF EXISTS public.buyer_research_briefs_cache_lookup_idx;
+-- =============================================================================
+
+do $$
+begin
+  if to_regclass('public.buyer_research_briefs') is null then
+    raise notice 'buyer_research_briefs not found; skipping cache lookup index';
+    return;
+  end if;
+
+  create index if not exists buyer_research_briefs_cache_lookup_idx
+    on public.buyer_research_briefs (tenant_id, category, status, buyer_name, country, expires_at);
+end $$;
+
+create or replace function public.get_uncached_buyers(
+  p_tenant_id   text,
+  p_category    text,
+  p_buyer_names text[],
+  p_countries   text[]
+)
+returns table (
+  idx                 int,
+  buyer_name          text,
+  country             text,
+  expired_fingerprint text
+)
+language plpgsql
+stable
+security definer
+set search_path = public
+as $$
+#variable_conflict use_column
+begin
+  if coalesce(array_length(p_buyer_names, 1), 0) <> coalesce(array_length(p_countries, 1), 0) then
+    raise exception 'p_buyer_names and p_countries must have the same length' using errcode = '22023';
+  end if;
+
+  if coalesce(array_length(p_buyer_names, 1), 0) > 5000 then
+    raise exception 'at most 5000 buyers per call' using errcode = '22023';
+  end if;
+
+  return query
+  select
+    u.ord::int,
+    u.buyer_name,
+    u.country,
+    e.input_fingerprint
+  from unnest(p_buyer_names, p_countries) with ordinality as u(buyer_name, country, ord)
+  left join public.buyer_research_briefs e
+    on e.tenant_id = p_tenant_id
+   and e.category = p_category
+   and e.status = 'complete'
+   and e.buyer_name = u.buyer_name
+   and e.country = u.country
+   and e.expires_at <= now()
+  where not exists (
+    select 1
+    from public.buyer_research_briefs b
+    where b.tenant_id = p_tenant_id
+      and b.category = p_category
+      and b.status = 'complete'
+      and b.buyer_name = u.buyer_name
+      and b.country = u.country
+      and b.expires_at > now()
+  )
+  order by u.ord;
+end;
+$$;
+
+comment on function public.get_uncached_buyers(text, text, text[], text[]) is
+  'Input (buyer_name, country) pairs without a valid brief, in input order, with the expired brief fingerprint if any.';
+
+revoke all on function public.get_uncached_buyers(text, text, text[], text[]) from public, anon, authenticated;
+grant execute on function public.get_uncached_buyers(text, text, text[], text[]) to service_role;
@@ -0,0 +1,99 @@
+-- =============================================================================
+-- Civant: Per-buyer scheduling signals for batch enrichment
+-- Migration: 20260302140000_get_enrichment_buyer_priorities_v1.sql
+-- =============================================================================
+--
+-- PURPOSE:
+--   civant_enrich took buyers in whatever order get_batch_enrichment_buyers
+--   returned them and --limit kept the first N, so a capped nightly run spent
+--   its budget on arbitrary buyers. The client now ranks buyers by prediction
+--   urgency, tender window proximity, opportunity value and brief staleness.
+--   This function returns those signals for every distinct (buyer_name,
+--   country) with open predictions, in one call.
+--
+-- DESIGN:
+--   - One row per (buyer_name, country) over pending/confirmed predictions
+--     with an urgency in p_urgencies:
+--       urgency          most urgent of the buyer's predictions
+--       next_tender_date earliest predicted_tender_date
+--       probability      highest prediction probability
+--       total_value_eur  sum of total_value_eur over the predictions
+--       predictions      number of predictions
+--   - brief_expires_at is the expiry of the buyer's complete brief for
+--     p_category (null when it has never been researched). The unique brief
+--     key guarantees at most one match.
+--   - Ranking weights live in the client (civant_enrich.schedule); rows come
+--     back in (buyer_name, country) order.
+--   - service_role only (pipeline use).
+--
+-- ROLLBACK:
+--   DROP FUNCTION IF EXISTS public.get_enrichment_buyer_priorities(text, text, text[]);
+-- =============================================================================
+
+create or replace function public.get_enrichment_buyer_priorities(
+  p_tenant_id text,
+  p_category  text,
+  p_urgencies text[]
+)
+returns table (
+  buyer_name       text,
+  country          text,
+  urgency          text,
+  next_tender_date date,
+  probability      numeric,
+  total_value_eur  numeric,
+  predictions      int,
+  brief_expires_at timestamptz
+)
+language sql
+stable
+security definer
+set search_path = public
+as $$
+  with signals as (
+    select
+      p.buyer_name,
+      p.country,
+      min(case lower(coalesce(p.urgency, ''))
+            when 'overdue'  then 0
+            when 'imminent' then 1
+            when 'upcoming' then 2
+            when 'horizon'  then 3
+            when 'distant'  then 4
+            else 5
+          end) as urgency_rank,
+      min(p.predicted_tender_date) as next_tender_date,
+      max(p.probability) as probability,
+      sum(p.total_value_eur) as total_value_eur,
+      count(*)::int as predictions
+    from public.predictions p
+    where p.tenant_id = p_tenant_id
+      and p.urgency = any(p_urgencies)
+      and p.validation_status in ('pending', 'confirmed')
+      and p.buyer_name is not null
+    group by p.buyer_name, p.country
+  )
+  select
+    s.buyer_name,
+    s.country,
+    (array['overdue', 'imminent', 'upcoming', 'horizon', 'distant'])[s.urgency_rank + 1],
+    s.next_tender_date,
+    s.probability,
+    s.total_value_eur,
+    s.predictions,
+    b.expires_at
+  from signals s
+  left join public.buyer_research_briefs b
+    on b.tenant_id = p_tenant_id
+   and b.category = p_category
+   and b.status = 'complete'
+   and b.buyer_name = s.buyer_name
+   and b.country = s.country
+  order by s.buyer_name, s.country;
+$$;
+
+comment on function public.get_enrichment_buyer_priorities(text, text, text[]) is
+  'Distinct enrichment buyers with urgency, window, value and brief-expiry signals for scheduling.';
+
+revoke all on function public.get_enrichment_buyer_priorities(text, text, text[]) from public, anon, authenticated;
+grant execute on function public.get_enrichment_buyer_priorities(text, text, text[]) to service_role;
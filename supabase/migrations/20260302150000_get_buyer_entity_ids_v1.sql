@@ -0,0 +1,83 @@
+-- =============================================================================
+-- Civant: Canonical buyer entity lookup for batch enrichment dedupe
+-- Migration: 20260302150000_get_buyer_entity_ids_v1.sql
+-- =============================================================================
+--
+-- PURPOSE:
+--   The same authority often appears under several names in predictions
+--   ("Alcaldía del Ayuntamiento de X", "Pleno del Ayuntamiento de X",
+--   "X County Council" / "Comhairle Contae X"), and civant_enrich researched
+--   each one separately. The client groups aliases by a normalized name key;
+--   this function adds the canonical buyer entity each name already resolves
+--   to, so aliases that share no spelling still group.
+--
+-- DESIGN:
+--   - Inputs zipped with unnest(..) WITH ORDINALITY; idx is the 1-based input
+--     position, one row per input in input order.
+--   - entity_id tiers:
+--       1. predictions.buyer_id for that (buyer_name, country), skipping
+--          'unresolved:%' placeholders;
+--       2. buyer_aliases.canonical_buyer_entity_id on
+--          normalize_match_key(buyer_name), most recently updated first.
+--     null when neither resolves.
+--   - plpgsql so the body is only resolved at call time: environments
+--     without predictions or buyer_aliases get a clear error and the client
+--     falls back to name keys alone.
+--   - Capped at 5000 pairs per call; service_role only (pipeline use).
+--
+-- ROLLBACK:
+--   DROP FUNCTION IF EXISTS public.get_buyer_entity_ids(text, text[], text[]);
+-- =============================================================================
+
+create or replace function public.get_buyer_entity_ids(
+  p_tenant_id   text,
+  p_buyer_names text[],
+  p_countries   text[]
+)
+returns table (
+  idx       int,
+  entity_id text
+)
+language plpgsql
+stable
+security definer
+set search_path = public
+as $$
+begin
+  if coalesce(array_length(p_buyer_names, 1), 0) <> coalesce(array_length(p_countries, 1), 0) then
+    raise exception 'p_buyer_names and p_countries must have the same length' using errcode = '22023';
+  end if;
+
+  if coalesce(array_length(p_buyer_names, 1), 0) > 5000 then
+    raise exception 'at most 5000 buyers per call' using errcode = '22023';
+  end if;
+
+  return query
+  select
+    u.ord::int,
+    coalesce(
+      (select p.buyer_id
+         from public.predictions p
+        where p.tenant_id = p_tenant_id
+          and p.buyer_name = u.buyer_name
+          and p.country = u.country
+          and nullif(p.buyer_id, '') is not null
+          and p.buyer_id not like 'unresolved:%'
+        limit 1),
+      (select ba.canonical_buyer_entity_id
+         from public.buyer_aliases ba
+        where ba.tenant_id = p_tenant_id
+          and ba.raw_buyer_key = public.normalize_match_key(u.buyer_name)
+        order by ba.updated_at desc
+        limit 1)
+    )
+  from unnest(p_buyer_names, p_countries) with ordinality as u(buyer_name, country, ord)
+  order by u.ord;
+end;
+$$;
+
+comment on function public.get_buyer_entity_ids(text, text[], text[]) is
+  'Canonical buyer entity id per input (buyer_name, country), from predictions.buyer_id or buyer_aliases; null if unresolved.';
+
+revoke all on function public.get_buyer_entity_ids(text, text[], text[]) from public, anon, authenticated;
+grant execute on function public.get_buyer_entity_ids(text, text[], text[]) to service_role;
@@ -0,0 +1,121 @@
+-- =============================================================================
+-- Civant: Keyset-paginated enrichment buyer list
+-- Migration: 20260302160000_get_enrichment_buyer_priorities_page_v1.sql
+-- =============================================================================
+--
+-- PURPOSE:
+--   get_enrichment_buyer_priorities returns every buyer in one response, so
+--   PostgREST's max-rows cap silently truncates it on large tenants, and the
+--   client's direct-table fallback pulled one row per prediction only to
+--   dedupe them in Python. This variant returns the same per-buyer signals
+--   one page at a time, DISTINCT (GROUP BY) applied server-side, so the
+--   client can stream buyers into the award-history prefetch as they arrive.
+--
+-- DESIGN:
+--   - Keyset pagination on (buyer_name, country): pass the last pair of the
+--     previous page as p_after_buyer_name / p_after_country (null for the
+--     first page). No OFFSET, so every page is an index range scan.
+--   - Same columns and aggregation as get_enrichment_buyer_priorities v1.
+--     Rows with a null buyer_name or country are skipped; they cannot be
+--     paged on or enriched.
+--   - Supporting index on predictions (tenant_id, buyer_name, country).
+--   - p_limit capped at 5000; service_role only (pipeline use).
+--
+-- ROLLBACK:
+--   DROP FUNCTION IF EXISTS public.get_enrichment_buyer_priorities_page(text, text, text[], text, text, int);
+--   DROP INDEX IF EXISTS public.predictions_tenant_buyer_country_idx;
+-- =============================================================================
+
+do $$
+begin
+  if to_regclass('public.predictions') is null then
+    raise notice 'predictions not found; skipping buyer keyset index';
+    return;
+  end if;
+
+  create index if not exists predictions_tenant_buyer_country_idx
+    on public.predictions (tenant_id, buyer_name, country);
+end $$;
+
+create or replace function public.get_enrichment_buyer_priorities_page(
+  p_tenant_id         text,
+  p_category          text,
+  p_urgencies         text[],
+  p_after_buyer_name  text default null,
+  p_after_country     text default null,
+  p_limit             int default 1000
+)
+returns table (
+  buyer_name       text,
+  country          text,
+  urgency          text,
+  next_tender_date date,
+  probability      numeric,
+  total_value_eur  numeric,
+  predictions      int,
+  brief_expires_at timestamptz
+)
+language plpgsql
+stable
+security definer
+set search_path = public
+as $$
+#variable_conflict use_column
+begin
+  if coalesce(p_limit, 0) < 1 or p_limit > 5000 then
+    raise exception 'p_limit must be between 1 and 5000' using errcode = '22023';
+  end if;
+
+  return query
+  with signals as (
+    select
+      p.buyer_name,
+      p.country,
+      min(case lower(coalesce(p.urgency, ''))
+            when 'overdue'  then 0
+            when 'imminent' then 1
+            when 'upcoming' then 2
+            when 'horizon'  then 3
+            when 'distant'  then 4
+            else 5
+          end) as urgency_rank,
+      min(p.predicted_tender_date) as next_tender_date,
+      max(p.probability) as probability,
+      sum(p.total_value_eur) as total_value_eur,
+      count(*)::int as predictions
+    from public.predictions p
+    where p.tenant_id = p_tenant_id
+      and p.urgency = any(p_urgencies)
+      and p.validation_status in ('pending', 'confirmed')
+      and p.buyer_name is not null
+      and p.country is not null
+      and (p_after_buyer_name is null or (p.buyer_name, p.country) > (p_after_buyer_name, p_after_country))
+    group by p.buyer_name, p.country
+    order by p.buyer_name, p.country
+    limit p_limit
+  )
+  select
+    s.buyer_name,
+    s.country,
+    (array['overdue', 'imminent', 'upcoming', 'horizon', 'distant'])[s.urgency_rank + 1],
+    s.next_tender_date,
+    s.probability,
+    s.total_value_eur,
+    s.predictions,
+    b.expires_at
+  from signals s
+  left join public.buyer_research_briefs b
+    on b.tenant_id = p_tenant_id
+   and b.category = p_category
+   and b.status = 'complete'
+   and b.buyer_name = s.buyer_name
+   and b.country = s.country
+  order by s.buyer_name, s.country;
+end;
+$$;
+
+comment on function public.get_enrichment_buyer_priorities_page(text, text, text[], text, text, int) is
+  'One keyset page of distinct enrichment buyers with scheduling signals, ordered by (buyer_name, country).';
+
+revoke all on function public.get_enrichment_buyer_priorities_page(text, text, text[], text, text, int) from public, anon, authenticated;
+grant execute on function public.get_enrichment_buyer_priorities_page(text, text, text[], text, text, int) to service_role;
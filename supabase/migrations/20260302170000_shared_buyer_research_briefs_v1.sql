@@ -0,0 +1,250 @@
+-- =============================================================================
+-- Civant: Cross-tenant shared research layer for buyer briefs
+-- Migration: 20260302170000_shared_buyer_research_briefs_v1.sql
+-- =============================================================================
+--
+-- PURPOSE:
+--   Briefs describe public buyers: the prompt, the award history and the web
+--   research are the same whichever tenant asked. Keyed per tenant, the same
+--   buyer was researched (and paid for) once per tenant. civant_enrich
+--   --tenants now researches each (buyer_name, country, category) once into
+--   shared_buyer_research_briefs and attaches it to every tenant that needs
+--   it, so LLM requests grow with unique buyers rather than tenants x buyers.
+--
+-- DESIGN:
+--   - shared_buyer_research_briefs carries the research columns of
+--     buyer_research_briefs keyed on (buyer_name, country, category), with no
+--     tenant. RLS enabled with no policies: service_role only.
+--   - buyer_research_briefs keeps one row per tenant so every reader (app,
+--     research-buyer edge function) is unchanged. shared_brief_id points at
+--     the shared row a tenant brief was attached from; null for briefs
+--     researched for one tenant.
+--   - attach_shared_buyer_research_briefs() takes parallel arrays, one element
+--     per (tenant, buyer), and upserts each tenant row from the complete,
+--     unexpired shared brief. Only research columns and shared_brief_id are
+--     written; other columns of an existing tenant row are left alone. Tenant
+--     copies carry tokens_used / research_cost_usd 0: the spend is recorded
+--     once, on the shared row. Pairs without a valid shared brief are skipped.
+--   - get_uncached_shared_buyers() and renew_shared_buyer_research_briefs()
+--     mirror get_uncached_buyers() and renew_buyer_research_briefs() against
+--     the shared table.
+--   - Capped at 5000 pairs per call (renewal: 1000); service_role only.
+--
+-- ROLLBACK:
+--   DROP FUNCTION IF EXISTS public.attach_shared_buyer_research_briefs(text, text[], text[], text[]);
+--   DROP FUNCTION IF EXISTS public.renew_shared_buyer_research_briefs(text, text[], text[], text[], int);
+--   DROP FUNCTION IF EXISTS public.get_uncached_shared_buyers(text, text[], text[]);
+--   ALTER TABLE public.buyer_research_briefs DROP COLUMN IF EXISTS shared_brief_id;
+--   DROP TABLE IF EXISTS public.shared_buyer_research_briefs;
+-- =============================================================================
+
+create table if not exists public.shared_buyer_research_briefs (
+  id                     uuid primary key default gen_random_uuid(),
+  buyer_name             text not null,
+  country                text not null,
+  category               text not null,
+  summary                text,
+  procurement_intent     jsonb,
+  organizational_context jsonb,
+  incumbent_landscape    jsonb,
+  risk_factors           jsonb,
+  opportunity_score      int,
+  sources                jsonb,
+  model_used             text,
+  tokens_used            int,
+  research_cost_usd      numeric,
+  status                 text not null default 'complete',
+  researched_at          timestamptz,
+  expires_at             timestamptz,
+  input_fingerprint      text,
+  created_at             timestamptz not null default now()
+);
+
+create unique index if not exists shared_buyer_research_briefs_buyer_country_category_uidx
+  on public.shared_buyer_research_briefs (buyer_name, country, category);
+
+alter table public.shared_buyer_research_briefs enable row level security;
+
+do $$
+begin
+  if to_regclass('public.buyer_research_briefs') is null then
+    raise notice 'buyer_research_briefs not found; skipping shared_brief_id column';
+    return;
+  end if;
+
+  alter table public.buyer_research_briefs
+    add column if not exists shared_brief_id uuid
+      references public.shared_buyer_research_briefs (id) on delete set null;
+end $$;
+
+create or replace function public.get_uncached_shared_buyers(
+  p_category    text,
+  p_buyer_names text[],
+  p_countries   text[]
+)
+returns table (
+  idx                 int,
+  buyer_name          text,
+  country             text,
+  expired_fingerprint text
+)
+language plpgsql
+stable
+security definer
+set search_path = public
+as $$
+#variable_conflict use_column
+begin
+  if coalesce(array_length(p_buyer_names, 1), 0) <> coalesce(array_length(p_countries, 1), 0) then
+    raise exception 'p_buyer_names and p_countries must have the same length' using errcode = '22023';
+  end if;
+
+  if coalesce(array_length(p_buyer_names, 1), 0) > 5000 then
+    raise exception 'at most 5000 buyers per call' using errcode = '22023';
+  end if;
+
+  return query
+  select
+    u.ord::int,
+    u.buyer_name,
+    u.country,
+    s.input_fingerprint
+  from unnest(p_buyer_names, p_countries) with ordinality as u(buyer_name, country, ord)
+  left join public.shared_buyer_research_briefs s
+    on s.category = p_category
+   and s.buyer_name = u.buyer_name
+   and s.country = u.country
+   and s.status = 'complete'
+  where s.id is null
+     or s.expires_at <= now()
+  order by u.ord;
+end;
+$$;
+
+comment on function public.get_uncached_shared_buyers(text, text[], text[]) is
+  'Input (buyer_name, country) pairs without a valid shared brief, in input order, with the expired brief fingerprint if any.';
+
+create or replace function public.renew_shared_buyer_research_briefs(
+  p_category     text,
+  p_buyer_names  text[],
+  p_countries    text[],
+  p_fingerprints text[],
+  p_ttl_days     int
+)
+returns table (
+  buyer_name text,
+  country    text,
+  expires_at timestamptz
+)
+language plpgsql
+volatile
+security definer
+set search_path = public
+as $$
+#variable_conflict use_column
+begin
+  if coalesce(array_length(p_buyer_names, 1), 0) <> coalesce(array_length(p_countries, 1), 0)
+     or coalesce(array_length(p_buyer_names, 1), 0) <> coalesce(array_length(p_fingerprints, 1), 0) then
+    raise exception 'p_buyer_names, p_countries and p_fingerprints must have the same length' using errcode = '22023';
+  end if;
+
+  if coalesce(array_length(p_buyer_names, 1), 0) > 1000 then
+    raise exception 'at most 1000 briefs per call' using errcode = '22023';
+  end if;
+
+  if coalesce(p_ttl_days, 0) < 1 then
+    raise exception 'p_ttl_days must be positive' using errcode = '22023';
+  end if;
+
+  return query
+  update public.shared_buyer_research_briefs s
+     set expires_at = now() + make_interval(days => p_ttl_days)
+    from unnest(p_buyer_names, p_countries, p_fingerprints) as u(buyer_name, country, fingerprint)
+   where s.category = p_category
+     and s.status = 'complete'
+     and s.buyer_name = u.buyer_name
+     and s.country = u.country
+     and s.input_fingerprint = u.fingerprint
+  returning s.buyer_name, s.country, s.expires_at;
+end;
+$$;
+
+comment on function public.renew_shared_buyer_research_briefs(text, text[], text[], text[], int) is
+  'Extend expires_at of shared briefs whose stored input fingerprint matches; returns the renewed pairs.';
+
+create or replace function public.attach_shared_buyer_research_briefs(
+  p_category    text,
+  p_tenant_ids  text[],
+  p_buyer_names text[],
+  p_countries   text[]
+)
+returns table (
+  tenant_id  text,
+  buyer_name text,
+  country    text
+)
+language plpgsql
+volatile
+security definer
+set search_path = public
+as $$
+#variable_conflict use_column
+begin
+  if coalesce(array_length(p_tenant_ids, 1), 0) <> coalesce(array_length(p_buyer_names, 1), 0)
+     or coalesce(array_length(p_tenant_ids, 1), 0) <> coalesce(array_length(p_countries, 1), 0) then
+    raise exception 'p_tenant_ids, p_buyer_names and p_countries must have the same length' using errcode = '22023';
+  end if;
+
+  if coalesce(array_length(p_tenant_ids, 1), 0) > 5000 then
+    raise exception 'at most 5000 attachments per call' using errcode = '22023';
+  end if;
+
+  return query
+  insert into public.buyer_research_briefs as b (
+    tenant_id, buyer_name, country, category, summary, procurement_intent, organizational_context,
+    incumbent_landscape, risk_factors, opportunity_score, sources, model_used, tokens_used,
+    research_cost_usd, status, researched_at, expires_at, input_fingerprint, shared_brief_id
+  )
+  select distinct on (u.tenant_id, s.buyer_name, s.country)
+    u.tenant_id, s.buyer_name, s.country, s.category, s.summary, s.procurement_intent,
+    s.organizational_context, s.incumbent_landscape, s.risk_factors, s.opportunity_score, s.sources,
+    s.model_used, 0, 0, s.status, s.researched_at, s.expires_at, s.input_fingerprint, s.id
+  from unnest(p_tenant_ids, p_buyer_names, p_countries) as u(tenant_id, buyer_name, country)
+  join public.shared_buyer_research_briefs s
+    on s.category = p_category
+   and s.buyer_name = u.buyer_name
+   and s.country = u.country
+   and s.status = 'complete'
+   and s.expires_at > now()
+  on conflict (tenant_id, buyer_name, country, category) do update set
+    summary                = excluded.summary,
+    procurement_intent     = excluded.procurement_intent,
+    organizational_context = excluded.organizational_context,
+    incumbent_landscape    = excluded.incumbent_landscape,
+    risk_factors           = excluded.risk_factors,
+    opportunity_score      = excluded.opportunity_score,
+    sources                = excluded.sources,
+    model_used             = excluded.model_used,
+    tokens_used            = excluded.tokens_used,
+    research_cost_usd      = excluded.research_cost_usd,
+    status                 = excluded.status,
+    researched_at          = excluded.researched_at,
+    expires_at             = excluded.expires_at,
+    input_fingerprint      = excluded.input_fingerprint,
+    shared_brief_id        = excluded.shared_brief_id
+  returning b.tenant_id, b.buyer_name, b.country;
+end;
+$$;
+
+comment on function public.attach_shared_buyer_research_briefs(text, text[], text[], text[]) is
+  'Copy valid shared briefs into buyer_research_briefs for each (tenant, buyer) pair; returns the attached pairs.';
+
+revoke all on table public.shared_buyer_research_briefs from public, anon, authenticated;
+grant all on table public.shared_buyer_research_briefs to service_role;
+
+revoke all on function public.get_uncached_shared_buyers(text, text[], text[]) from public, anon, authenticated;
+grant execute on function public.get_uncached_shared_buyers(text, text[], text[]) to service_role;
+revoke all on function public.renew_shared_buyer_research_briefs(text, text[], text[], text[], int) from public, anon, authenticated;
+grant execute on function public.renew_shared_buyer_research_briefs(text, text[], text[], text[], int) to service_role;
+revoke all on function public.attach_shared_buyer_research_briefs(text, text[], text[], text[]) from public, anon, authenticated;
+grant execute on function public.attach_shared_buyer_research_briefs(text, text[], text[], text[]) to service_role;
@@ -0,0 +1,57 @@
+-- =============================================================================
+-- Civant: Tenants with buyers to enrich
+-- Migration: 20260302180000_get_enrichment_tenants_v1.sql
+-- =============================================================================
+--
+-- PURPOSE:
+--   The enrichment pipeline's --all-tenants mode needs the tenants whose
+--   predictions name buyers in the requested urgencies, without the
+--   operator listing them by hand. Returns each such tenant with its
+--   distinct (buyer_name, country) count, largest first, so the client can
+--   report the spread and schedule tenants fairly.
+--
+-- DESIGN:
+--   - Same predicate as get_enrichment_buyer_priorities_page v1 (urgency,
+--     validation status, non-null buyer_name and country), so a listed
+--     tenant always has at least one page of buyers.
+--   - Grouped on tenant_id over predictions_tenant_buyer_country_idx.
+--   - service_role only (pipeline use).
+--
+-- ROLLBACK:
+--   DROP FUNCTION IF EXISTS public.get_enrichment_tenants(text[]);
+-- =============================================================================
+
+create or replace function public.get_enrichment_tenants(
+  p_urgencies text[]
+)
+returns table (
+  tenant_id text,
+  buyers    int
+)
+language plpgsql
+stable
+security definer
+set search_path = public
+as $$
+#variable_conflict use_column
+begin
+  return query
+  select
+    p.tenant_id,
+    count(distinct (p.buyer_name, p.country))::int as buyers
+  from public.predictions p
+  where p.urgency = any(p_urgencies)
+    and p.validation_status in ('pending', 'confirmed')
+    and p.tenant_id is not null
+    and p.buyer_name is not null
+    and p.country is not null
+  group by p.tenant_id
+  order by buyers desc, p.tenant_id;
+end;
+$$;
+
+comment on function public.get_enrichment_tenants(text[]) is
+  'Tenants with enrichment buyers in the given urgencies and their distinct buyer counts, largest first.';
+
+revoke all on function public.get_enrichment_tenants(text[]) from public, anon, authenticated;
+grant execute on function public.get_enrichment_tenants(text[]) to service_role;
@@ -0,0 +1,23 @@
+import test from 'node:test';
+import assert from 'node:assert/strict';
+import { readFileSync } from 'node:fs';
+
+const source = readFileSync(
+  new URL('../supabase/migrations/20260302100000_get_buyer_award_history_bulk_v1.sql', import.meta.url),
+  'utf8',
+);
+
+test('get_buyer_award_history_bulk zips input arrays and keys rows by input position', () => {
+  assert.match(source, /create or replace function public\.get_buyer_award_history_bulk\(\s*p_buyer_names text\[\],\s*p_countries\s+text\[\]\s*\)/);
+  assert.match(source, /from unnest\(p_buyer_names, p_countries\) with ordinality as b\(buyer_name, country, ord\)/);
+  assert.match(source, /order by b\.ord;/);
+  assert.match(source, /to_jsonb\(public\.get_buyer_award_history\(b\.buyer_name, b\.country\)\)/);
+});
+
+test('get_buyer_award_history_bulk validates input size and is service_role only', () => {
+  assert.match(source, /p_buyer_names and p_countries must have the same length/);
+  assert.match(source, /> 1000 then/);
+  assert.match(source, /set search_path = public/);
+  assert.match(source, /revoke all on function public\.get_buyer_award_history_bulk\(text\[\], text\[\]\) from public, anon, authenticated;/);
+  assert.match(source, /grant execute on function public\.get_buyer_award_history_bulk\(text\[\], text\[\]\) to service_role;/);
+});
@@ -0,0 +1,24 @@
+import test from 'node:test';
+import assert from 'node:assert/strict';
+import { readFileSync } from 'node:fs';
+
+const source = readFileSync(
+  new URL('../supabase/migrations/20260302150000_get_buyer_entity_ids_v1.sql', import.meta.url),
+  'utf8',
+);
+
+test('get_buyer_entity_ids resolves predictions.buyer_id before buyer_aliases', () => {
+  assert.match(source, /from unnest\(p_buyer_names, p_countries\) with ordinality as u\(buyer_name, country, ord\)/);
+  assert.match(source, /and p\.buyer_id not like 'unresolved:%'/);
+  assert.match(source, /and ba\.raw_buyer_key = public\.normalize_match_key\(u\.buyer_name\)/);
+  assert.ok(source.indexOf('from public.predictions p') < source.indexOf('from public.buyer_aliases ba'));
+  assert.match(source, /order by u\.ord;/);
+});
+
+test('get_buyer_entity_ids validates input size and is service_role only', () => {
+  assert.match(source, /p_buyer_names and p_countries must have the same length/);
+  assert.match(source, /> 5000 then/);
+  assert.match(source, /set search_path = public/);
+  assert.match(source, /revoke all on function public\.get_buyer_entity_ids\(text, text\[\], text\[\]\) from public, anon, authenticated;/);
+  assert.match(source, /grant execute on function public\.get_buyer_entity_ids\(text, text\[\], text\[\]\) to service_role;/);
+});
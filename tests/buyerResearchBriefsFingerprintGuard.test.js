@@ -0,0 +1,35 @@
+import test from 'node:test';
+import assert from 'node:assert/strict';
+import { readFileSync } from 'node:fs';
+
+const migration = readFileSync(
+  new URL('../supabase/migrations/20260302120000_buyer_research_briefs_input_fingerprint_v1.sql', import.meta.url),
+  'utf8',
+);
+const researchBuyer = readFileSync(
+  new URL('../supabase/functions/research-buyer/index.ts', import.meta.url),
+  'utf8',
+);
+
+test('migration adds a nullable input_fingerprint column', () => {
+  assert.match(migration, /add column if not exists input_fingerprint text;/);
+});
+
+test('renew_buyer_research_briefs only extends briefs whose fingerprint matches', () => {
+  assert.match(migration, /from unnest\(p_buyer_names, p_countries, p_fingerprints\) as u\(buyer_name, country, fingerprint\)/);
+  assert.match(migration, /and b\.input_fingerprint = u\.fingerprint/);
+  assert.match(migration, /and b\.status = 'complete'/);
+  assert.match(migration, /set expires_at = now\(\) \+ make_interval\(days => p_ttl_days\)/);
+  assert.match(migration, /> 1000 then/);
+});
+
+test('renew_buyer_research_briefs is service_role only', () => {
+  const signature = 'public\\.renew_buyer_research_briefs\\(text, text, text\\[\\], text\\[\\], text\\[\\], int\\)';
+  assert.match(migration, /set search_path = public/);
+  assert.match(migration, new RegExp(`revoke all on function ${signature} from public, anon, authenticated;`));
+  assert.match(migration, new RegExp(`grant execute on function ${signature} to service_role;`));
+});
+
+test('research-buyer clears the batch fingerprint when it rewrites a brief', () => {
+  assert.match(researchBuyer, /input_fingerprint: null,/);
+});
@@ -0,0 +1,29 @@
+import test from 'node:test';
+import assert from 'node:assert/strict';
+import { readFileSync } from 'node:fs';
+
+const migration = readFileSync(
+  new URL('../supabase/migrations/20260302110000_buyer_research_briefs_unique_key_v1.sql', import.meta.url),
+  'utf8',
+);
+const researchBuyer = readFileSync(
+  new URL('../supabase/functions/research-buyer/index.ts', import.meta.url),
+  'utf8',
+);
+
+test('migration dedupes briefs before adding the unique brief key', () => {
+  assert.match(migration, /partition by tenant_id, buyer_name, country, category/);
+  assert.match(migration, /order by researched_at desc nulls last, created_at desc nulls last, id desc/);
+  assert.match(migration, /and r\.rn > 1;/);
+  assert.match(
+    migration,
+    /create unique index if not exists buyer_research_briefs_tenant_buyer_country_category_uidx\s+on public\.buyer_research_briefs \(tenant_id, buyer_name, country, category\);/,
+  );
+  assert.ok(migration.indexOf('delete from public.buyer_research_briefs') < migration.indexOf('create unique index'));
+});
+
+test('research-buyer upserts briefs on the unique brief key', () => {
+  assert.match(researchBuyer, /\.from\("buyer_research_briefs"\)\s+\.upsert\(\{/);
+  assert.match(researchBuyer, /onConflict: "tenant_id,buyer_name,country,category"/);
+  assert.doesNotMatch(researchBuyer, /\.from\("buyer_research_briefs"\)\s+\.insert\(/);
+});
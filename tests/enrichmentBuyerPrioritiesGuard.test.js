@@ -0,0 +1,29 @@
+import test from 'node:test';
+import assert from 'node:assert/strict';
+import { readFileSync } from 'node:fs';
+
+const source = readFileSync(
+  new URL('../supabase/migrations/20260302140000_get_enrichment_buyer_priorities_v1.sql', import.meta.url),
+  'utf8',
+);
+
+test('get_enrichment_buyer_priorities aggregates open predictions per buyer', () => {
+  assert.match(source, /and p\.urgency = any\(p_urgencies\)/);
+  assert.match(source, /and p\.validation_status in \('pending', 'confirmed'\)/);
+  assert.match(source, /group by p\.buyer_name, p\.country/);
+  assert.match(source, /min\(p\.predicted_tender_date\) as next_tender_date/);
+  assert.match(source, /sum\(p\.total_value_eur\) as total_value_eur/);
+});
+
+test('brief expiry comes from the complete brief for the category', () => {
+  assert.match(
+    source,
+    /left join public\.buyer_research_briefs b\s+on b\.tenant_id = p_tenant_id\s+and b\.category = p_category\s+and b\.status = 'complete'/,
+  );
+});
+
+test('get_enrichment_buyer_priorities is service_role only', () => {
+  assert.match(source, /set search_path = public/);
+  assert.match(source, /revoke all on function public\.get_enrichment_buyer_priorities\(text, text, text\[\]\) from public, anon, authenticated;/);
+  assert.match(source, /grant execute on function public\.get_enrichment_buyer_priorities\(text, text, text\[\]\) to service_role;/);
+});
@@ -0,0 +1,31 @@
+import test from 'node:test';
+import assert from 'node:assert/strict';
+import { readFileSync } from 'node:fs';
+
+const source = readFileSync(
+  new URL('../supabase/migrations/20260302160000_get_enrichment_buyer_priorities_page_v1.sql', import.meta.url),
+  'utf8',
+);
+
+test('buyer pages are keyset-paginated and distinct server-side', () => {
+  assert.match(
+    source,
+    /and \(p_after_buyer_name is null or \(p\.buyer_name, p\.country\) > \(p_after_buyer_name, p_after_country\)\)/,
+  );
+  assert.match(source, /group by p\.buyer_name, p\.country\s+order by p\.buyer_name, p\.country\s+limit p_limit/);
+  assert.doesNotMatch(source.replace(/--.*$/gm, ''), /\boffset\b/i);
+});
+
+test('keyset index covers the page predicate', () => {
+  assert.match(
+    source,
+    /create index if not exists predictions_tenant_buyer_country_idx\s+on public\.predictions \(tenant_id, buyer_name, country\);/,
+  );
+});
+
+test('page size is bounded and the function is service_role only', () => {
+  assert.match(source, /p_limit must be between 1 and 5000/);
+  assert.match(source, /set search_path = public/);
+  assert.match(source, /revoke all on function public\.get_enrichment_buyer_priorities_page\(text, text, text\[\], text, text, int\) from public, anon, authenticated;/);
+  assert.match(source, /grant execute on function public\.get_enrichment_buyer_priorities_page\(text, text, text\[\], text, text, int\) to service_role;/);
+});
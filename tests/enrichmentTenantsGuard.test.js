@@ -0,0 +1,24 @@
+import test from 'node:test';
+import assert from 'node:assert/strict';
+import { readFileSync } from 'node:fs';
+
+const source = readFileSync(
+  new URL('../supabase/migrations/20260302180000_get_enrichment_tenants_v1.sql', import.meta.url),
+  'utf8',
+);
+
+test('tenants are listed with the buyer page predicate', () => {
+  assert.match(source, /where p\.urgency = any\(p_urgencies\)\s+and p\.validation_status in \('pending', 'confirmed'\)/);
+  assert.match(source, /and p\.buyer_name is not null\s+and p\.country is not null/);
+});
+
+test('tenants carry distinct buyer counts, largest first', () => {
+  assert.match(source, /count\(distinct \(p\.buyer_name, p\.country\)\)::int as buyers/);
+  assert.match(source, /group by p\.tenant_id\s+order by buyers desc, p\.tenant_id;/);
+});
+
+test('the function is service_role only', () => {
+  assert.match(source, /set search_path = public/);
+  assert.match(source, /revoke all on function public\.get_enrichment_tenants\(text\[\]\) from public, anon, authenticated;/);
+  assert.match(source, /grant execute on function public\.get_enrichment_tenants\(text\[\]\) to service_role;/);
+});
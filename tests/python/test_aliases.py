@@ -0,0 +1,72 @@
+import unittest
+
+from civant_enrich.aliases import group_aliases, normalize_buyer_name
+
+
+def key(name):
+    return normalize_buyer_name(name)[0]
+
+
+class NormalizeBuyerNameTest(unittest.TestCase):
+    def test_organ_prefixes_fold_into_the_authority(self):
+        for alias, authority in [
+            ("Alcaldía del Ayuntamiento de Las Rozas", "Ayuntamiento de Las Rozas"),
+            ("Pleno del Ayuntamiento de Madrid", "Ayuntamiento de Madrid"),
+            ("Excmo. Ayto. de Madrid", "Ayuntamiento de Madrid"),
+            ("Junta de Gobierno Local de Getafe", "Ayuntamiento de Getafe"),
+            ("Mesa de Contratación del Ayuntamiento de Toledo", "Ayuntamiento de Toledo"),
+            ("Presidencia de la Diputación Provincial de Jaén", "Diputación Provincial de Jaén"),
+            ("Mairie d'Angers", "Commune d'Angers"),
+            ("Ville du Mans", "Commune du Mans"),
+            ("Mairie des Sables-d'Olonne", "Commune des Sables-d'Olonne"),
+            ("Conseil départemental de la Gironde", "Département de la Gironde"),
+        ]:
+            with self.subTest(alias=alias):
+                self.assertEqual(key(alias), key(authority))
+
+    def test_articles_keep_places_apart(self):
+        for a, b in [
+            ("Ayuntamiento de Las Rozas", "Ayuntamiento de Rozas"),
+            ("Ayuntamiento de Los Molinos", "Ayuntamiento de Molinos"),
+            ("Commune du Mans", "Commune de Mans"),
+        ]:
+            with self.subTest(a=a, b=b):
+                self.assertNotEqual(key(a), key(b))
+
+    def test_organs_without_an_authority_are_left_alone(self):
+        self.assertEqual(key("Presidencia del Gobierno"), "presidencia del gobierno")
+        self.assertNotEqual(key("Presidencia del Gobierno"), key("Gobierno de Canarias"))
+        self.assertEqual(key("Ville Nouvelle"), "ville nouvelle")
+
+    def test_only_rewritten_names_are_flagged(self):
+        self.assertEqual(normalize_buyer_name("Ayuntamiento de Madrid"), ("ayuntamiento de madrid", False))
+        self.assertTrue(normalize_buyer_name("Alcaldía de Madrid")[1])
+
+
+class GroupAliasesTest(unittest.TestCase):
+    def test_representative_is_the_plain_name(self):
+        buyers = [
+            {"buyer_name": "Pleno del Ayuntamiento de Madrid", "country": "ES"},
+            {"buyer_name": "Ayuntamiento de Madrid", "country": "ES"},
+            {"buyer_name": "Ayuntamiento de Las Rozas", "country": "ES"},
+            {"buyer_name": "Ayuntamiento de Rozas", "country": "ES"},
+        ]
+        groups = group_aliases(buyers)
+        self.assertEqual([g["buyer_name"] for g in groups],
+                         ["Ayuntamiento de Madrid", "Ayuntamiento de Las Rozas", "Ayuntamiento de Rozas"])
+        self.assertEqual(groups[0]["aliases"], [{"buyer_name": "Pleno del Ayuntamiento de Madrid", "country": "ES"}])
+
+    def test_countries_and_entity_ids(self):
+        buyers = [
+            {"buyer_name": "Ville du Mans", "country": "FR"},
+            {"buyer_name": "Commune du Mans", "country": "BE"},
+            {"buyer_name": "Cork County Council", "country": "IE"},
+            {"buyer_name": "Comhairle Contae Chorcaí", "country": "IE"},
+        ]
+        groups = group_aliases(buyers, entity_ids=[None, None, "ie:cork", "ie:cork"])
+        self.assertEqual(len(groups), 3)
+        self.assertEqual(groups[2]["aliases"], [{"buyer_name": "Comhairle Contae Chorcaí", "country": "IE"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import socket
+import subprocess
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import httpx
+
+from civant_enrich import clients
+from civant_enrich.config import HTTP_KEEPALIVE_S, HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE
+from civant_enrich.metrics import METRICS
+
+
+class PooledTransportTest(unittest.TestCase):
+    def transport_kwargs(self, http2=None):
+        with mock.patch.object(httpx, "HTTPTransport") as transport, mock.patch.object(clients, "HTTP2", http2):
+            clients.pooled_transport(httpx, "supabase")
+        return transport.call_args.kwargs
+
+    def test_limits_and_keepalive(self):
+        kwargs = self.transport_kwargs()
+        self.assertEqual(kwargs["limits"], httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS,
+                                                        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                                                        keepalive_expiry=HTTP_KEEPALIVE_S))
+        self.assertIn((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1), kwargs["socket_options"])
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            self.assertIn((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 60), kwargs["socket_options"])
+
+    def test_http2_flag(self):
+        for value, expected in (("1", True), ("true", True), ("0", False), ("off", False), ("", False)):
+            with self.subTest(ENRICH_HTTP2=value):
+                self.assertIs(self.transport_kwargs(http2=value)["http2"], expected)
+
+    def test_http2_defaults_to_whether_h2_is_installed(self):
+        with mock.patch.object(clients, "HTTP2", None):
+            for spec, expected in ((object(), True), (None, False)):
+                with mock.patch.object(clients.importlib.util, "find_spec", return_value=spec):
+                    self.assertIs(clients.http2_enabled(), expected)
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b"[]"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class PooledConnectionTest(unittest.TestCase):
+    def test_requests_reuse_one_pooled_connection(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        def connections(state):
+            return METRICS.snapshot()["counters"].get(
+                f"http_connections_total{{client=test,connection={state},route=rpc/ping}}", 0)
+
+        before = connections("new"), connections("reused")
+        with mock.patch.object(clients, "HTTP2", "0"), \
+                httpx.Client(transport=clients.pooled_transport(httpx, "test")) as client:
+            for _ in range(3):
+                self.assertEqual(client.get(f"http://127.0.0.1:{server.server_port}/rest/v1/rpc/ping").json(), [])
+        self.assertEqual((connections("new") - before[0], connections("reused") - before[1]), (1, 2))
+
+
+class LazyImportTest(unittest.TestCase):
+    def imported(self, code):
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        code += "\nprint(' '.join(m for m in ('httpx', 'anthropic', 'supabase') if m in sys.modules))"
+        out = subprocess.run([sys.executable, "-c", "import sys\n" + code], cwd=root, check=True,
+                             capture_output=True, text=True).stdout
+        return out.splitlines()[-1].split()  # after any --help output
+
+    def test_help_imports_no_http_stack(self):
+        self.assertEqual(self.imported(
+            "from civant_enrich import cli\ntry:\n    cli.main(['--help'])\nexcept SystemExit:\n    pass"), [])
+
+    def test_stage_modules_import_no_http_stack(self):
+        self.assertEqual(self.imported("import civant_enrich.fetch, civant_enrich.ingest, civant_enrich.shared"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
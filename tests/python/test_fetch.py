@@ -0,0 +1,205 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import httpx
+
+from civant_enrich import fetch
+
+
+class APIError(Exception):
+    """Stands in for postgrest's APIError: the PostgREST error code on .code."""
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+class FakeSupabase:
+    """
+    rpc(name, params).execute() and table(name)...execute() return or raise
+    the next response queued for `name`; table filters are recorded as calls.
+    """
+
+    def __init__(self, responses):
+        self.responses = {k: list(v) for k, v in responses.items()}
+        self.calls = []
+
+    def _execute(self, name):
+        response = self.responses[name].pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return SimpleNamespace(data=response)
+
+    def rpc(self, name, params):
+        self.calls.append((name, params))
+        return SimpleNamespace(execute=lambda: self._execute(name))
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+
+class FakeQuery:
+    def __init__(self, supabase, name):
+        self.supabase, self.name, self.filters = supabase, name, []
+        self.not_ = self
+
+    def __getattr__(self, method):
+        def chain(*args):
+            self.filters.append((method, *args))
+            return self
+        return chain
+
+    def execute(self):
+        self.supabase.calls.append((self.name, self.filters))
+        return self.supabase._execute(self.name)
+
+
+def _patch_supabase(test, supabase):
+    patch = mock.patch.object(fetch, "get_supabase", return_value=supabase)
+    patch.start()
+    test.addCleanup(patch.stop)
+    patch = mock.patch.object(fetch.time, "sleep")
+    patch.start()
+    test.addCleanup(patch.stop)
+
+
+class BulkProbeTest(unittest.TestCase):
+    def probe(self, *responses):
+        _patch_supabase(self, FakeSupabase({"get_buyer_award_history_bulk": list(responses)}))
+        return fetch.award_history_bulk_available()
+
+    def test_deployed(self):
+        self.assertTrue(self.probe([]))
+
+    def test_missing_function(self):
+        self.assertFalse(self.probe(APIError("PGRST202")))
+
+    def test_transient_errors_are_retried(self):
+        self.assertTrue(self.probe(httpx.ConnectTimeout("timed out"), APIError("57014"), []))
+
+    def test_other_errors_raise(self):
+        with self.assertRaises(APIError):
+            self.probe(APIError("42501"))  # permission denied
+
+
+def _buyers(n):
+    return [{"buyer_name": f"Buyer {i}", "country": "IE", "priority": i} for i in range(n)]
+
+
+class PrefetchTest(unittest.TestCase):
+    def prefetch(self, buyers, **kwargs):
+        with mock.patch("builtins.print"):
+            return fetch.prefetch_award_histories(buyers, **kwargs)
+
+    def test_one_rpc_per_buyer_in_input_order(self):
+        supabase = FakeSupabase({"get_buyer_award_history": [
+            {"stats": {"total_contracts": i}} for i in range(5)]})
+        _patch_supabase(self, supabase)
+        result = self.prefetch(iter(_buyers(5)), workers=1)
+        self.assertEqual([b["buyer_name"] for b in result], [f"Buyer {i}" for i in range(5)])
+        self.assertEqual([b["award_history"]["stats"]["total_contracts"] for b in result], list(range(5)))
+        self.assertEqual(result[3]["priority"], 3)
+        self.assertEqual([params["p_buyer_name"] for _, params in supabase.calls], [f"Buyer {i}" for i in range(5)])
+
+    def test_transient_failures_are_retried_and_others_leave_no_history(self):
+        _patch_supabase(self, FakeSupabase({"get_buyer_award_history": [
+            httpx.ReadTimeout("slow"), {"stats": {}}, APIError("42501")]}))
+        result = self.prefetch(_buyers(2), workers=1, retries=2)
+        self.assertEqual([b["award_history"] for b in result], [{"stats": {}}, None])
+
+
+class BulkPrefetchTest(unittest.TestCase):
+    def test_units_follow_bulk_size(self):
+        units = []
+
+        def bulk_fetch(unit):
+            units.append([b["buyer_name"] for b in unit])
+            return [{"for": b["buyer_name"]} for b in unit]
+
+        with mock.patch("builtins.print"):
+            result = fetch.prefetch_award_histories(_buyers(7), workers=2, bulk_fetch=bulk_fetch, bulk_size=3)
+        self.assertEqual(sorted(len(u) for u in units), [1, 3, 3])
+        self.assertEqual([b["award_history"]["for"] for b in result], [b["buyer_name"] for b in _buyers(7)])
+
+    def test_a_failed_unit_leaves_only_its_buyers_without_history(self):
+        def bulk_fetch(unit):
+            if unit[0]["buyer_name"] == "Buyer 2":
+                raise APIError("42501")
+            return [{"stats": {}} for _ in unit]
+
+        with mock.patch("builtins.print"):
+            result = fetch.prefetch_award_histories(_buyers(5), workers=1, bulk_fetch=bulk_fetch, bulk_size=2)
+        self.assertEqual([b["award_history"] is not None for b in result], [True, True, False, False, True])
+
+    def test_bulk_rows_map_back_by_index(self):
+        _patch_supabase(self, FakeSupabase({"get_buyer_award_history_bulk": [[
+            {"idx": 3, "award_history": {"stats": {"total_contracts": 3}}},
+            {"idx": 1, "award_history": {"stats": {"total_contracts": 1}}},
+            {"idx": 9, "award_history": {"stats": {}}},
+        ]]}))
+        histories = fetch.fetch_award_history_bulk(_buyers(3))
+        self.assertEqual([h and h["stats"]["total_contracts"] for h in histories], [1, None, 3])
+
+
+def _page(*names):
+    return [{"buyer_name": name, "country": "IE"} for name in names]
+
+
+class BuyerPagesTest(unittest.TestCase):
+    def pages(self, supabase, **kwargs):
+        _patch_supabase(self, supabase)
+        with mock.patch("builtins.print"):
+            return list(fetch.iter_buyer_pages(**kwargs))
+
+    def test_keyset_pages_advance_after_the_last_buyer(self):
+        supabase = FakeSupabase({"get_enrichment_buyer_priorities_page": [
+            _page("A", "B"), _page("C", "D"), _page("E")]})
+        pages = self.pages(supabase, page_size=2, include_overdue=True)
+        self.assertEqual([[b["buyer_name"] for b in page] for page in pages], [["A", "B"], ["C", "D"], ["E"]])
+        self.assertEqual([(p["p_after_buyer_name"], p["p_after_country"], p["p_limit"]) for _, p in supabase.calls],
+                         [(None, None, 2), ("B", "IE", 2), ("D", "IE", 2)])
+        self.assertEqual(supabase.calls[0][1]["p_urgencies"], ["upcoming", "overdue"])
+
+    def test_a_full_last_page_ends_on_an_empty_one(self):
+        supabase = FakeSupabase({"get_enrichment_buyer_priorities_page": [_page("A", "B"), []]})
+        self.assertEqual(len(self.pages(supabase, page_size=2)), 1)
+        self.assertEqual(len(supabase.calls), 2)
+
+    def test_a_later_page_failing_raises_instead_of_falling_back(self):
+        supabase = FakeSupabase({"get_enrichment_buyer_priorities_page": [_page("A", "B"), APIError("42501")]})
+        with self.assertRaises(APIError):
+            self.pages(supabase, page_size=2)
+
+    def test_unpaged_rpcs_are_tried_in_order(self):
+        supabase = FakeSupabase({
+            "get_enrichment_buyer_priorities_page": [APIError("PGRST202")],
+            "get_enrichment_buyer_priorities": [APIError("PGRST202")],
+            "get_batch_enrichment_buyers": [_page("A", "B", "C")],
+        })
+        self.assertEqual(self.pages(supabase, page_size=2), [_page("A", "B", "C")])
+        self.assertEqual([name for name, _ in supabase.calls], [
+            "get_enrichment_buyer_priorities_page", "get_enrichment_buyer_priorities", "get_batch_enrichment_buyers"])
+
+    def test_predictions_table_is_the_last_resort(self):
+        def row(row_id, name, urgency="upcoming"):
+            return {"id": row_id, "buyer_name": name, "country": "IE", "urgency": urgency,
+                    "predicted_tender_date": None, "probability": None, "total_value_eur": None}
+
+        supabase = FakeSupabase({
+            "get_enrichment_buyer_priorities_page": [APIError("PGRST202")],
+            "get_enrichment_buyer_priorities": [[]],
+            "get_batch_enrichment_buyers": [APIError("PGRST202")],
+            # B's rows span the page boundary
+            "predictions": [[row(1, "A"), row(2, "B")], [row(3, "B", "overdue"), row(4, "C")], []],
+        })
+        pages = self.pages(supabase, page_size=2, include_overdue=True)
+        self.assertEqual([[(b["buyer_name"], b["predictions"]) for b in page] for page in pages],
+                         [[("A", 1)], [("B", 2)], [("C", 1)]])
+        keysets = [f for name, filters in supabase.calls if name == "predictions" for f in filters if f[0] == "or_"]
+        self.assertEqual(len(keysets), 2)
+        self.assertIn('id.gt."2"', keysets[0][1])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from civant_enrich import fetch, history_cache
+from civant_enrich.history_cache import AwardHistoryCache
+
+HISTORY = {"stats": {"total_contracts": 3}, "awards": ["a" * 80]}
+
+
+class CacheTestCase(unittest.TestCase):
+    def setUp(self):
+        state = tempfile.TemporaryDirectory()
+        self.addCleanup(state.cleanup)
+        self.path = os.path.join(state.name, "history.sqlite")
+        self.now = [1000.0]
+        patch = mock.patch.object(history_cache, "time", SimpleNamespace(time=lambda: self.now[0]))
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def cache(self, **kwargs):
+        cache = AwardHistoryCache(self.path, **{"ttl_s": 100, "max_bytes": 10 ** 6, **kwargs})
+        self.addCleanup(cache._db.close)
+        return cache
+
+
+class AwardHistoryCacheTest(CacheTestCase):
+    def test_hits_misses_and_cached_none(self):
+        cache = self.cache()
+        cache.put_many([(("Madrid", "ES"), HISTORY), (("Getafe", "ES"), None)])
+        found = cache.get_many([("Madrid", "ES"), ("Getafe", "ES"), ("Toledo", "ES")])
+        self.assertEqual(found, {("Madrid", "ES"): HISTORY, ("Getafe", "ES"): None})
+        self.assertEqual((cache.stats["hits"], cache.stats["misses"], cache.stats["stored"]), (2, 1, 2))
+
+    def test_entries_expire_after_the_ttl(self):
+        cache = self.cache()
+        cache.put_many([(("Madrid", "ES"), HISTORY)])
+        self.now[0] += 100
+        self.assertIn(("Madrid", "ES"), cache.get_many([("Madrid", "ES")]))
+        self.now[0] += 1
+        self.assertEqual(cache.get_many([("Madrid", "ES")]), {})
+        self.assertEqual(cache.stats["expired"], 1)
+        self.assertEqual(cache.evict(), 1)
+
+    def test_least_recently_used_entries_are_evicted_over_the_size_cap(self):
+        cache = self.cache()
+        for name in ("Madrid", "Getafe", "Toledo"):
+            cache.put_many([((name, "ES"), HISTORY)])
+            self.now[0] += 1
+        cache.get_many([("Madrid", "ES")])  # now the most recently used
+        size = cache._db.execute("select size from award_history limit 1").fetchone()[0]
+        cache.max_bytes = 2 * size
+        self.assertEqual(cache.evict(), 1)
+        self.assertEqual(set(cache.get_many([("Madrid", "ES"), ("Getafe", "ES"), ("Toledo", "ES")])),
+                         {("Madrid", "ES"), ("Toledo", "ES")})
+
+    def test_entries_survive_reopening(self):
+        self.cache().put_many([(("Madrid", "ES"), HISTORY)])
+        self.assertEqual(self.cache().get_many([("Madrid", "ES")]), {("Madrid", "ES"): HISTORY})
+
+    def test_refresh_mode_stores_but_never_hits(self):
+        self.cache().put_many([(("Madrid", "ES"), HISTORY)])
+        cache = self.cache(mode="refresh")
+        self.assertEqual(cache.get_many([("Madrid", "ES")]), {})
+        self.assertEqual(cache.stats["misses"], 1)
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            AwardHistoryCache(self.path, mode="sometimes")
+
+
+class CachedPrefetchTest(CacheTestCase):
+    def prefetch(self, cache):
+        fetched = []
+
+        def bulk_fetch(unit):
+            fetched.extend(b["buyer_name"] for b in unit)
+            return [{"for": b["buyer_name"]} for b in unit]
+
+        buyers = [{"buyer_name": name, "country": "ES"} for name in ("Madrid", "Getafe", "Toledo")]
+        with mock.patch("builtins.print"):
+            result = fetch.prefetch_award_histories(buyers, workers=1, bulk_fetch=bulk_fetch, bulk_size=10,
+                                                    cache=cache)
+        return fetched, [b["award_history"] for b in result]
+
+    def test_only_misses_are_fetched_and_then_stored(self):
+        cache = self.cache()
+        cache.put_many([(("Getafe", "ES"), {"for": "cached"})])
+        fetched, histories = self.prefetch(cache)
+        self.assertEqual(fetched, ["Madrid", "Toledo"])
+        self.assertEqual(histories, [{"for": "Madrid"}, {"for": "cached"}, {"for": "Toledo"}])
+        self.assertEqual(set(cache.get_many([("Madrid", "ES"), ("Toledo", "ES")])),
+                         {("Madrid", "ES"), ("Toledo", "ES")})
+
+    def test_cache_only_mode_never_fetches(self):
+        self.cache().put_many([(("Getafe", "ES"), {"for": "cached"})])
+        fetched, histories = self.prefetch(self.cache(mode="only"))
+        self.assertEqual((fetched, histories), ([], [None, {"for": "cached"}, None]))
+
+
+if __name__ == "__main__":
+    unittest.main()
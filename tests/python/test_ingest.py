@@ -0,0 +1,235 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import httpx
+
+from civant_enrich import ingest
+from civant_enrich.ledger import BatchLedger
+
+BRIEF = json.dumps({"summary": "Renews IT services every 3 years.", "opportunity_score": 70, "sources": []})
+
+
+def _result(custom_id, kind="succeeded"):
+    message = SimpleNamespace(content=[SimpleNamespace(type="text", text=BRIEF)],
+                              usage=SimpleNamespace(input_tokens=100, output_tokens=50, server_tool_use=None))
+    return SimpleNamespace(custom_id=custom_id, result=SimpleNamespace(type=kind, message=message, error="boom"))
+
+
+class FakeTable:
+    """Upserts into `store`; rows of buyers in `rejected` fail, and everything fails while `down`."""
+
+    def __init__(self, store, rejected, down):
+        self.store, self.rejected, self.down = store, rejected, down
+
+    def upsert(self, rows, on_conflict=None):
+        rows = rows if isinstance(rows, list) else [rows]
+
+        def execute():
+            if self.down:
+                raise httpx.ConnectError("Supabase unreachable")
+            if any(r["buyer_name"] in self.rejected for r in rows):
+                raise ValueError("violates check constraint")
+            for r in rows:
+                self.store[(r["buyer_name"], r["country"])] = r
+        return SimpleNamespace(execute=execute)
+
+
+class IngestCheckpointTest(unittest.TestCase):
+    def setUp(self):
+        state = tempfile.TemporaryDirectory()
+        self.addCleanup(state.cleanup)
+        self.store, self.rejected, self.down = {}, set(), []
+
+        def table(name):
+            return FakeTable(self.store, self.rejected, bool(self.down))
+
+        self.results = [_result(f"ES_{i:04d}") for i in range(4)]
+        batches = SimpleNamespace(
+            retrieve=lambda batch_id: SimpleNamespace(processing_status="ended", ended_at=None),
+            results=lambda batch_id: iter(self.results),
+        )
+        for patch in (
+            mock.patch.object(ingest, "STATE_DIR", state.name),
+            mock.patch.object(ingest, "get_supabase", return_value=SimpleNamespace(table=table)),
+            mock.patch.object(ingest, "get_anthropic",
+                              return_value=SimpleNamespace(messages=SimpleNamespace(batches=batches))),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        self.id_map = {f"ES_{i:04d}": {"buyer_name": name, "country": "ES"}
+                       for i, name in enumerate(["Madrid", "Getafe", "Toledo", "Jaén"])}
+        self.ledger = BatchLedger(os.path.join(state.name, "ledger.sqlite"))
+        self.addCleanup(self.ledger.close)
+        self.ledger.record_batch("msgbatch_1", self.id_map)
+
+    def ingest(self, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return ingest.ingest_results("msgbatch_1", ledger=self.ledger, **kwargs)
+
+    def report(self):
+        return self.ledger.report(["msgbatch_1"])[0]
+
+    def test_full_pass_completes_and_rerun_is_a_no_op(self):
+        stats = self.ingest()
+        self.assertEqual(stats.upserted, 4)
+        self.assertEqual(len(self.store), 4)
+        self.assertTrue(ingest.load_checkpoint("msgbatch_1")["complete"])
+        self.assertEqual((self.report()["written"], self.report()["ingest_state"]), (4, "complete"))
+        self.assertIsNone(self.ingest())
+
+    def test_rejected_rows_are_retried_before_the_batch_completes(self):
+        self.rejected.add("Getafe")
+        stats = self.ingest()
+        self.assertEqual((stats.upserted, stats.write_failed), (3, 1))
+        checkpoint = ingest.load_checkpoint("msgbatch_1")
+        self.assertFalse(checkpoint["complete"])
+        self.assertEqual([p["rows"][0]["buyer_name"] for p in checkpoint["retry"]], ["Getafe"])
+        report = self.report()
+        self.assertEqual((report["written"], report["failed"], report["ingest_state"]), (3, 1, "pending"))
+
+        self.ingest()  # still rejected: stays in the retry list
+        self.assertFalse(ingest.load_checkpoint("msgbatch_1")["complete"])
+
+        self.rejected.clear()
+        stats = self.ingest()
+        self.assertEqual(stats.upserted, 1)
+        self.assertIn(("Getafe", "ES"), self.store)
+        self.assertTrue(ingest.load_checkpoint("msgbatch_1")["complete"])
+        self.assertEqual((self.report()["written"], self.report()["ingest_state"]), (4, "complete"))
+
+    def test_resumes_after_the_last_committed_chunk(self):
+        writes = []
+        original = ingest.write_briefs
+
+        def write_briefs(chunk, *args):
+            if len(writes) == 2:
+                self.down.append(True)
+            writes.append([r["buyer_name"] for r in chunk])
+            return original(chunk, *args)
+
+        with mock.patch.object(ingest, "write_briefs", side_effect=write_briefs):
+            with self.assertRaises(httpx.ConnectError):
+                self.ingest(chunk_size=1)
+        checkpoint = ingest.load_checkpoint("msgbatch_1")
+        self.assertEqual((checkpoint["position"], checkpoint["last_custom_id"]), (2, "ES_0001"))
+
+        self.down.clear()
+        writes.clear()
+        with mock.patch.object(ingest, "write_briefs", side_effect=write_briefs):
+            stats = self.ingest(chunk_size=1)
+        self.assertEqual(writes, [["Toledo"], ["Jaén"]])
+        self.assertEqual(stats.upserted, 2)
+        self.assertEqual(len(self.store), 4)
+        self.assertTrue(ingest.load_checkpoint("msgbatch_1")["complete"])
+
+    def test_rows_are_written_in_chunks_of_chunk_size(self):
+        self.id_map["ES_0001"]["aliases"] = [["Getafe Ayuntamiento", "ES"]]
+        self.ledger.record_batch("msgbatch_1", self.id_map)
+        writes = []
+        original = ingest.write_briefs
+
+        def write_briefs(chunk, *args):
+            writes.append([r["buyer_name"] for r in chunk])
+            return original(chunk, *args)
+
+        with mock.patch.object(ingest, "write_briefs", side_effect=write_briefs):
+            stats = self.ingest(chunk_size=3)
+        # Alias rows count towards the chunk; the last, partial chunk is flushed at the end
+        self.assertEqual(writes, [["Madrid", "Getafe", "Getafe Ayuntamiento"], ["Toledo", "Jaén"]])
+        self.assertEqual(stats.upserted, 5)
+        self.assertTrue(ingest.load_checkpoint("msgbatch_1")["complete"])
+
+    def test_changed_result_order_reingests_from_the_start(self):
+        self.ingest(chunk_size=1)
+        ingest.save_checkpoint("msgbatch_1", {"position": 2, "last_custom_id": "ES_0003", "complete": False})
+        self.store.clear()
+        stats = self.ingest()
+        self.assertEqual(stats.upserted, 4)
+        self.assertEqual(len(self.store), 4)
+
+    def test_errored_and_unknown_results_are_not_written(self):
+        self.results[1] = _result("ES_0001", kind="errored")
+        self.results.append(_result("ES_9999"))
+        stats = self.ingest()
+        self.assertEqual((stats.upserted, stats.errored, stats.skipped), (3, 1, 1))
+        self.assertNotIn(("Getafe", "ES"), self.store)
+        self.assertEqual(self.report()["errored"], 1)
+
+    def test_shared_briefs_are_attached_once_written(self):
+        self.id_map["ES_0000"].update(tenants=["acme", "globex"], aliases=[["Ayuntamiento de Madrid", "ES"]],
+                                      alias_tenants=[["initech"]])
+        self.id_map["ES_0001"].update(tenants=["acme"])
+        self.ledger.record_batch("msgbatch_1", self.id_map)
+        self.rejected.add("Getafe")
+        tables = []
+        supabase = ingest.get_supabase.return_value
+        original = supabase.table
+
+        def table(name):
+            tables.append(name)
+            return original(name)
+        supabase.table = table
+
+        with mock.patch.object(ingest, "attach_shared_briefs", side_effect=len) as attach:
+            stats = self.ingest()
+        self.assertEqual(tables, ["buyer_research_briefs", "shared_buyer_research_briefs"])
+        self.assertNotIn("tenant_id", self.store[("Madrid", "ES")])
+        self.assertNotIn("tenant_id", self.store[("Ayuntamiento de Madrid", "ES")])
+        # Getafe's shared row was rejected: it is retried before anything is attached for it
+        attach.assert_called_once_with([("acme", "Madrid", "ES"), ("globex", "Madrid", "ES"),
+                                        ("initech", "Ayuntamiento de Madrid", "ES")])
+        self.assertEqual((stats.attached, stats.write_failed), (3, 1))
+
+    def test_parse_workers_write_the_same_rows_in_result_order(self):
+        writes = []
+        original = ingest.write_briefs
+
+        def write_briefs(chunk, *args):
+            writes.append([r["buyer_name"] for r in chunk])
+            return original(chunk, *args)
+
+        with mock.patch.object(ingest, "write_briefs", side_effect=write_briefs):
+            stats = self.ingest(chunk_size=1, parse_workers=2)
+        self.assertEqual(writes, [["Madrid"], ["Getafe"], ["Toledo"], ["Jaén"]])
+        self.assertEqual(stats.upserted, 4)
+
+
+def _task(name):
+    return {"tenant_id": "civant_default", "ttl_days": 30, "realtime": False, "buyer_name": name,
+            "country": "ES", "input_fingerprint": None, "raw_text": BRIEF,
+            "usage": {"input_tokens": 100, "output_tokens": 50}}
+
+
+class ParseInOrderTest(unittest.TestCase):
+    def items(self):
+        for position in range(1, 12):
+            if position % 4 == 0:
+                yield position, f"ES_{position:04d}", None, ("errored", "boom")
+            else:
+                yield position, f"ES_{position:04d}", _task(f"Buyer {position}"), None
+
+    def test_pool_keeps_input_order_across_chunks(self):
+        serial = list(ingest.parse_in_order(self.items(), workers=1, chunk=3))
+        pooled = list(ingest.parse_in_order(self.items(), workers=2, chunk=2))
+        self.assertEqual([p[0] for p in pooled], list(range(1, 12)))
+        self.assertEqual([(p[1], p[3]) for p in pooled], [(p[1], p[3]) for p in serial])
+        self.assertEqual([p[2] and p[2]["row"]["buyer_name"] for p in pooled],
+                         [None if i % 4 == 0 else f"Buyer {i}" for i in range(1, 12)])
+
+    def test_a_failing_task_is_reported_without_failing_its_chunk(self):
+        items = [(1, "ES_0001", _task("Madrid"), None), (2, "ES_0002", {"raw_text": BRIEF}, None)]
+        first, second = ingest.parse_in_order(iter(items), workers=2, chunk=2)
+        self.assertEqual(first[2]["row"]["buyer_name"], "Madrid")
+        self.assertIsNone(second[2]["row"])
+        self.assertIn("KeyError", second[2]["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import tempfile
+import unittest
+
+from civant_enrich.ledger import BatchLedger
+
+
+class BatchLedgerTest(unittest.TestCase):
+    def setUp(self):
+        state = tempfile.TemporaryDirectory()
+        self.addCleanup(state.cleanup)
+        self.ledger = BatchLedger(os.path.join(state.name, "ledger.sqlite"))
+        self.addCleanup(self.ledger.close)
+
+    def test_results_and_report(self):
+        self.ledger.record_batch("b1", {
+            "ES_0000": {"buyer_name": "Ayuntamiento de Madrid", "country": "ES"},
+            "ES_0001": {"buyer_name": "Ayuntamiento de Getafe", "country": "ES"},
+            "ES_0002": {"buyer_name": "Ayuntamiento de Toledo", "country": "ES"},
+        })
+        self.assertEqual(self.ledger.id_map("b1")["ES_0001"]["buyer_name"], "Ayuntamiento de Getafe")
+        self.assertIsNone(self.ledger.id_map("b2"))
+        self.ledger.record_results("b1", [
+            ("ES_0000", "succeeded", 1000, 0.01, "json", "written", None),
+            ("ES_0001", "succeeded", 1000, 0.01, "json", "failed", "upsert failed"),
+        ])
+        self.ledger.update_batch("b1", processing_status="ended")
+        (report,) = self.ledger.report()
+        self.assertEqual(
+            {k: report[k] for k in ("requests", "succeeded", "written", "failed", "pending", "tokens", "ingest_state")},
+            {"requests": 3, "succeeded": 2, "written": 1, "failed": 1, "pending": 1, "tokens": 2000,
+             "ingest_state": "pending"},
+        )
+        self.assertEqual([h["ingest_state"] for h in self.ledger.buyer_history("Ayuntamiento de Getafe", "ES")],
+                         ["failed"])
+        with self.assertRaises(ValueError):
+            self.ledger.update_batch("b1", buyer_name="x")
+
+    def test_tenant_report_splits_shared_requests_by_briefs(self):
+        self.ledger.record_batch("b1", {
+            "ES_0000": {"buyer_name": "Ayuntamiento de Madrid", "country": "ES", "tenants": ["t1", "t2"],
+                        "aliases": [["Pleno del Ayuntamiento de Madrid", "ES"]], "alias_tenants": [["t1"]]},
+            "ES_0001": {"buyer_name": "Ayuntamiento de Getafe", "country": "ES", "tenants": ["t2"]},
+        })
+        self.ledger.record_results("b1", [
+            ("ES_0000", "succeeded", 900, 0.03, "json", "written", None),
+            ("ES_0001", "succeeded", 300, 0.01, "json", "written", None),
+        ])
+        report = {r["tenant_id"]: r for r in self.ledger.tenant_report(["b1"])}
+        self.assertEqual((report["t1"]["briefs"], report["t1"]["tokens"]), (2, 600))
+        self.assertEqual((report["t2"]["requests"], report["t2"]["briefs"], report["t2"]["tokens"]), (2, 2, 600))
+        self.assertAlmostEqual(report["t1"]["cost_usd"] + report["t2"]["cost_usd"], 0.04)
+
+
+if __name__ == "__main__":
+    unittest.main()
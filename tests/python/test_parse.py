@@ -0,0 +1,40 @@
+import json
+import os
+import unittest
+
+from civant_enrich.parse import STRATEGY_FIELDS, STRATEGY_JSON, STRATEGY_TEXT, extract_json, parse_brief
+
+FIXTURES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "fixtures", "extract_json")
+
+
+class ExtractJsonGoldenTest(unittest.TestCase):
+    """Every fixtures/extract_json/<name>.txt parses to <name>.json (regenerate with bench-extract-json.py --update)."""
+
+    def test_goldens(self):
+        names = sorted(f[:-4] for f in os.listdir(FIXTURES) if f.endswith(".txt"))
+        self.assertTrue(names)
+        for name in names:
+            with self.subTest(fixture=name):
+                with open(os.path.join(FIXTURES, name + ".txt"), encoding="utf-8") as f:
+                    raw = f.read()
+                with open(os.path.join(FIXTURES, name + ".json"), encoding="utf-8") as f:
+                    golden = json.load(f)
+                self.assertEqual(parse_brief(raw)[0], golden)
+
+
+class ParseBriefTest(unittest.TestCase):
+    def test_strategies(self):
+        self.assertEqual(parse_brief('{"summary": "ok", "sources": []}'), ({"summary": "ok", "sources": []},
+                                                                          STRATEGY_JSON))
+        brief, strategy = parse_brief('{"summary": "no comma" "opportunity_score": 42}')
+        self.assertEqual((brief["summary"], brief["opportunity_score"], strategy), ("no comma", 42, STRATEGY_FIELDS))
+        self.assertEqual(parse_brief("No JSON at all."), ({"summary": "No JSON at all.", "sources": []},
+                                                          STRATEGY_TEXT))
+
+    def test_extract_json_returns_the_brief(self):
+        self.assertEqual(extract_json('Here you go: {"summary": "s", "sources": [],}'),
+                         {"summary": "s", "sources": []})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from civant_enrich import cli, ledger, poll
+from civant_enrich.metrics import METRICS
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def _batch(status="ended", processing=0):
+    counts = SimpleNamespace(processing=processing, succeeded=1, errored=0, canceled=0, expired=0)
+    return SimpleNamespace(processing_status=status, request_counts=counts)
+
+
+class FakeBatches:
+    def __init__(self, responses):
+        self.responses = {k: list(v) for k, v in responses.items()}
+
+    def retrieve(self, batch_id):
+        response = self.responses[batch_id].pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class WatchBatchesTest(unittest.TestCase):
+    def watch(self, responses, ingest=None):
+        client = SimpleNamespace(messages=SimpleNamespace(batches=FakeBatches(responses)))
+        with mock.patch.object(poll, "get_anthropic", return_value=client), \
+                mock.patch.object(poll.asyncio, "sleep", new=mock.AsyncMock()), \
+                mock.patch("builtins.print"):
+            return poll.watch_batches(list(responses), ingest=ingest, lo=0, hi=0)
+
+    def test_transient_retrieve_errors_are_retried(self):
+        result = self.watch({"b1": [StatusError(529), _batch("in_progress", 3), StatusError(503), _batch()]})
+        self.assertEqual(result["b1"].processing_status, "ended")
+
+    def test_a_failed_batch_does_not_stop_the_others(self):
+        ingested = []
+        result = self.watch({"bad": [StatusError(404)], "good": [_batch("in_progress", 1), _batch()]},
+                            ingest=ingested.append)
+        self.assertIsInstance(result["bad"], StatusError)
+        self.assertEqual(result["good"].processing_status, "ended")
+        self.assertEqual(ingested, ["good"])
+
+    def test_retries_run_out(self):
+        result = self.watch({"b1": [StatusError(429)] * (poll.POLL_RETRIES + 1)})
+        self.assertIsInstance(result["b1"], StatusError)
+
+    def test_a_failed_ingest_is_reported_per_batch(self):
+        def ingest(batch_id):
+            if batch_id == "b1":
+                raise RuntimeError("upsert failed")
+
+        result = self.watch({"b1": [_batch()], "b2": [_batch()]}, ingest=ingest)
+        self.assertIsInstance(result["b1"], RuntimeError)
+        self.assertEqual(result["b2"].processing_status, "ended")
+
+
+class PollCommandTest(unittest.TestCase):
+    def test_a_failed_batch_fails_the_command(self):
+        state = tempfile.TemporaryDirectory()
+        self.addCleanup(state.cleanup)
+        path = os.path.join(state.name, "ledger.sqlite")
+        BatchLedger = ledger.BatchLedger
+        led = BatchLedger(path)
+        led.record_manifest({"manifest_id": "enrich_1", "created_at": "2026-03-01T00:00:00Z",
+                             "rejected": [], "shards": []})
+        for batch_id in ("bad", "good"):
+            led.record_batch(batch_id, {"ES_0000": {"buyer_name": "A", "country": "ES"}}, manifest_id="enrich_1")
+        led.close()
+
+        client = SimpleNamespace(messages=SimpleNamespace(batches=FakeBatches(
+            {"bad": [StatusError(404)], "good": [_batch()]})))
+        with mock.patch.object(poll, "get_anthropic", return_value=client), \
+                mock.patch.object(ledger, "BatchLedger", lambda: BatchLedger(path)), \
+                mock.patch("builtins.print"):
+            with self.assertRaises(SystemExit) as raised:
+                cli.main(["--poll", "enrich_1"])
+        self.assertNotEqual(raised.exception.code, 0)
+        gauges = METRICS.snapshot()["gauges"]
+        self.assertEqual(gauges["last_run_success{command=poll}"], 0)
+        self.assertEqual(gauges["stage_items{stage=poll}"], 1)
+
+if __name__ == "__main__":
+    unittest.main()
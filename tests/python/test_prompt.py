@@ -0,0 +1,36 @@
+import unittest
+
+from civant_enrich.prompt import build_batch_requests, build_prompts, request_input_tokens
+
+HISTORY = {
+    "stats": {"total_contracts": 40, "unique_suppliers": 12, "total_spend": 1_000_000},
+    "top_suppliers": [{"supplier": f"Supplier {i}", "contracts": 2, "total_value": 50_000} for i in range(20)],
+    "recent_contracts": [{"value_eur": 25_000, "supplier": f"Supplier {i}"} for i in range(20)],
+}
+
+
+class BuildPromptsTest(unittest.TestCase):
+    def test_no_history_note_is_in_the_system_prompt(self):
+        system, user = build_prompts("Ayuntamiento de Madrid", "ES")
+        self.assertIn("NOTE: No historical award data was found for this buyer.", system)
+        self.assertIn("Country: Spain", user)
+        system, _ = build_prompts("Ayuntamiento de Madrid", "ES", HISTORY)
+        self.assertNotIn("NOTE: No historical award data", system)
+
+    def test_requests_send_the_system_prompt_as_is(self):
+        requests, id_map = build_batch_requests([{"buyer_name": "Ville du Mans", "country": "FR"}])
+        params = requests[0]["params"]
+        self.assertEqual(params["system"], build_prompts("Ville du Mans", "FR")[0])
+        self.assertEqual(id_map[requests[0]["custom_id"]]["buyer_name"], "Ville du Mans")
+
+    def test_compaction_fits_the_cap(self):
+        full, _ = build_batch_requests([{"buyer_name": "A", "country": "IE", "award_history": HISTORY}])
+        cap = request_input_tokens(full[0]) - 100
+        requests, id_map = build_batch_requests(
+            [{"buyer_name": "A", "country": "IE", "award_history": HISTORY}], max_input_tokens=cap)
+        self.assertLessEqual(request_input_tokens(requests[0]), cap)
+        self.assertEqual(id_map[requests[0]["custom_id"]]["compacted_from_tokens"], request_input_tokens(full[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from civant_enrich import ingest, realtime
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def _message(stop_reason="end_turn", input_tokens=1000, text="{}"):
+    return SimpleNamespace(content=[SimpleNamespace(type="text", text=text)], stop_reason=stop_reason,
+                           usage=SimpleNamespace(input_tokens=input_tokens, output_tokens=100, server_tool_use=None))
+
+
+def _params(user="Research this buyer"):
+    return {"model": "m", "max_tokens": 10, "system": "You are Civant Agent.",
+            "messages": [{"role": "user", "content": user}], "tools": []}
+
+
+class FakeLimiter:
+    def __init__(self):
+        self.acquired, self.settled, self.backoffs = [], [], []
+
+    def acquire(self, input_tokens):
+        self.acquired.append(input_tokens)
+
+    def settle(self, estimated, actual):
+        self.settled.append((estimated, actual))
+
+    def backoff(self, seconds):
+        self.backoffs.append(seconds)
+
+
+def _client(create):
+    return SimpleNamespace(messages=SimpleNamespace(create=create))
+
+
+class TokenBucketTest(unittest.TestCase):
+    def test_waits_for_refill(self):
+        bucket = realtime.TokenBucket(rate_per_s=1000, capacity=5)
+        self.assertEqual(bucket.acquire(5), 0.0)
+        self.assertGreater(bucket.acquire(5), 0.0)
+
+    def test_oversized_requests_wait_for_a_full_bucket(self):
+        bucket = realtime.TokenBucket(rate_per_s=1000, capacity=5)
+        bucket.acquire(5)
+        started = time.monotonic()
+        self.assertGreater(bucket.acquire(500), 0.0)
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_credit_can_go_negative_but_not_past_capacity(self):
+        bucket = realtime.TokenBucket(rate_per_s=1000, capacity=5)
+        bucket.credit(100)
+        self.assertEqual(bucket.acquire(5), 0.0)
+        bucket.credit(-5)
+        self.assertGreater(bucket.acquire(1), 0.0)
+
+
+class FakeClock:
+    """time.monotonic and time.sleep for realtime: sleeping advances the clock."""
+
+    def __init__(self):
+        self.now, self.sleeps = 100.0, []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class ClockedLimiterTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patch = mock.patch.object(realtime, "time", self.clock)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_waits_exactly_for_the_deficit(self):
+        bucket = realtime.TokenBucket(rate_per_s=10, capacity=20)
+        bucket.acquire(15)
+        self.assertEqual(bucket.acquire(10), 0.5)  # 5 left, 5 more at 10/s
+        self.assertEqual(self.clock.sleeps, [0.5])
+
+    def test_capacity_caps_both_the_refill_and_the_request(self):
+        bucket = realtime.TokenBucket(rate_per_s=10, capacity=20)
+        self.clock.now += 3600  # an idle hour still leaves only a full bucket
+        bucket.acquire(20)
+        self.assertEqual(bucket.acquire(1000), 2.0)  # waits for 20, not 1000
+
+    def test_limiter_settles_on_actual_usage_and_counts_throttled_time(self):
+        limiter = realtime.RateLimiter(rpm=60, itpm=6000)  # buckets: 10 requests, 1000 tokens
+        limiter.acquire(1000)
+        limiter.settle(1000, 400)  # 600 returned
+        limiter.acquire(600)
+        self.assertEqual(limiter.throttled_s, 0.0)
+        limiter.acquire(100)  # 100 tokens at 100/s
+        self.assertEqual(limiter.throttled_s, 1.0)
+        limiter.backoff(2.5)
+        self.assertEqual((limiter.throttled_s, self.clock.now), (3.5, 103.5))
+
+
+class CallTest(unittest.TestCase):
+    def test_every_continuation_is_charged_and_settled(self):
+        responses = [_message("pause_turn", input_tokens=900), _message(input_tokens=4000)]
+        limiter = FakeLimiter()
+        with mock.patch.object(realtime, "get_anthropic", return_value=_client(lambda **kw: responses.pop(0))):
+            message = realtime._call(_params(), limiter)
+        self.assertEqual(len(limiter.acquired), 2)
+        self.assertGreater(limiter.acquired[1], limiter.acquired[0])
+        self.assertEqual([actual for _, actual in limiter.settled], [900, 4000])
+        self.assertEqual(message.usage.input_tokens, 4900)
+
+    def test_rate_limits_are_retried(self):
+        responses = [StatusError(429), StatusError(529), _message()]
+
+        def create(**kwargs):
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        limiter = FakeLimiter()
+        with mock.patch.object(realtime, "get_anthropic", return_value=_client(create)):
+            realtime._call(_params(), limiter)
+        self.assertEqual(len(limiter.acquired), 3)
+        self.assertEqual(len(limiter.backoffs), 2)
+        self.assertEqual([actual for _, actual in limiter.settled], [0, 0, 1000])
+
+    def test_other_errors_are_not_retried(self):
+        def create(**kwargs):
+            raise StatusError(400)
+
+        limiter = FakeLimiter()
+        with mock.patch.object(realtime, "get_anthropic", return_value=_client(create)):
+            with self.assertRaises(StatusError):
+                realtime._call(_params(), limiter)
+        self.assertEqual(len(limiter.acquired), 1)
+
+
+class RunRealtimeTest(unittest.TestCase):
+    def test_ingest_failure_stops_further_calls(self):
+        calls = []
+
+        def create(**kwargs):
+            calls.append(kwargs["messages"][0]["content"])
+            time.sleep(0.01)
+            return _message()
+
+        def ingest_stream(lane_id, results, id_map, **kwargs):
+            next(iter(results))
+            raise RuntimeError("Supabase unreachable")
+
+        requests = [{"custom_id": f"ES_{i:04d}", "params": _params(f"buyer {i}")} for i in range(20)]
+        id_map = {r["custom_id"]: {"buyer_name": r["custom_id"], "country": "ES"} for r in requests}
+        with mock.patch.object(realtime, "get_anthropic", return_value=_client(create)), \
+                mock.patch.object(ingest, "ingest_stream", ingest_stream), mock.patch("builtins.print"):
+            with self.assertRaises(RuntimeError):
+                realtime.run_realtime(requests, id_map, rpm=60_000, itpm=10_000_000, workers=2)
+        self.assertLess(len(calls), 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
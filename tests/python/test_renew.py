@@ -0,0 +1,79 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from civant_enrich import cli, fetch
+
+
+def _entry(name, fingerprint, aliases=()):
+    return {"buyer_name": name, "country": "ES", "input_fingerprint": fingerprint, "aliases": [list(a) for a in aliases]}
+
+
+class UnchangedBriefsTest(unittest.TestCase):
+    def setUp(self):
+        self.id_map = {
+            "ES_0000": _entry("Madrid", "fp-a", aliases=[("Ayuntamiento de Madrid", "ES")]),
+            "ES_0001": _entry("Getafe", "fp-b"),
+            "ES_0002": _entry("Toledo", "fp-c", aliases=[("Toledo Ayto", "ES")]),
+            "ES_0003": _entry("Jaén", "fp-d"),
+        }
+        # Madrid unchanged, Getafe's input changed, Toledo changed, Jaén has no expired brief
+        self.previous = {("Madrid", "ES"): "fp-a", ("Getafe", "ES"): "fp-old", ("Toledo", "ES"): "fp-old"}
+
+    def test_only_matching_fingerprints_are_renewed_with_their_aliases(self):
+        self.assertEqual(cli._unchanged_briefs(self.id_map, self.previous),
+                         [("Madrid", "ES", "fp-a"), ("Ayuntamiento de Madrid", "ES", "fp-a")])
+
+    def test_an_alias_key_in_previous_does_not_renew_its_group(self):
+        self.assertEqual(cli._unchanged_briefs(self.id_map, {("Toledo Ayto", "ES"): "fp-c"}), [])
+
+    def test_renewed_requests_are_dropped(self):
+        requests = [{"custom_id": cid} for cid in self.id_map]
+        renewed = {("Madrid", "ES"), ("Ayuntamiento de Madrid", "ES"), ("Jaén", "ES")}
+        requests, id_map = cli._drop_renewed(requests, self.id_map, renewed)
+        self.assertEqual([r["custom_id"] for r in requests], ["ES_0001", "ES_0002"])
+        self.assertEqual(list(id_map), ["ES_0001", "ES_0002"])
+
+
+class FingerprintsTest(unittest.TestCase):
+    def test_uses_the_fingerprints_the_cache_check_attached(self):
+        buyers = [{"buyer_name": "Madrid", "country": "ES", "brief_fingerprint": "fp-a"},
+                  {"buyer_name": "Getafe", "country": "ES", "brief_fingerprint": None}]
+        with mock.patch.object(fetch, "get_supabase", side_effect=AssertionError("no query expected")):
+            self.assertEqual(fetch.fetch_brief_fingerprints(buyers), {("Madrid", "ES"): "fp-a"})
+
+    def test_missing_column_renews_nothing(self):
+        supabase = SimpleNamespace(table=mock.Mock(side_effect=RuntimeError("column does not exist")))
+        with mock.patch.object(fetch, "get_supabase", return_value=supabase), mock.patch("builtins.print"):
+            self.assertEqual(fetch.fetch_brief_fingerprints([{"buyer_name": "Madrid", "country": "ES"}]), {})
+
+
+class RenewUnchangedBriefsTest(unittest.TestCase):
+    def test_chunks_and_returns_what_the_server_renewed(self):
+        calls = []
+
+        def rpc(name, params):
+            calls.append(params)
+
+            def execute():
+                if len(calls) == 2:
+                    raise RuntimeError("statement timeout")
+                # The server renews only rows whose stored fingerprint still matches
+                return SimpleNamespace(data=[{"buyer_name": n, "country": c} for n, c, f in
+                                             zip(params["p_buyer_names"], params["p_countries"],
+                                                 params["p_fingerprints"]) if f != "stale"])
+            return SimpleNamespace(execute=execute)
+
+        unchanged = [(f"Buyer {i}", "ES", "stale" if i == 1 else f"fp-{i}") for i in range(5)]
+        with mock.patch.object(fetch, "get_supabase", return_value=SimpleNamespace(rpc=rpc)), \
+                mock.patch.object(fetch, "RENEW_BATCH_SIZE", 2), mock.patch("builtins.print"):
+            renewed = fetch.renew_unchanged_briefs(unchanged, ttl_days=30)
+        self.assertEqual([c["p_buyer_names"] for c in calls], [["Buyer 0", "Buyer 1"], ["Buyer 2", "Buyer 3"],
+                                                               ["Buyer 4"]])
+        self.assertEqual(calls[0]["p_ttl_days"], 30)
+        # Buyer 1's fingerprint no longer matched; the failed chunk renews nothing
+        self.assertEqual(renewed, {("Buyer 0", "ES"), ("Buyer 4", "ES")})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+from datetime import date
+from unittest import mock
+
+from civant_enrich import shared
+from civant_enrich.schedule import fit_budget, merge_prediction_rows, rank_buyers, trim_to_budget
+
+TODAY = date(2026, 3, 1)
+
+
+class PriorityTest(unittest.TestCase):
+    def test_merge_keeps_the_strongest_signal(self):
+        (b,) = merge_prediction_rows([
+            {"buyer_name": "A", "country": "IE", "urgency": "horizon", "predicted_tender_date": "2026-09-01",
+             "probability": 0.4, "total_value_eur": 100},
+            {"buyer_name": "A", "country": "IE", "urgency": "Imminent", "predicted_tender_date": "2026-04-01",
+             "probability": 0.2, "total_value_eur": 50},
+        ])
+        self.assertEqual((b["urgency"], b["next_tender_date"], b["probability"], b["total_value_eur"],
+                          b["predictions"]), ("imminent", "2026-04-01", 0.4, 150.0, 2))
+
+    def test_rank_puts_urgent_valuable_unresearched_buyers_first(self):
+        buyers = [
+            {"buyer_name": "later", "urgency": "distant", "next_tender_date": "2027-06-01",
+             "total_value_eur": 10_000, "brief_expires_at": "2026-02-20T00:00:00Z"},
+            {"buyer_name": "sooner", "urgency": "imminent", "next_tender_date": "2026-03-10",
+             "total_value_eur": 2_000_000, "brief_expires_at": None},
+            {"buyer_name": "unknown"},
+        ]
+        ranked = rank_buyers(buyers, today=TODAY)
+        self.assertEqual([b["buyer_name"] for b in ranked], ["sooner", "unknown", "later"])
+        self.assertTrue(all(0 <= b["priority"] <= 1 for b in ranked))
+
+    def test_budget(self):
+        buyers = [{"buyer_name": str(i), "brief_fingerprint": "f" if i == 1 else None} for i in range(5)]
+        self.assertEqual([b["buyer_name"] for b in trim_to_budget(buyers, 0.25, 0.1)], ["0", "1", "2"])
+
+        requests = [{"custom_id": c} for c in ("a", "b", "c")]
+        costs = {"a": 0.5, "b": 0.8, "c": 0.3}
+        kept, id_map, deferred, total = fit_budget(requests, {c: {} for c in costs}, 1.0, lambda r: costs[r["custom_id"]])
+        self.assertEqual(([r["custom_id"] for r in kept], deferred, total), (["a", "c"], 1, 0.8))
+        self.assertEqual(id_map["c"]["est_cost_usd"], 0.3)
+
+
+class TenantSchedulingTest(unittest.TestCase):
+    def test_tenants_take_turns_one_page_at_a_time(self):
+        pages = {
+            "big": [[{"buyer_name": f"B{i}", "country": "ES"}] for i in range(3)],
+            "small": [[{"buyer_name": "B0", "country": "ES", "urgency": "overdue"}]],
+        }
+        order = []
+
+        def iter_buyer_pages(include_overdue=False, tenant_id=None):
+            for page in pages[tenant_id]:
+                order.append(tenant_id)
+                yield page
+
+        with mock.patch.object(shared, "iter_buyer_pages", iter_buyer_pages), mock.patch("builtins.print"):
+            buyers, listed = shared.collect_tenant_buyers(["big", "small"], cache_check=False, workers=1)
+        self.assertEqual(order, ["big", "small", "big", "big"])
+        self.assertEqual(listed, 4)
+        self.assertEqual([(b["buyer_name"], b["tenants"]) for b in buyers],
+                         [("B0", ["big", "small"]), ("B1", ["big"]), ("B2", ["big"])])
+        self.assertEqual(buyers[0]["urgency"], "overdue")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from civant_enrich import shared
+
+
+class TenantAttachmentsTest(unittest.TestCase):
+    def setUp(self):
+        self.buyers = [
+            {"buyer_name": "Madrid", "country": "ES", "tenants": ["acme", "globex"],
+             "aliases": [{"buyer_name": "Ayuntamiento de Madrid", "country": "ES", "tenants": ["initech"]}]},
+            {"buyer_name": "Getafe", "country": "ES", "tenants": ["acme"]},
+        ]
+
+    def test_every_tenant_of_every_buyer_and_alias(self):
+        self.assertEqual(shared.tenant_attachments(self.buyers), [
+            ("acme", "Madrid", "ES"), ("globex", "Madrid", "ES"),
+            ("initech", "Ayuntamiento de Madrid", "ES"), ("acme", "Getafe", "ES"),
+        ])
+
+    def test_only_the_given_buyers(self):
+        only = {("Ayuntamiento de Madrid", "ES"), ("Getafe", "ES")}
+        self.assertEqual(shared.tenant_attachments(self.buyers, only=only),
+                         [("initech", "Ayuntamiento de Madrid", "ES"), ("acme", "Getafe", "ES")])
+
+
+class AttachSharedBriefsTest(unittest.TestCase):
+    def test_chunks_and_counts_and_skips_a_failed_chunk(self):
+        calls = []
+
+        def rpc(name, params):
+            calls.append(params)
+
+            def execute():
+                if len(calls) == 2:
+                    raise RuntimeError("permission denied")
+                return SimpleNamespace(data=[{} for _ in params["p_tenant_ids"]])
+            return SimpleNamespace(execute=execute)
+
+        attachments = [(f"tenant_{i}", f"Buyer {i}", "ES") for i in range(5)]
+        with mock.patch.object(shared, "get_supabase", return_value=SimpleNamespace(rpc=rpc)), \
+                mock.patch.object(shared, "ATTACH_BATCH_SIZE", 2), mock.patch("builtins.print"):
+            attached = shared.attach_shared_briefs(attachments)
+        self.assertEqual([c["p_tenant_ids"] for c in calls], [["tenant_0", "tenant_1"], ["tenant_2", "tenant_3"],
+                                                              ["tenant_4"]])
+        self.assertEqual(attached, 3)
+
+
+class MergeTenantBuyersTest(unittest.TestCase):
+    def test_strongest_signal_of_any_tenant_wins(self):
+        merged = shared.merge_tenant_buyers([
+            ("acme", [{"buyer_name": "Madrid", "country": "ES", "urgency": "upcoming",
+                       "next_tender_date": "2026-12-01", "probability": 0.4, "total_value_eur": 100.0,
+                       "predictions": 2, "brief_expires_at": "2026-10-01", "brief_fingerprint": "fp-acme"},
+                      {"buyer_name": "Getafe", "country": "ES", "urgency": "upcoming"}]),
+            ("globex", [{"buyer_name": "Madrid", "country": "ES", "urgency": "Overdue",
+                         "next_tender_date": "2026-11-15", "probability": 0.7, "total_value_eur": 50.0,
+                         "predictions": 1, "brief_expires_at": None}]),
+            ("initech", [{"buyer_name": "Madrid", "country": "ES", "urgency": None, "next_tender_date": None,
+                          "probability": 0.1, "total_value_eur": None, "brief_expires_at": "2026-09-01"}]),
+        ])
+        self.assertEqual([(b["buyer_name"], b["tenants"]) for b in merged],
+                         [("Madrid", ["acme", "globex", "initech"]), ("Getafe", ["acme"])])
+        madrid = merged[0]
+        self.assertEqual((madrid["urgency"], madrid["next_tender_date"], madrid["probability"]),
+                         ("overdue", "2026-11-15", 0.7))
+        self.assertEqual((madrid["total_value_eur"], madrid["predictions"]), (150.0, 3))
+        # Never briefed for one tenant: the merged buyer counts as never briefed
+        self.assertIsNone(madrid["brief_expires_at"])
+        # A tenant's fingerprint says nothing about the shared layer
+        self.assertNotIn("brief_fingerprint", madrid)
+
+    def test_oldest_expiry_wins(self):
+        merged = shared.merge_tenant_buyers([
+            ("acme", [{"buyer_name": "Madrid", "country": "ES", "brief_expires_at": "2026-10-01"}]),
+            ("globex", [{"buyer_name": "Madrid", "country": "ES", "brief_expires_at": "2026-09-01"}]),
+        ])
+        self.assertEqual(merged[0]["brief_expires_at"], "2026-09-01")
+
+
+class CollectTenantBuyersTest(unittest.TestCase):
+    def test_tenants_are_listed_round_robin_and_merged_in_order(self):
+        pages = {
+            "acme": [[{"buyer_name": "Madrid", "country": "ES"}], [{"buyer_name": "Getafe", "country": "ES"}],
+                     [{"buyer_name": "Toledo", "country": "ES"}]],
+            "globex": [[{"buyer_name": "Getafe", "country": "ES"}]],
+        }
+        order = []
+
+        def iter_buyer_pages(include_overdue=False, tenant_id=None):
+            for page in pages[tenant_id]:
+                order.append(tenant_id)
+                yield page
+
+        def filter_already_cached(page, quiet=False, tenant_id=None):
+            # acme already has a valid Getafe brief
+            return [b for b in page if (tenant_id, b["buyer_name"]) != ("acme", "Getafe")]
+
+        with mock.patch.object(shared, "iter_buyer_pages", side_effect=iter_buyer_pages), \
+                mock.patch.object(shared, "filter_already_cached", side_effect=filter_already_cached), \
+                mock.patch("builtins.print"):
+            buyers, listed = shared.collect_tenant_buyers(["acme", "globex"], workers=1)
+        # One page per turn: globex is listed after acme's first page, not after all three
+        self.assertEqual(order, ["acme", "globex", "acme", "acme"])
+        self.assertEqual(listed, 4)
+        self.assertEqual([(b["buyer_name"], b["tenants"]) for b in buyers],
+                         [("Madrid", ["acme"]), ("Toledo", ["acme"]), ("Getafe", ["globex"])])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import json
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from civant_enrich import submit
+from civant_enrich.ledger import BatchLedger
+
+
+def _request(i, text="x"):
+    return {"custom_id": f"ES_{i:04d}", "params": {"messages": [{"role": "user", "content": text}]}}
+
+
+def _size(request):
+    return len(json.dumps(request, ensure_ascii=False).encode("utf-8"))
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class ShardRequestsTest(unittest.TestCase):
+    def test_count_limit(self):
+        shards = submit.shard_requests([_request(i) for i in range(7)], max_requests=3, max_bytes=10 ** 9)
+        self.assertEqual([len(reqs) for reqs, _ in shards], [3, 3, 1])
+        self.assertEqual([r["custom_id"] for reqs, _ in shards for r in reqs], [f"ES_{i:04d}" for i in range(7)])
+
+    def test_byte_limit_counts_serialized_utf8(self):
+        requests = [_request(i, "Jaén " * 10) for i in range(5)]
+        n = _size(requests[0])
+        shards = submit.shard_requests(requests, max_requests=100, max_bytes=2 * n)
+        self.assertEqual([len(reqs) for reqs, _ in shards], [2, 2, 1])
+        self.assertEqual([size for _, size in shards], [2 * n, 2 * n, n])
+
+    def test_an_oversized_request_gets_a_shard_of_its_own(self):
+        requests = [_request(0), _request(1, "y" * 500), _request(2)]
+        shards = submit.shard_requests(requests, max_requests=100, max_bytes=200)
+        self.assertEqual([[r["custom_id"] for r in reqs] for reqs, _ in shards],
+                         [["ES_0000"], ["ES_0001"], ["ES_0002"]])
+
+
+class SubmitShardedTest(unittest.TestCase):
+    def setUp(self):
+        state = tempfile.TemporaryDirectory()
+        self.addCleanup(state.cleanup)
+        self.ledger = BatchLedger(os.path.join(state.name, "ledger.sqlite"))
+        self.addCleanup(self.ledger.close)
+        self.bad, self.down, self.calls = set(), [], []
+
+        def create(requests):
+            ids = [r["custom_id"] for r in requests]
+            self.calls.append(ids)
+            if self.down:
+                raise StatusError(self.down.pop(0))
+            if self.bad & set(ids):
+                raise StatusError(400)
+            return SimpleNamespace(id=f"msgbatch_{len(self.calls)}")
+
+        batches = SimpleNamespace(create=create)
+        for patch in (
+            mock.patch.object(submit, "get_anthropic",
+                              return_value=SimpleNamespace(messages=SimpleNamespace(batches=batches))),
+            mock.patch("builtins.print"),
+        ):
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.requests = [_request(i) for i in range(8)]
+        self.id_map = {r["custom_id"]: {"buyer_name": f"Buyer {i}", "country": "ES"}
+                       for i, r in enumerate(self.requests)}
+
+    def submit(self, **kwargs):
+        return submit.submit_sharded(self.requests, self.id_map, max_bytes=10 ** 9, workers=1,
+                                     ledger=self.ledger, **kwargs)
+
+    def test_a_rejected_shard_is_bisected_down_to_the_bad_request(self):
+        self.bad.add("ES_0005")
+        manifest = self.submit(max_requests=8)
+        self.assertEqual(manifest["rejected"], [{"custom_id": "ES_0005", "error": "HTTP 400"}])
+        # 0-3 goes through; 4-7 splits into 4-5 (then 4 and 5) and 6-7
+        self.assertEqual([s["custom_ids"] for s in manifest["shards"]],
+                         [["ES_0000", "ES_0001", "ES_0002", "ES_0003"], ["ES_0004"], ["ES_0006", "ES_0007"]])
+        recorded = self.ledger.report([s["batch_id"] for s in manifest["shards"]])
+        self.assertEqual(sum(r["requests"] for r in recorded), 7)
+
+    def test_a_shard_failing_outright_is_recorded_and_the_rest_still_go(self):
+        self.down.append(500)
+        manifest = self.submit(max_requests=4)
+        self.assertEqual([(s["batch_id"], s["requests"], s.get("error")) for s in manifest["shards"]],
+                         [(None, 4, "HTTP 500"), ("msgbatch_2", 4, None)])
+        self.assertEqual(len(self.calls), 2)  # no bisection for server errors
+
+    def test_rate_limits_are_not_bisected(self):
+        self.down.append(429)
+        manifest = self.submit(max_requests=8)
+        self.assertEqual((len(self.calls), manifest["rejected"]), (1, []))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import test from 'node:test';
+import assert from 'node:assert/strict';
+import { readFileSync } from 'node:fs';
+
+const source = readFileSync(
+  new URL('../supabase/migrations/20260302170000_shared_buyer_research_briefs_v1.sql', import.meta.url),
+  'utf8',
+);
+const researchBuyer = readFileSync(
+  new URL('../supabase/functions/research-buyer/index.ts', import.meta.url),
+  'utf8',
+);
+
+test('shared briefs are keyed without a tenant and locked to service_role', () => {
+  assert.match(
+    source,
+    /create unique index if not exists shared_buyer_research_briefs_buyer_country_category_uidx\s+on public\.shared_buyer_research_briefs \(buyer_name, country, category\);/,
+  );
+  assert.doesNotMatch(source.match(/create table if not exists public\.shared_buyer_research_briefs \(([^;]*)\);/)[1], /tenant_id/);
+  assert.match(source, /alter table public\.shared_buyer_research_briefs enable row level security;/);
+  assert.match(source, /revoke all on table public\.shared_buyer_research_briefs from public, anon, authenticated;/);
+});
+
+test('tenant briefs reference the shared row they were attached from', () => {
+  assert.match(source, /add column if not exists shared_brief_id uuid\s+references public\.shared_buyer_research_briefs \(id\) on delete set null;/);
+});
+
+test('attach copies only valid shared briefs and leaves spend on the shared row', () => {
+  assert.match(source, /from unnest\(p_tenant_ids, p_buyer_names, p_countries\) as u\(tenant_id, buyer_name, country\)/);
+  assert.match(source, /and s\.status = 'complete'\s+and s\.expires_at > now\(\)\s+on conflict \(tenant_id, buyer_name, country, category\) do update set/);
+  assert.match(source, /s\.model_used, 0, 0, s\.status/);
+  assert.match(source, /shared_brief_id\s+= excluded\.shared_brief_id/);
+});
+
+test('shared RPCs validate input size and are service_role only', () => {
+  assert.match(source, /at most 5000 attachments per call/);
+  assert.match(source, /at most 5000 buyers per call/);
+  assert.match(source, /at most 1000 briefs per call/);
+  for (const signature of [
+    'get_uncached_shared_buyers\\(text, text\\[\\], text\\[\\]\\)',
+    'renew_shared_buyer_research_briefs\\(text, text\\[\\], text\\[\\], text\\[\\], int\\)',
+    'attach_shared_buyer_research_briefs\\(text, text\\[\\], text\\[\\], text\\[\\]\\)',
+  ]) {
+    assert.match(source, new RegExp(`revoke all on function public\\.${signature} from public, anon, authenticated;`));
+    assert.match(source, new RegExp(`grant execute on function public\\.${signature} to service_role;`));
+  }
+});
+
+test('research-buyer detaches a rewritten brief from its shared brief', () => {
+  assert.match(researchBuyer, /shared_brief_id: null,\s+\}, \{ onConflict: "tenant_id,buyer_name,country,category" \}\)/);
+});
@@ -0,0 +1,30 @@
+import test from 'node:test';
+import assert from 'node:assert/strict';
+import { readFileSync } from 'node:fs';
+
+const source = readFileSync(
+  new URL('../supabase/migrations/20260302130000_get_uncached_buyers_v1.sql', import.meta.url),
+  'utf8',
+);
+
+test('get_uncached_buyers anti-joins input pairs against valid briefs', () => {
+  assert.match(source, /from unnest\(p_buyer_names, p_countries\) with ordinality as u\(buyer_name, country, ord\)/);
+  assert.match(source, /where not exists \(/);
+  assert.match(source, /and b\.country = u\.country\s+and b\.expires_at > now\(\)/);
+  assert.match(source, /order by u\.ord;/);
+});
+
+test('cache lookup index covers the anti-join predicate', () => {
+  assert.match(
+    source,
+    /create index if not exists buyer_research_briefs_cache_lookup_idx\s+on public\.buyer_research_briefs \(tenant_id, category, status, buyer_name, country, expires_at\);/,
+  );
+});
+
+test('get_uncached_buyers validates input size and is service_role only', () => {
+  assert.match(source, /p_buyer_names and p_countries must have the same length/);
+  assert.match(source, /> 5000 then/);
+  assert.match(source, /set search_path = public/);
+  assert.match(source, /revoke all on function public\.get_uncached_buyers\(text, text, text\[\], text\[\]\) from public, anon, authenticated;/);
+  assert.match(source, /grant execute on function public\.get_uncached_buyers\(text, text, text\[\], text\[\]\) to service_role;/);
+});